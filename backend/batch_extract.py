@@ -0,0 +1,236 @@
+"""
+Parallel batch extraction across W-2, 1099-INT and 1099-NEC uploads.
+
+PDF-to-markdown conversion is CPU-bound, so instead of looping over each
+form type in turn we push every document through one executor and collect
+the results back in input order. Process pools get the document bytes
+through shared memory (one copy in, nothing pickled); thread pools read the
+upload buffers directly.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from . import metrics
+from .extract_w2 import parse_w2
+from .extract_1099_int import _process_single_1099_int
+from .extract_1099_nec import _process_single_1099_nec
+from .pdf_loader import BufferedPDF, pdf_buffer
+from .classify_forms import FORM_UNKNOWN, classify_pdf
+from .layout_extract import MODE_MARKDOWN
+from .ocr import ocr_gate, share_ocr_gate
+from .tax_return import (
+    TaxReturn,
+    add_w2_to_tax_return,
+    add_1099_int_to_tax_return,
+    add_1099_nec_to_tax_return,
+)
+
+# Pass as form_type to classify each document in the worker before parsing
+AUTO_DETECT = "auto"
+
+# form type -> single-document parser
+FORM_PARSERS: Dict[str, Callable[[Any], Dict[str, Any]]] = {
+    "w2": parse_w2,
+    "1099_int": _process_single_1099_int,
+    "1099_nec": _process_single_1099_nec,
+}
+
+
+def _error_result(pdf_file: Any, e: Exception) -> Dict[str, Any]:
+    return {
+        "source_file": getattr(pdf_file, 'name', None),
+        "error": f"Failed to extract data: {e}"
+    }
+
+
+def _parse(form_type: str, pdf_file: Any, mode: str = MODE_MARKDOWN) -> Tuple[str, Dict[str, Any]]:
+    """Parse one document, classifying it first for AUTO_DETECT jobs."""
+    if form_type == AUTO_DETECT:
+        form_type = classify_pdf(pdf_file)
+        metrics.inc("documents_total", form=form_type)
+        if form_type == FORM_UNKNOWN:
+            return form_type, {
+                "source_file": getattr(pdf_file, 'name', None),
+                "error": "Unrecognized form type"
+            }
+    else:
+        metrics.inc("documents_total", form=form_type)
+    try:
+        return form_type, FORM_PARSERS[form_type](pdf_file, mode=mode)
+    except Exception as e:
+        return form_type, _error_result(pdf_file, e)
+
+
+def _parse_from_shared_memory(form_type: str, shm_name: str, size: int, file_name: Any,
+                              mode: str = MODE_MARKDOWN) -> Tuple[str, Dict[str, Any]]:
+    """Worker side: attach to the parent's shared block and parse it in place."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    view = shm.buf[:size]
+    try:
+        return _parse(form_type, BufferedPDF(file_name, view), mode)
+    finally:
+        view.release()
+        shm.close()
+
+
+def _make_executor(executor: Union[str, Executor], max_workers: Optional[int]) -> Tuple[Executor, bool]:
+    """Return (executor, owned) where owned means we must shut it down."""
+    if isinstance(executor, Executor):
+        return executor, False
+    if executor == "process":
+        # Workers share the parent's OCR slots rather than each running tesseract at full width
+        return ProcessPoolExecutor(max_workers=max_workers, initializer=share_ocr_gate,
+                                   initargs=(ocr_gate(),)), True
+    if executor == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers), True
+    raise ValueError(f"Unknown executor '{executor}', expected 'process' or 'thread'")
+
+
+def _run_batch(jobs: List[Tuple[str, Any]],
+               executor: Union[str, Executor],
+               max_workers: Optional[int],
+               mode: str = MODE_MARKDOWN) -> List[Tuple[str, Dict[str, Any]]]:
+    """Run jobs on the executor; returns (resolved form type, result) in input order."""
+    if not jobs:
+        return []
+
+    pool, owned = _make_executor(executor, max_workers)
+    use_shared_memory = isinstance(pool, ProcessPoolExecutor)
+    blocks: List[shared_memory.SharedMemory] = []
+    futures: List[Any] = []
+    try:
+        for form_type, pdf_file in jobs:
+            try:
+                if form_type != AUTO_DETECT and form_type not in FORM_PARSERS:
+                    raise ValueError(f"Unknown form type '{form_type}'")
+                if use_shared_memory:
+                    data = pdf_buffer(pdf_file)
+                    size = len(data)
+                    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+                    blocks.append(shm)
+                    shm.buf[:size] = data
+                    # Workers send their metrics back with the result (see metrics.run_recorded)
+                    futures.append(pool.submit(metrics.run_recorded, _parse_from_shared_memory, form_type,
+                                               shm.name, size, getattr(pdf_file, 'name', None), mode))
+                else:
+                    futures.append(pool.submit(_parse, form_type, pdf_file, mode))
+            except Exception as e:
+                futures.append((form_type, _error_result(pdf_file, e)))
+
+        results = []
+        for (form_type, pdf_file), future in zip(jobs, futures):
+            if isinstance(future, tuple):
+                results.append(future)
+                continue
+            try:
+                outcome = future.result()
+                if use_shared_memory:
+                    outcome, recorded = outcome
+                    metrics.merge(recorded)
+                results.append(outcome)
+            except Exception as e:
+                metrics.merge(getattr(e, "metrics_snapshot", None))
+                results.append((form_type, _error_result(pdf_file, e)))
+        return results
+    finally:
+        if owned:
+            pool.shutdown(wait=True)
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+def extract_batch(jobs: Iterable[Tuple[str, Any]],
+                  executor: Union[str, Executor] = "process",
+                  max_workers: Optional[int] = None,
+                  mode: str = MODE_MARKDOWN) -> List[Dict[str, Any]]:
+    """
+    Extract a batch of (form_type, pdf_file) jobs concurrently.
+
+    form_type is one of FORM_PARSERS ('w2', '1099_int', '1099_nec') or AUTO_DETECT.
+    executor is 'process' (default), 'thread', or an existing Executor to reuse.
+    mode picks the extraction engine ('markdown' or 'layout').
+    Results come back in input order; a failing file yields
+    {"source_file", "error"} without affecting the others.
+    """
+    return [result for _, result in _run_batch(list(jobs), executor, max_workers, mode)]
+
+
+def extract_typed(jobs: Iterable[Tuple[str, Any]],
+                  executor: Union[str, Executor] = "process",
+                  max_workers: Optional[int] = None,
+                  mode: str = MODE_MARKDOWN) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Like extract_batch, but each result comes with its resolved form type
+    (AUTO_DETECT jobs report what they were classified as). Feed the output
+    to group_results to route it into a tax_return.
+    """
+    return _run_batch(list(jobs), executor, max_workers, mode)
+
+
+# form type -> (tax_return list key, adder)
+FORM_ROUTES = {
+    "w2": ("w2s", add_w2_to_tax_return),
+    "1099_int": ("1099ints", add_1099_int_to_tax_return),
+    "1099_nec": ("1099necs", add_1099_nec_to_tax_return),
+}
+
+
+def group_results(results: List[Tuple[str, Dict[str, Any]]],
+                  tax_return: Union[Dict[str, Any], TaxReturn, None] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Group (form type, result) pairs by tax_return list key, adding them to
+    tax_return (a dict from init_tax_return() or a TaxReturn) if given.
+    """
+    grouped: Dict[str, List[Dict[str, Any]]] = {"w2s": [], "1099ints": [], "1099necs": [], "unrecognized": []}
+    for form_type, result in results:
+        route = FORM_ROUTES.get(form_type)
+        if route is None:
+            grouped["unrecognized"].append(result)
+            continue
+        key, add_to_tax_return = route
+        grouped[key].append(result)
+        if isinstance(tax_return, TaxReturn):
+            tax_return.add_form(form_type, result)
+        elif tax_return is not None:
+            add_to_tax_return(tax_return, result)
+    return grouped
+
+
+def extract_forms(w2_files: Optional[Sequence[Any]] = None,
+                  int_files: Optional[Sequence[Any]] = None,
+                  nec_files: Optional[Sequence[Any]] = None,
+                  unsorted_files: Optional[Sequence[Any]] = None,
+                  tax_return: Union[Dict[str, Any], TaxReturn, None] = None,
+                  executor: Union[str, Executor] = "process",
+                  max_workers: Optional[int] = None,
+                  mode: str = MODE_MARKDOWN) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Run W-2s, 1099-INTs, 1099-NECs and unsorted uploads through one pool in a
+    single pass. Unsorted files are classified and routed automatically.
+
+    Returns {'w2s', '1099ints', '1099necs', 'unrecognized'}, each list in
+    upload order; when a tax_return is given, recognized forms are also added to it.
+    """
+    jobs = ([("w2", f) for f in w2_files or []]
+            + [("1099_int", f) for f in int_files or []]
+            + [("1099_nec", f) for f in nec_files or []]
+            + [(AUTO_DETECT, f) for f in unsorted_files or []])
+    return group_results(_run_batch(jobs, executor, max_workers, mode), tax_return)
+
+
+def extract_documents(files: Sequence[Any],
+                      tax_return: Union[Dict[str, Any], TaxReturn, None] = None,
+                      executor: Union[str, Executor] = "process",
+                      max_workers: Optional[int] = None,
+                      mode: str = MODE_MARKDOWN) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Extract an unsorted mix of W-2 / 1099-INT / 1099-NEC uploads.
+
+    Each file is classified from its first page (no markdown conversion) and
+    routed to the matching parser. Returns {'w2s', '1099ints', '1099necs',
+    'unrecognized'}; when a tax_return is given, recognized forms are also added to it.
+    """
+    return extract_forms(unsorted_files=files, tax_return=tax_return,
+                         executor=executor, max_workers=max_workers, mode=mode)
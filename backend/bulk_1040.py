@@ -0,0 +1,147 @@
+"""
+Bulk 1040 generation for a whole client book.
+
+Returns are filled across a worker pool (each worker parses the template
+once and reuses it) and every finished PDF is written to a ZIP archive or a
+directory as soon as it completes. Only a bounded number of returns is in
+flight at a time, so memory stays flat no matter how long the input is, and
+a failing return is reported without stopping the others.
+"""
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import os
+import re
+import zipfile
+
+from . import metrics
+from .batch_extract import _make_executor
+from .generate_1040 import FORM_1040_TEMPLATE_PATH, fill_1040_pdf
+
+
+def _fill_one(template_path: str, taxpayer_profile: Dict[str, Any],
+              tax_summary: Dict[str, Any]) -> bytes:
+    # The template is parsed on the first call in each worker and cached after that
+    return fill_1040_pdf(template_path, taxpayer_profile, tax_summary)
+
+
+def iter_fill_1040(returns: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]],
+                   template_path=FORM_1040_TEMPLATE_PATH,
+                   executor: Union[str, Executor] = "process",
+                   max_workers: Optional[int] = None,
+                   max_pending: Optional[int] = None) -> Iterator[Tuple[int, Optional[bytes], Optional[str]]]:
+    """
+    Fill (taxpayer_profile, tax_summary) pairs concurrently.
+
+    Yields (index, pdf_bytes, error) in completion order, with pdf_bytes None
+    when the return failed. The input is consumed lazily and at most
+    max_pending returns (default: 2 per worker) are in flight at once.
+    """
+    pool, owned = _make_executor(executor, max_workers)
+    if max_pending is None:
+        max_pending = 2 * (max_workers or os.cpu_count() or 1)
+    template_path = str(template_path)
+    # Process workers send their metrics back with each PDF (see metrics.run_recorded)
+    recorded = isinstance(pool, ProcessPoolExecutor)
+
+    pending: Dict[Any, int] = {}
+    try:
+        items = enumerate(returns)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    index, (taxpayer_profile, tax_summary) = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if recorded:
+                    future = pool.submit(metrics.run_recorded, _fill_one, template_path, taxpayer_profile, tax_summary)
+                else:
+                    future = pool.submit(_fill_one, template_path, taxpayer_profile, tax_summary)
+                pending[future] = index
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    pdf_bytes = future.result()
+                    if recorded:
+                        pdf_bytes, snapshot = pdf_bytes
+                        metrics.merge(snapshot)
+                except Exception as e:
+                    metrics.merge(getattr(e, "metrics_snapshot", None))
+                    yield index, None, f"Failed to generate 1040: {e}"
+                else:
+                    yield index, pdf_bytes, None
+    finally:
+        for future in pending:
+            future.cancel()
+        if owned:
+            pool.shutdown(wait=True)
+
+
+def default_file_name(index: int, taxpayer_profile: Dict[str, Any]) -> str:
+    """'00042_Smith_John_1040.pdf' (index keeps names unique)."""
+    parts = [str(taxpayer_profile.get(key) or "") for key in ("last_name", "first_name")]
+    stem = "_".join(re.sub(r"[^A-Za-z0-9-]+", "-", part).strip("-") for part in parts if part)
+    return f"{index:05d}_{stem}_1040.pdf" if stem else f"{index:05d}_1040.pdf"
+
+
+def generate_1040_bulk(returns: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]],
+                       output,
+                       template_path=FORM_1040_TEMPLATE_PATH,
+                       executor: Union[str, Executor] = "process",
+                       max_workers: Optional[int] = None,
+                       max_pending: Optional[int] = None,
+                       file_name: Callable[[int, Dict[str, Any]], str] = default_file_name,
+                       compression: int = zipfile.ZIP_STORED) -> List[Dict[str, Any]]:
+    """
+    Generate a 1040 for every (taxpayer_profile, tax_summary) pair.
+
+    output is a '.zip' path, a writable binary stream (written as a ZIP), or
+    a directory that receives one PDF per return. PDFs are written as they
+    finish. Returns one report per input, in input order:
+    {"index", "file_name", "size"} or {"index", "file_name", "error"}.
+    """
+    names: Dict[int, str] = {}
+
+    def named(pairs):
+        # Assign names on the way in so the profile doesn't have to travel back
+        for index, (taxpayer_profile, tax_summary) in enumerate(pairs):
+            names[index] = file_name(index, taxpayer_profile)
+            yield taxpayer_profile, tax_summary
+
+    is_zip = not isinstance(output, (str, os.PathLike)) or str(output).lower().endswith(".zip")
+    if is_zip:
+        archive = zipfile.ZipFile(output, "w", compression=compression)
+        write = archive.writestr
+    else:
+        archive = None
+        directory = Path(output)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        def write(name: str, data: bytes) -> None:
+            (directory / name).write_bytes(data)
+
+    reports: List[Dict[str, Any]] = []
+    try:
+        for index, pdf_bytes, error in iter_fill_1040(named(returns), template_path, executor,
+                                                      max_workers, max_pending):
+            name = names.pop(index)
+            if error is None:
+                try:
+                    write(name, pdf_bytes)
+                    reports.append({"index": index, "file_name": name, "size": len(pdf_bytes)})
+                    continue
+                except OSError as e:
+                    error = f"Failed to write {name}: {e}"
+            reports.append({"index": index, "file_name": name, "error": error})
+    finally:
+        if archive is not None:
+            archive.close()
+
+    reports.sort(key=lambda report: report["index"])
+    return reports
@@ -0,0 +1,182 @@
+"""
+Bulk W-2 extraction for employer and payroll-provider PDFs that hold one
+W-2 per employee (hundreds or thousands of pages in one file).
+
+    python -m backend.bulk_w2 employer_w2s.pdf --out w2s.jsonl --workers 4
+    python -m backend.bulk_w2 employer_w2s.pdf --out w2s.parquet   # or .arrow, see backend.columnar
+
+parse_w2 treats a file as a single W-2 and converts all of it to markdown
+at once. Here the file is memory-mapped and walked page group by page group
+(extract_w2.iter_w2_pages), yielding one record per employee. With an
+executor, page ranges are spread across workers: process workers map the
+file themselves (or attach to one shared-memory copy of an in-memory
+upload), at most max_pending ranges are in flight, and records still come
+back in page order.
+"""
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple, Union
+import argparse
+import json
+import os
+import sys
+
+from . import metrics
+from .batch_extract import _make_executor
+from .extract_w2 import iter_w2_pages
+from .layout_extract import EXTRACTION_MODES, MODE_MARKDOWN
+from .pdf_loader import BufferedPDF, mapped_pdf, opened_pdf, pdf_buffer
+
+DEFAULT_CHUNK_PAGES = 64
+
+
+def _is_path(source: Any) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def _range_from_path(path: str, start: int, stop: int, mode: str, pages_per_w2: int) -> List[Dict[str, Any]]:
+    with mapped_pdf(path) as pdf_file:
+        return list(iter_w2_pages(pdf_file, mode, pages_per_w2, start, stop))
+
+
+def _range_from_shared_memory(shm_name: str, size: int, file_name: Any, start: int, stop: int,
+                              mode: str, pages_per_w2: int) -> List[Dict[str, Any]]:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    view = shm.buf[:size]
+    try:
+        return list(iter_w2_pages(BufferedPDF(file_name, view), mode, pages_per_w2, start, stop))
+    finally:
+        view.release()
+        shm.close()
+
+
+def _range_from_upload(pdf_file: Any, start: int, stop: int, mode: str, pages_per_w2: int) -> List[Dict[str, Any]]:
+    return list(iter_w2_pages(pdf_file, mode, pages_per_w2, start, stop))
+
+
+def page_ranges(page_count: int, chunk_pages: int, pages_per_w2: int = 1) -> List[Tuple[int, int]]:
+    """[start, stop) ranges of about chunk_pages pages that never split a W-2's page group."""
+    chunk = max(pages_per_w2, chunk_pages // pages_per_w2 * pages_per_w2)
+    return [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+
+
+def iter_bulk_w2(source: Any,
+                 mode: str = MODE_MARKDOWN,
+                 pages_per_w2: int = 1,
+                 executor: Union[str, Executor, None] = None,
+                 max_workers: Optional[int] = None,
+                 chunk_pages: int = DEFAULT_CHUNK_PAGES,
+                 max_pending: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one W-2 record per employee, in page order.
+
+    source is a path (memory-mapped, never read into memory) or an upload.
+    executor=None streams page by page in this process; 'process', 'thread'
+    or an Executor splits the file into chunk_pages page ranges, with at
+    most max_pending (default: 2 per worker) ranges extracted ahead.
+    """
+    if executor is None:
+        if _is_path(source):
+            with mapped_pdf(source) as pdf_file:
+                yield from iter_w2_pages(pdf_file, mode, pages_per_w2)
+        else:
+            yield from iter_w2_pages(source, mode, pages_per_w2)
+        return
+
+    pool, owned = _make_executor(executor, max_workers)
+    if max_pending is None:
+        max_pending = 2 * (max_workers or os.cpu_count() or 1)
+    recorded = isinstance(pool, ProcessPoolExecutor)
+    shm: Optional[shared_memory.SharedMemory] = None
+    pending: Deque[Any] = deque()
+    try:
+        if _is_path(source):
+            path = str(source)
+            with mapped_pdf(path) as pdf_file, opened_pdf(pdf_file) as doc:
+                page_count = doc.page_count
+            task: Tuple[Any, ...] = (_range_from_path, path)
+        else:
+            with opened_pdf(source) as doc:
+                page_count = doc.page_count
+            if recorded:
+                # One copy into shared memory; every worker reads its range from there
+                data = pdf_buffer(source)
+                size = len(data)
+                shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+                shm.buf[:size] = data
+                task = (_range_from_shared_memory, shm.name, size, getattr(source, 'name', None))
+            else:
+                task = (_range_from_upload, source)
+
+        ranges = iter(page_ranges(page_count, chunk_pages, pages_per_w2))
+        while True:
+            for start, stop in ranges:
+                if recorded:
+                    pending.append(pool.submit(metrics.run_recorded, *task, start, stop, mode, pages_per_w2))
+                else:
+                    pending.append(pool.submit(*task, start, stop, mode, pages_per_w2))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            future = pending.popleft()
+            try:
+                records = future.result()
+                if recorded:
+                    records, snapshot = records
+                    metrics.merge(snapshot)
+            except Exception as e:
+                metrics.merge(getattr(e, "metrics_snapshot", None))
+                records = [{"source_file": getattr(source, 'name', None) or os.path.basename(str(source)),
+                            "error": f"Failed to extract data: {e}"}]
+            yield from records
+    finally:
+        for future in pending:
+            future.cancel()
+        if owned:
+            pool.shutdown(wait=True)
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+# ------------------------
+# CLI
+# ------------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract one W-2 per employee from a bulk employer PDF.")
+    parser.add_argument("pdf", help="PDF with one W-2 per page (or per --pages-per-w2 pages)")
+    parser.add_argument("--out", help="JSONL output (default: stdout); *.parquet / *.arrow write columnar files "
+                                      "(needs the 'columnar' extra, i.e. pyarrow)")
+    parser.add_argument("--mode", choices=EXTRACTION_MODES, default=MODE_MARKDOWN)
+    parser.add_argument("--pages-per-w2", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="spread page ranges across this many worker processes (default: stream in-process)")
+    parser.add_argument("--chunk-pages", type=int, default=DEFAULT_CHUNK_PAGES)
+    args = parser.parse_args(argv)
+
+    executor = "process" if args.workers else None
+    if args.out and args.out.lower().endswith((".parquet", ".pq", ".arrow", ".feather")):
+        from .columnar import INSTALL_HINT, FormWriter, columnar_available
+
+        if not columnar_available():
+            parser.error(f"columnar --out needs pyarrow: {INSTALL_HINT}")
+        out = FormWriter(args.out)
+        write = lambda record: out.add("w2", record)
+    else:
+        out = open(args.out, 'w') if args.out else sys.stdout
+        write = lambda record: out.write(json.dumps(record) + "\n")
+    errors = 0
+    try:
+        for record in iter_bulk_w2(args.pdf, args.mode, args.pages_per_w2, executor, args.workers, args.chunk_pages):
+            errors += "error" in record
+            write(record)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0 if errors == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,16 @@
 import json
 import datetime
 
-# Load tax configuration
-try:
-    with open("./backend/tax_config.json", 'r') as file:
-        tax_data = json.load(file)
-except FileNotFoundError:
-    print("Error: tax_config.json not found in the expected location.")
-    tax_data = {}  # Initialize empty to prevent crashes
+from . import metrics
+from .tax_config import TAX_CONFIG
+from .tax_return import TaxReturn, from_cents
+
+
+def __getattr__(name):
+    # tax_data used to be loaded eagerly at import time; keep it available lazily
+    if name == "tax_data":
+        return TAX_CONFIG.raw()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def calculate_gross_income(w2s, ints, necs):
@@ -21,28 +24,14 @@ def calculate_gross_income(w2s, ints, necs):
 
 def calculate_taxable_income(gross_income, filing_status, year):
     """Subtract standard deduction to get taxable income."""
-    standard_deduction = tax_data[year]["standard_deductions"].get(filing_status, 0.0)
+    standard_deduction = TAX_CONFIG[year].standard_deduction(filing_status)
     taxable_income = max(0, gross_income - standard_deduction)
     return taxable_income, standard_deduction
 
 
 def calculate_tax_owed(taxable_income, filing_status, year):
-    """Calculate federal tax owed using tax brackets."""
-    brackets = tax_data[year]["tax_brackets"].get(filing_status, [])
-    tax_owed = 0.0
-    for bracket in brackets:
-        bracket_min = bracket["min"]
-        bracket_max = bracket["max"]
-        rate = bracket["rate"]
-
-        if taxable_income > bracket_min:
-            if bracket_max is None:
-                # Top bracket, tax all remaining income
-                amount_taxable = taxable_income - bracket_min
-            else:
-                amount_taxable = min(taxable_income - bracket_min, bracket_max - bracket_min)
-            tax_owed += amount_taxable * rate
-    return tax_owed
+    """Calculate federal tax owed using tax brackets (cumulative-table lookup)."""
+    return TAX_CONFIG[year].bracket_table(filing_status).tax_owed(taxable_income)
 
 
 def calculate_total_withholding(w2s, ints, necs):
@@ -53,28 +42,15 @@ def calculate_total_withholding(w2s, ints, necs):
     return total_withheld
 
 
-def calculate_taxes(taxpayer_data, year):
-    """
-    Main function to calculate taxes.
-    Expects taxpayer_data dict with keys: 'w2s', '1099ints', '1099necs', 'filing_status'.
-    """
-    w2s = taxpayer_data.get("w2s", [])
-    ints = taxpayer_data.get("1099ints", [])
-    necs = taxpayer_data.get("1099necs", [])
-    filing_status = taxpayer_data.get("taxpayer", {}).get("filing_status")
-
-    # --- Step 1: Gross Income ---
-    wages, interest_income, self_employment_income, gross_income = calculate_gross_income(w2s, ints, necs)
-
-    # --- Step 2: Taxable Income ---
+def _income_and_tax(gross_income, filing_status, year):
+    """Steps 2 & 3: (standard deduction, taxable income, tax owed)."""
     taxable_income, standard_deduction = calculate_taxable_income(gross_income, filing_status, year)
-
-    # --- Step 3: Tax Owed ---
     tax_owed = calculate_tax_owed(taxable_income, filing_status, year)
+    return standard_deduction, taxable_income, tax_owed
 
-    # --- Step 4: Federal Withholding ---
-    total_withheld = calculate_total_withholding(w2s, ints, necs)
 
+def _summary(wages, interest_income, self_employment_income, gross_income,
+             standard_deduction, taxable_income, tax_owed, total_withheld):
     # --- Step 5: Refund / Amount Due ---
     refund_or_amount_due = total_withheld - tax_owed
 
@@ -92,6 +68,188 @@ def calculate_taxes(taxpayer_data, year):
     }
 
 
+def _calculate_tax_return(tax_return, year):
+    """
+    calculate_taxes for a TaxReturn, straight from its running cent totals.
+    The bracket evaluation is cached on the return and only redone when the
+    income totals, filing status or year config change, so edits that only
+    touch withholding just recompute the refund.
+    """
+    filing_status = tax_return.taxpayer.get("filing_status")
+    config = TAX_CONFIG[year]
+    key = (config, filing_status, tax_return.wages, tax_return.interest_income,
+           tax_return.self_employment_income)
+    cached = tax_return.tax_cache
+    if cached is not None and cached[0] == key:
+        income_and_tax = cached[1]
+    else:
+        gross_income = from_cents(tax_return.wages + tax_return.interest_income
+                                  + tax_return.self_employment_income)
+        income_and_tax = (gross_income,) + _income_and_tax(gross_income, filing_status, year)
+        tax_return.tax_cache = (key, income_and_tax)
+    return _summary(from_cents(tax_return.wages), from_cents(tax_return.interest_income),
+                    from_cents(tax_return.self_employment_income), *income_and_tax,
+                    from_cents(tax_return.federal_tax_withheld))
+
+
+@metrics.timed("tax_calc")
+def calculate_taxes(taxpayer_data, year, use_totals=False):
+    """
+    Main function to calculate taxes.
+    Expects taxpayer_data dict with keys: 'w2s', '1099ints', '1099necs', 'filing_status'.
+    A TaxReturn is calculated from its maintained totals. For dicts kept up to
+    date through the tax_return adders, use_totals=True reads 'totals' instead
+    of re-summing every form.
+    """
+    if isinstance(taxpayer_data, TaxReturn):
+        return _calculate_tax_return(taxpayer_data, year)
+
+    filing_status = taxpayer_data.get("taxpayer", {}).get("filing_status")
+
+    # --- Step 1: Gross Income ---
+    if use_totals:
+        totals = taxpayer_data["totals"]
+        wages = totals["wages"]
+        interest_income = totals["interest_income"]
+        self_employment_income = totals["self_employment_income"]
+        gross_income = wages + interest_income + self_employment_income
+    else:
+        w2s = taxpayer_data.get("w2s", [])
+        ints = taxpayer_data.get("1099ints", [])
+        necs = taxpayer_data.get("1099necs", [])
+        wages, interest_income, self_employment_income, gross_income = calculate_gross_income(w2s, ints, necs)
+
+    # --- Steps 2 & 3: Taxable Income and Tax Owed ---
+    standard_deduction, taxable_income, tax_owed = _income_and_tax(gross_income, filing_status, year)
+
+    # --- Step 4: Federal Withholding ---
+    if use_totals:
+        total_withheld = totals["federal_tax_withheld"]
+    else:
+        total_withheld = calculate_total_withholding(w2s, ints, necs)
+
+    return _summary(wages, interest_income, self_employment_income, gross_income,
+                    standard_deduction, taxable_income, tax_owed, total_withheld)
+
+
+# ------------------------
+# Vectorized batch engine
+# ------------------------
+def calculate_tax_owed_batch(taxable_income, filing_status, year):
+    """Vectorized calculate_tax_owed for one filing status/year: searchsorted over bracket minimums."""
+    import numpy as np
+
+    taxable_income = np.asarray(taxable_income, dtype=float)
+    mins, widths, rates, cumulative = TAX_CONFIG[year].bracket_table(filing_status).arrays
+    if mins.size == 0:
+        return np.zeros_like(taxable_income)
+    # Last bracket whose minimum is strictly below the income (the scalar loop uses '>')
+    idx = np.searchsorted(mins, taxable_income, side="left") - 1
+    in_brackets = idx >= 0
+    idx = np.maximum(idx, 0)
+    amount_taxable = np.minimum(taxable_income - mins[idx], widths[idx])
+    return np.where(in_brackets, cumulative[idx] + amount_taxable * rates[idx], 0.0)
+
+
+def round_cents(values):
+    """
+    np.round(values, 2) with Python round() semantics. NumPy scales by 100
+    before rounding, which disagrees with round() near half-cent ties, so
+    those few elements are re-rounded with round() itself.
+    """
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    frac = scaled - np.floor(scaled)
+    tolerance = np.maximum(1e-6, 8 * np.spacing(np.abs(scaled)))
+    ties = np.flatnonzero(np.abs(frac - 0.5) <= tolerance)
+    if ties.size:
+        rounded[ties] = [round(v, 2) for v in values[ties].tolist()]
+    return rounded
+
+
+def _is_dictionary(values):
+    # A pyarrow DictionaryArray (e.g. from backend.columnar) is already factorized
+    return hasattr(values, "dictionary") and hasattr(values, "indices")
+
+
+def _factorize(values, n):
+    """(distinct values in first-seen order, int code per row) for a column or a scalar, broadcast to n rows."""
+    import numpy as np
+
+    if _is_dictionary(values):
+        labels, codes = values.dictionary.to_pylist(), values.indices.to_numpy(zero_copy_only=False).astype(np.intp)
+    elif np.ndim(values) == 0:
+        labels, codes = [values.item() if isinstance(values, np.generic) else values], np.zeros(1, dtype=np.intp)
+    else:
+        seen = {}
+        codes = np.fromiter((seen.setdefault(v, len(seen)) for v in np.asarray(values).tolist()), dtype=np.intp)
+        labels = list(seen)
+    return labels, np.broadcast_to(codes, (n,))
+
+
+@metrics.timed("tax_calc_batch")
+def calculate_taxes_batch(wages, interest_income, self_employment_income,
+                          federal_tax_withheld, filing_status, year):
+    """
+    Calculate taxes for many returns at once from columnar inputs.
+
+    Every argument is an array (or scalar, broadcast) with one entry per
+    return: summed W-2 wages, 1099-INT interest, 1099-NEC income, total
+    federal withholding, filing status and tax year. Returns a dict of
+    arrays with the same keys as calculate_taxes, matching it to the cent.
+    """
+    import numpy as np
+
+    amounts = [np.asarray(col, dtype=float) for col in
+               (wages, interest_income, self_employment_income, federal_tax_withheld)]
+    # The row count comes from every input, so scalar amounts with a column of statuses work too
+    shape = np.broadcast_shapes(*(col.shape for col in amounts),
+                                *((len(col),) if _is_dictionary(col) else np.shape(col)
+                                  for col in (filing_status, year)))
+    if len(shape) > 1:
+        raise ValueError(f"Inputs must be scalars or 1-d columns, got shape {shape}")
+    n = shape[0] if shape else 1
+    wages, interest_income, self_employment_income, federal_tax_withheld = (
+        np.broadcast_to(col, (n,)) for col in amounts
+    )
+    years, year_codes = _factorize(year, n)
+    statuses, status_codes = _factorize(filing_status, n)
+
+    # --- Step 1: Gross Income ---
+    gross_income = wages + interest_income + self_employment_income
+
+    # --- Steps 2 & 3: Taxable Income and Tax Owed, per (year, filing status) group ---
+    group_codes = year_codes * len(statuses) + status_codes
+    groups = [(years[code // len(statuses)], statuses[code % len(statuses)], np.flatnonzero(group_codes == code))
+              for code in np.unique(group_codes)]
+
+    standard_deduction = np.zeros(n)
+    for yr, status, rows in groups:
+        standard_deduction[rows] = TAX_CONFIG[yr].standard_deduction(status)
+    taxable_income = np.maximum(0.0, gross_income - standard_deduction)
+
+    tax_owed = np.zeros(n)
+    for yr, status, rows in groups:
+        tax_owed[rows] = calculate_tax_owed_batch(taxable_income[rows], status, yr)
+
+    # --- Steps 4 & 5: Withholding and Refund / Amount Due ---
+    refund_or_amount_due = federal_tax_withheld - tax_owed
+
+    return {
+        "gross_income": round_cents(gross_income),
+        "wages": round_cents(wages),
+        "interest_income": round_cents(interest_income),
+        "self_employment_income": round_cents(self_employment_income),
+        "standard_deduction": round_cents(standard_deduction),
+        "taxable_income": round_cents(taxable_income),
+        "tax_owed": round_cents(tax_owed),
+        "federal_tax_withheld": round_cents(federal_tax_withheld),
+        "refund_or_amount_due": round_cents(refund_or_amount_due)
+    }
+
 
 # Example usage:
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+"""
+Cheap form-type classification for uploaded PDFs.
+
+Reads only the first page's text layer (no markdown conversion, no layout
+analysis) and scores a handful of keyword probes to decide whether a
+document is a W-2, 1099-INT or 1099-NEC.
+"""
+from typing import Any, Dict, List, Tuple
+import re
+
+from . import metrics
+from .ocr import document_key, page_text
+from .pdf_loader import opened_pdf
+
+FORM_W2 = "w2"
+FORM_1099_INT = "1099_int"
+FORM_1099_NEC = "1099_nec"
+FORM_UNKNOWN = "unknown"
+
+# (form type, probe, weight). Form titles are decisive, box labels only hint.
+FORM_PROBES: List[Tuple[str, "re.Pattern[str]", int]] = [
+    (FORM_W2, re.compile(r"\bW-?2\b"), 3),
+    (FORM_W2, re.compile(r"Wage\s+and\s+Tax\s+Statement", re.IGNORECASE), 3),
+    (FORM_W2, re.compile(r"Wages,\s*tips,\s*other\s+comp", re.IGNORECASE), 1),
+    (FORM_W2, re.compile(r"Employer\s+identification\s+number", re.IGNORECASE), 1),
+    (FORM_1099_INT, re.compile(r"1099-?INT\b", re.IGNORECASE), 3),
+    (FORM_1099_INT, re.compile(r"Interest\s+Income", re.IGNORECASE), 1),
+    (FORM_1099_INT, re.compile(r"Early\s+withdrawal\s+penalty", re.IGNORECASE), 1),
+    (FORM_1099_NEC, re.compile(r"1099-?NEC\b", re.IGNORECASE), 3),
+    (FORM_1099_NEC, re.compile(r"Nonemployee\s+compensation", re.IGNORECASE), 2),
+]
+
+
+def classify_text(text: str) -> str:
+    """Classify a form from its (first page) text; FORM_UNKNOWN if nothing matches."""
+    scores: Dict[str, int] = {}
+    for form_type, probe, weight in FORM_PROBES:
+        if probe.search(text):
+            scores[form_type] = scores.get(form_type, 0) + weight
+    if not scores:
+        return FORM_UNKNOWN
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if len(ranked) > 1 and ranked[0][1] == ranked[1][1]:
+        return FORM_UNKNOWN  # ambiguous, don't guess
+    return ranked[0][0]
+
+
+@metrics.timed("classify")
+def classify_pdf(pdf_file: Any) -> str:
+    """Classify an upload from its first page's text layer (or OCR text, for a scan)."""
+    with opened_pdf(pdf_file) as doc:
+        if doc.page_count == 0:
+            return FORM_UNKNOWN
+        return classify_text(page_text(doc, 0, document_key(pdf_file)))
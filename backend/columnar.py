@@ -0,0 +1,351 @@
+"""
+Columnar (Arrow / Parquet) export and import of extracted forms and tax
+summaries, for season-wide analytics and reconciliation.
+
+    with FormWriter("forms.parquet") as forms, SummaryWriter("summaries.parquet") as summaries:
+        forms.add_tax_return(tax_return, return_id="c001", tax_year="2024")
+        summaries.add(tax_summary, return_id="c001", tax_year="2024", filing_status="single")
+
+    totals = return_totals(read_table("forms.parquet"), read_table("summaries.parquet"))
+    recomputed = recompute(totals)          # summary_schema() table, one row per return
+
+Every file has a fixed schema (form_schema() or summary_schema()): W-2s and
+1099s share one form table, with the fields no extractor produces left
+null. Rows are buffered per column and written one record batch at a time,
+to Parquet (.parquet) or the Arrow IPC file format (.arrow / .feather).
+Reading memory-maps the file (zero-copy for Arrow IPC), and return_totals /
+recompute stay in Arrow compute and numpy: per-return sums are an Arrow
+group-by and the tax math is calculate_taxes_batch, so no Python runs per
+row on the way back.
+"""
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import importlib.util
+import os
+
+from .calculate_taxes import calculate_taxes_batch
+from .tax_return import TaxReturn
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+INSTALL_HINT = "pip install 'ai-tax-agent[columnar]'"
+
+FORMAT_PARQUET = "parquet"
+FORMAT_ARROW = "arrow"
+DEFAULT_BATCH_ROWS = 64 * 1024
+DEFAULT_COMPRESSION = "zstd"
+
+def columnar_available() -> bool:
+    """True when pyarrow (the 'columnar' extra) is installed; checked without importing it."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+# form type -> tax_return list key
+FORM_LISTS = {"w2": "w2s", "1099_int": "1099ints", "1099_nec": "1099necs"}
+
+# (name, arrow type name); the schemas themselves are built on first use so importing stays cheap
+FORM_COLUMNS = (
+    ("return_id", "string"),
+    ("tax_year", "string"),
+    ("form_type", "string"),
+    ("source_file", "string"),
+    ("page", "int32"),
+    ("ssn", "string"),
+    ("first_name", "string"),
+    ("last_name", "string"),
+    ("employer_name", "string"),
+    ("employer_ein", "string"),
+    ("payer_name", "string"),
+    ("payer_tin", "string"),
+    ("recipient_tin", "string"),
+    ("wages", "float64"),
+    ("interest_income", "float64"),
+    ("nonemployee_compensation", "float64"),
+    ("federal_tax_withheld", "float64"),
+    ("state_tax_withheld", "float64"),
+    ("error", "string"),
+)
+# Amount columns summed per return, and the calculate_taxes input each feeds
+AMOUNT_TOTALS = (
+    ("wages", "wages"),
+    ("interest_income", "interest_income"),
+    ("nonemployee_compensation", "self_employment_income"),
+    ("federal_tax_withheld", "federal_tax_withheld"),
+)
+SUMMARY_COLUMNS = (
+    ("return_id", "string"),
+    ("tax_year", "string"),
+    ("filing_status", "string"),
+    ("gross_income", "float64"),
+    ("wages", "float64"),
+    ("interest_income", "float64"),
+    ("self_employment_income", "float64"),
+    ("standard_deduction", "float64"),
+    ("taxable_income", "float64"),
+    ("tax_owed", "float64"),
+    ("federal_tax_withheld", "float64"),
+    ("refund_or_amount_due", "float64"),
+)
+RETURN_KEY_COLUMNS = ("return_id", "tax_year", "filing_status")
+
+
+def _schema(columns: Sequence[Tuple[str, str]]) -> "pa.Schema":
+    import pyarrow as pa
+
+    return pa.schema([pa.field(name, getattr(pa, type_name)()) for name, type_name in columns])
+
+
+def form_schema() -> "pa.Schema":
+    return _schema(FORM_COLUMNS)
+
+
+def summary_schema() -> "pa.Schema":
+    return _schema(SUMMARY_COLUMNS)
+
+
+def file_format(path: Any) -> str:
+    """'parquet' for *.parquet / *.pq, otherwise the Arrow IPC file format."""
+    return FORMAT_PARQUET if str(path).lower().endswith((".parquet", ".pq")) else FORMAT_ARROW
+
+
+# ------------------------
+# Writing
+# ------------------------
+class ColumnarWriter:
+    """
+    Append rows (dicts) to a Parquet or Arrow IPC file with a fixed schema.
+
+    Rows are buffered per column and flushed as one record batch every
+    batch_rows rows (and on close); keys not in the schema are ignored and
+    missing ones are null. sink is a path or a writable binary file.
+    """
+
+    def __init__(self, sink: Any, columns: Sequence[Tuple[str, str]],
+                 fmt: Optional[str] = None,
+                 batch_rows: int = DEFAULT_BATCH_ROWS,
+                 compression: Optional[str] = DEFAULT_COMPRESSION):
+        import pyarrow as pa
+
+        self.schema = _schema(columns)
+        self.format = fmt or file_format(sink if isinstance(sink, (str, os.PathLike)) else "")
+        self.batch_rows = batch_rows
+        self.rows_written = 0
+        self._names = [name for name, _ in columns]
+        self._buffer: List[List[Any]] = [[] for _ in self._names]
+        if self.format == FORMAT_PARQUET:
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(sink, self.schema, compression=compression or "none")
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=compression)
+            self._writer = pa.ipc.new_file(sink, self.schema, options=options)
+
+    def append(self, row: Dict[str, Any]) -> None:
+        for name, column in zip(self._names, self._buffer):
+            column.append(row.get(name))
+        if len(self._buffer[0]) >= self.batch_rows:
+            self.flush()
+
+    def append_columns(self, columns: Dict[str, Any]) -> None:
+        """Append many rows at once from arrays or scalars (broadcast), e.g. calculate_taxes_batch output."""
+        import numpy as np
+        import pyarrow as pa
+
+        self.flush()
+        n = max((np.size(value) for value in columns.values() if np.ndim(value)), default=1)
+        arrays = []
+        for field in self.schema:
+            value = columns.get(field.name)
+            if value is None:
+                arrays.append(pa.nulls(n, field.type))
+            elif np.ndim(value) == 0:
+                arrays.append(pa.array(np.full(n, value, dtype=object), field.type))
+            else:
+                arrays.append(pa.array(value, field.type))
+        self._write(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def flush(self) -> None:
+        if not self._buffer[0]:
+            return
+        import pyarrow as pa
+
+        arrays = [pa.array(values, field.type) for values, field in zip(self._buffer, self.schema)]
+        self._buffer = [[] for _ in self._names]
+        self._write(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def _write(self, batch: "pa.RecordBatch") -> None:
+        if self.format == FORMAT_PARQUET:
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write(batch)
+        self.rows_written += batch.num_rows
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self.flush()
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class FormWriter(ColumnarWriter):
+    """Extracted W-2 / 1099 records, one row per form (form_schema())."""
+
+    def __init__(self, sink: Any, fmt: Optional[str] = None, batch_rows: int = DEFAULT_BATCH_ROWS,
+                 compression: Optional[str] = DEFAULT_COMPRESSION):
+        super().__init__(sink, FORM_COLUMNS, fmt, batch_rows, compression)
+
+    def add(self, form_type: str, form: Dict[str, Any], return_id: Any = None, tax_year: Any = None) -> None:
+        """One extractor result; form_type is 'w2', '1099_int', '1099_nec' (or anything else, kept as is)."""
+        row = dict(form, form_type=form_type)
+        if return_id is not None:
+            row["return_id"] = str(return_id)
+        if tax_year is not None:
+            row["tax_year"] = str(tax_year)
+        if "error" in row:
+            row["error"] = str(row["error"])
+        self.append(row)
+
+    def add_results(self, results: Iterable[Tuple[str, Dict[str, Any]]],
+                    return_id: Any = None, tax_year: Any = None) -> None:
+        """(form type, result) pairs as batch_extract.extract_typed returns them."""
+        for form_type, form in results:
+            self.add(form_type, form, return_id, tax_year)
+
+    def add_tax_return(self, tax_return: Union[Dict[str, Any], TaxReturn],
+                       return_id: Any = None, tax_year: Any = None) -> None:
+        """Every form of a return (a dict from init_tax_return() or a TaxReturn)."""
+        if isinstance(tax_return, TaxReturn):
+            tax_return = tax_return.to_dict()
+        for form_type, key in FORM_LISTS.items():
+            for form in tax_return.get(key) or []:
+                self.add(form_type, form, return_id, tax_year)
+
+
+class SummaryWriter(ColumnarWriter):
+    """calculate_taxes results, one row per return (summary_schema())."""
+
+    def __init__(self, sink: Any, fmt: Optional[str] = None, batch_rows: int = DEFAULT_BATCH_ROWS,
+                 compression: Optional[str] = DEFAULT_COMPRESSION):
+        super().__init__(sink, SUMMARY_COLUMNS, fmt, batch_rows, compression)
+
+    def add(self, tax_summary: Dict[str, Any], return_id: Any = None, tax_year: Any = None,
+            filing_status: Optional[str] = None) -> None:
+        self.append(dict(tax_summary,
+                         return_id=None if return_id is None else str(return_id),
+                         tax_year=None if tax_year is None else str(tax_year),
+                         filing_status=filing_status))
+
+    def add_batch(self, results: Dict[str, Any], return_id: Any = None, tax_year: Any = None,
+                  filing_status: Any = None) -> None:
+        """calculate_taxes_batch output; the ids, years and statuses are arrays or scalars."""
+        self.append_columns(dict(results, return_id=return_id, tax_year=tax_year, filing_status=filing_status))
+
+
+# ------------------------
+# Reading
+# ------------------------
+def read_table(path: Any, columns: Optional[Sequence[str]] = None) -> "pa.Table":
+    """A whole file as one Table, memory-mapped (zero-copy for Arrow IPC)."""
+    import pyarrow as pa
+
+    if file_format(path) == FORMAT_PARQUET:
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path, columns=columns, memory_map=True)
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.select(list(columns)) if columns is not None else table
+
+
+def iter_batches(path: Any, columns: Optional[Sequence[str]] = None) -> Iterator["pa.RecordBatch"]:
+    """Record batches of a file one at a time, for files too big to hold as one table."""
+    import pyarrow as pa
+
+    if file_format(path) == FORMAT_PARQUET:
+        import pyarrow.parquet as pq
+
+        yield from pq.ParquetFile(path, memory_map=True).iter_batches(columns=columns)
+        return
+    with pa.memory_map(str(path), "r") as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            yield batch.select(list(columns)) if columns is not None else batch
+
+
+def _as_table(table: Any) -> "pa.Table":
+    return read_table(table) if isinstance(table, (str, os.PathLike)) else table
+
+
+def return_totals(forms: Any, returns: Any = None, filing_status: Optional[str] = None,
+                  tax_year: Optional[str] = None) -> "pa.Table":
+    """
+    Per-return calculate_taxes inputs from a form table (or file): return_id,
+    tax_year, filing_status, wages, interest_income, self_employment_income
+    and federal_tax_withheld. Forms with an error are left out.
+
+    Filing statuses come from returns (any table with return_id and
+    filing_status, e.g. a summaries file), else the filing_status given;
+    tax_year fills in forms written without one.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    forms = _as_table(forms)
+    forms = forms.filter(pc.is_null(forms["error"]))
+    if tax_year is not None:
+        forms = forms.set_column(forms.schema.get_field_index("tax_year"), "tax_year",
+                                 pc.fill_null(forms["tax_year"], str(tax_year)))
+    grouped = forms.group_by(["return_id", "tax_year"], use_threads=False).aggregate(
+        [(column, "sum") for column, _ in AMOUNT_TOTALS])
+    totals = pa.table([grouped["return_id"], grouped["tax_year"]] +
+                      [grouped[f"{column}_sum"] for column, _ in AMOUNT_TOTALS],
+                      names=["return_id", "tax_year"] + [total for _, total in AMOUNT_TOTALS])
+
+    if returns is not None:
+        returns = _as_table(returns).select(["return_id", "filing_status"])
+        totals = totals.join(returns, "return_id", join_type="left outer", use_threads=False)
+    else:
+        totals = totals.append_column("filing_status", pa.nulls(totals.num_rows, pa.string()))
+    if filing_status is not None:
+        totals = totals.set_column(totals.schema.get_field_index("filing_status"), "filing_status",
+                                   pc.fill_null(totals["filing_status"], filing_status))
+    # A return with forms of one kind only has null sums for the others
+    amounts = [pc.fill_null(totals[total], 0.0) for _, total in AMOUNT_TOTALS]
+    return pa.table([totals[name] for name in RETURN_KEY_COLUMNS] + amounts,
+                    names=list(RETURN_KEY_COLUMNS) + [total for _, total in AMOUNT_TOTALS])
+
+
+def _encoded(column: "pa.ChunkedArray") -> "pa.DictionaryArray":
+    import pyarrow.compute as pc
+
+    return pc.dictionary_encode(column.combine_chunks(), null_encoding="encode")
+
+
+def recompute(table: Any, tax_year: Optional[str] = None) -> "pa.Table":
+    """
+    calculate_taxes_batch over a table (or file) with the return_totals
+    columns, e.g. return_totals() output or a summaries file to re-check
+    against the current tax config (a summary's amounts are already rounded
+    to the cent, so expect a cent of drift there). tax_year overrides the
+    table's years.
+    Returns a summary_schema() table, one row per input row.
+    """
+    import pyarrow as pa
+
+    table = _as_table(table)
+    amounts = [table[total].to_numpy() for _, total in AMOUNT_TOTALS]
+    years = str(tax_year) if tax_year is not None else _encoded(table["tax_year"])
+    results = calculate_taxes_batch(*amounts, _encoded(table["filing_status"]), years)
+    schema = summary_schema()
+    columns = {"return_id": table["return_id"], "filing_status": table["filing_status"],
+               "tax_year": pa.repeat(pa.scalar(str(tax_year)), table.num_rows) if tax_year is not None
+               else table["tax_year"]}
+    columns.update(results)
+    return pa.table([columns[field.name] for field in schema], schema=schema)
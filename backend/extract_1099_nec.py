@@ -1,12 +1,33 @@
 # parsers/parse_1099_nec.py
 from typing import List, Dict, Any
-import tempfile
-import os
-import re
-import pymupdf4llm
-
-
-def _process_single_1099_nec(pdf_file) -> dict:
+from .pdf_loader import pdf_to_markdown
+from .field_scanner import Field, FieldScanner, document_deadline, mark_timed_out
+from .layout_extract import MODE_LAYOUT, MODE_MARKDOWN, build_word_index, check_mode, layout_1099_nec
+from .extraction_cache import cached_extraction
+from .ocr import document_needs_ocr
+from . import metrics
+
+# Bump whenever the extraction logic below changes so cached results are invalidated.
+EXTRACTOR_VERSION = "3"
+
+NEC_SCANNER = FieldScanner([
+    Field("payer", r'\*\*([A-Za-z0-9\s\.,&\'-]+(?:Inc\.|LLC|Corp|N\.A\.)[,\.]?)\*\*', flags=0),
+    Field("recipient_address", r"foreign postal code[<br>\n\|]*\*\*([^*]+)\*\*[<br>\n\|]*\*\*([^*]+)\*\*",
+          anchor="foreign postal code", flags=0, window=512),
+    Field("box1", r"\*\*1\s*\*\*Nonemployee compensation[<br>\n\$\|]*\*\*([0-9,]+\.?\d*)\*\*",
+          anchor=r"\*\*1\s*\*\*Nonemployee compensation", flags=0, window=512),
+    Field("box4", r"\*\*4\s*\*\*Federal income tax withheld[<br>\n\$\|]*\*\*([0-9,]+\.?\d*)\*\*",
+          anchor=r"\*\*4\s*\*\*Federal income tax withheld", flags=0, window=512),
+    Field("box5", r"\*\*5\s*\*\*State tax withheld[<br>\n\$\|]*\*\*([0-9,]+\.?\d*)\*\*",
+          anchor=r"\*\*5\s*\*\*State tax withheld", flags=0, window=512),
+    Field("box7", r"\*\*7\s*\*\*State income[<br>\n\$\|]*\*\*([0-9,]+\.?\d*)\*\*",
+          anchor=r"\*\*7\s*\*\*State income", flags=0, window=512),
+], name="1099_nec")
+
+
+@cached_extraction("1099_nec", EXTRACTOR_VERSION)
+@metrics.timed("extract", form="1099_nec")
+def _process_single_1099_nec(pdf_file, mode: str = MODE_MARKDOWN) -> dict:
     """
     Extract data from a single 1099-NEC PDF file using the existing regex patterns.
     Returns a dictionary compatible with tax_return architecture.
@@ -14,66 +35,65 @@ def _process_single_1099_nec(pdf_file) -> dict:
     if pdf_file is None:
         return {}
 
-    pdf_bytes = pdf_file.read()
-    temp_filepath = None
-
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(pdf_bytes)
-            temp_filepath = tmp_file.name
-
-        text = pymupdf4llm.to_markdown(temp_filepath)
-
-        # Standardized dictionary
-        result = {
-            "source_file": pdf_file.name,
-            "payer_name": None,
-            "recipient_address": None,
-            "nonemployee_compensation": 0.0,  # Box 1
-            "federal_tax_withheld": 0.0,      # Box 4
-            "state_tax_withheld": 0.0,        # Box 5
-            "state_income": 0.0               # Box 7
-        }
-
-        # --- Apply your regex patterns ---
-        # Payer name
-        payer = re.search(r'\*\*([A-Za-z0-9\s\.,&\'-]+(?:Inc\.|LLC|Corp|N\.A\.)[,\.]?)\*\*', text)
-        if payer:
-            result["payer_name"] = payer.group(1).strip()
-
-        # Recipient address
-        recip = re.search(r"foreign postal code[<br>\n\|]*\*\*([^*]+)\*\*[<br>\n\|]*\*\*([^*]+)\*\*", text)
-        if recip:
-            result["recipient_address"] = f"{recip.group(1)}, {recip.group(2)}"
-
-        # Box 1
-        box1 = re.search(r"\*\*1\s*\*\*Nonemployee compensation[<br>\n\$\|]*\*\*([0-9,]+\.?\d*)\*\*", text)
-        if box1:
-            result["nonemployee_compensation"] = float(box1.group(1).replace(',', ''))
-
-        # Box 4
-        box4 = re.search(r"\*\*4\s*\*\*Federal income tax withheld[<br>\n\$\|]*\*\*([0-9,]+\.?\d*)\*\*", text)
-        if box4:
-            result["federal_tax_withheld"] = float(box4.group(1).replace(',', ''))
-
-        # Box 5
-        box5 = re.search(r"\*\*5\s*\*\*State tax withheld[<br>\n\$\|]*\*\*([0-9,]+\.?\d*)\*\*", text)
-        if box5:
-            result["state_tax_withheld"] = float(box5.group(1).replace(',', ''))
-
-        # Box 7
-        box7 = re.search(r"\*\*7\s*\*\*State income[<br>\n\$\|]*\*\*([0-9,]+\.?\d*)\*\*", text)
-        if box7:
-            result["state_income"] = float(box7.group(1).replace(',', ''))
-
-        return result
-
-    finally:
-        if temp_filepath and os.path.exists(temp_filepath):
-            os.unlink(temp_filepath)
-
-
-def extract_1099_nec(pdf_files: List[Any]) -> List[Dict[str, Any]]:
+    check_mode(mode)
+    # Scanned documents have no text for markdown to work with; read their OCR words instead
+    if mode == MODE_LAYOUT or document_needs_ocr(pdf_file):
+        with metrics.timer("layout", form="1099_nec"):
+            return layout_1099_nec(build_word_index(pdf_file), pdf_file.name)
+
+    text = pdf_to_markdown(pdf_file)
+
+    # Standardized dictionary
+    result = {
+        "source_file": pdf_file.name,
+        "payer_name": None,
+        "recipient_address": None,
+        "nonemployee_compensation": 0.0,  # Box 1
+        "federal_tax_withheld": 0.0,      # Box 4
+        "state_tax_withheld": 0.0,        # Box 5
+        "state_income": 0.0               # Box 7
+    }
+
+    # --- Apply your regex patterns ---
+    # Every field is consulted below, so match them all up front where they can be timed
+    with metrics.timer("regex", form="1099_nec"):
+        scanned = NEC_SCANNER.scan(text, document_deadline())  # markdown conversion is not budgeted
+        scan = dict(scanned)
+
+    # Payer name
+    payer = scan["payer"]
+    if payer:
+        result["payer_name"] = payer.group(1).strip()
+
+    # Recipient address
+    recip = scan["recipient_address"]
+    if recip:
+        result["recipient_address"] = f"{recip.group(1)}, {recip.group(2)}"
+
+    # Box 1
+    box1 = scan["box1"]
+    if box1:
+        result["nonemployee_compensation"] = float(box1.group(1).replace(',', ''))
+
+    # Box 4
+    box4 = scan["box4"]
+    if box4:
+        result["federal_tax_withheld"] = float(box4.group(1).replace(',', ''))
+
+    # Box 5
+    box5 = scan["box5"]
+    if box5:
+        result["state_tax_withheld"] = float(box5.group(1).replace(',', ''))
+
+    # Box 7
+    box7 = scan["box7"]
+    if box7:
+        result["state_income"] = float(box7.group(1).replace(',', ''))
+
+    return mark_timed_out(result, scanned)
+
+
+def extract_1099_nec(pdf_files: List[Any], mode: str = MODE_MARKDOWN) -> List[Dict[str, Any]]:
     """
     Process a list of 1099-NEC files and return list of standardized dictionaries.
     """
@@ -84,7 +104,7 @@ def extract_1099_nec(pdf_files: List[Any]) -> List[Dict[str, Any]]:
 
     for file in pdf_files:
         try:
-            data = _process_single_1099_nec(file)
+            data = _process_single_1099_nec(file, mode=mode)
             all_extracted_data.append(data)
         except Exception as e:
             all_extracted_data.append({
@@ -1,11 +1,16 @@
 # parsers/parse_w2.py
-from typing import List, Dict, Any
-import pymupdf4llm
+from typing import List, Dict, Any, Iterator, Optional
 import re
-import fitz  # PyMuPDF
 from .w2_patterns import *  # keep all your regex patterns unchanged
-import tempfile
-import os
+from .pdf_loader import opened_pdf, pages_to_markdown, pdf_to_markdown
+from .field_scanner import Field, FieldScanner, ScanResult, document_deadline, mark_timed_out
+from .layout_extract import MODE_LAYOUT, MODE_MARKDOWN, WordIndex, build_word_index, check_mode, layout_w2
+from .extraction_cache import cached_extraction
+from .ocr import document_key, document_needs_ocr, page_needs_ocr
+from . import metrics
+
+# Bump when parse_w2's output changes in a way the pattern fingerprint does not capture.
+EXTRACTOR_VERSION = "3"
 
 def extract_regex_group(text: str, pattern: str) -> str:
     match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
@@ -20,97 +25,142 @@ def clean_and_convert_to_float(amount_str: str) -> float:
     except ValueError:
         return 0.0
 
-def _get_box_value(markdown: str, pattern: str, key: str, data: Dict) -> None:
-    value_str = extract_regex_group(markdown, pattern)
+# All W-2 fields, compiled once; each pattern is only tried where its anchor occurs, and no
+# further than its window past it. The name and employer fallbacks use tempered tokens (see
+# w2_patterns), so an attempt is linear in its window.
+BOX_WINDOW = 1024
+W2_SCANNER = FieldScanner([
+    # --- Employee Information ---
+    Field('ssn', SSN_PATTERN, anchor='Employee', window=2048),
+    Field('address', ADDRESS_PATTERN, anchor=r"\*\*f\*\*Employee's address and ZIP code", window=1024),
+    Field('name_primary', NAME_PRIMARY_PATTERN, flags=re.DOTALL),
+    Field('name_fallback_first', NAME_FALLBACK_FIRST_PATTERN, anchor='Employee', window=4096),
+    Field('name_fallback_last', NAME_FALLBACK_LAST_PATTERN, anchor='Employee', window=4096),
+    # --- Employer Information ---
+    Field('ein', EIN_PATTERN, anchor=r'Employer\s*identification\s*number', window=1024),
+    Field('employer_info', EMPLOYER_INFO_PATTERN, anchor='Employer', window=4096),
+    Field('control_number', CONTROL_NUM_PATTERN, anchor=r'Control\s*number', window=1024),
+    # --- Wages and Taxes ---
+    Field('wages', BOX_1_WAGES, anchor=r'\*\*1\*\*', window=BOX_WINDOW),
+    Field('federal_tax_withheld', BOX_2_FED_TAX, anchor=r'\*\*2\*\*', window=BOX_WINDOW),
+    Field('ss_wages', BOX_3_SS_WAGES, anchor=r'\*\*3\*\*', window=BOX_WINDOW),
+    Field('ss_tax_withheld', BOX_4_SS_TAX, anchor=r'\*\*4\*\*', window=BOX_WINDOW),
+    Field('medicare_wages', BOX_5_MEDICARE_WAGES, anchor=r'\*\*5\*\*', window=BOX_WINDOW),
+    Field('medicare_tax_withheld', BOX_6_MEDICARE_TAX, anchor=r'\*\*6\*\*', window=BOX_WINDOW),
+    Field('ss_tips', BOX_7_SS_TIPS, anchor=r'\*\*7\*\*', window=BOX_WINDOW),
+    # --- Additional Information ---
+    Field('box_12a_401k', BOX_12A_CODE_D, anchor=r'\*\*12a\*\*', window=BOX_WINDOW),
+    Field('box_14_other', BOX_14_OTHER, anchor=r'\*\*14\*\*', window=BOX_WINDOW),
+    Field('state', BOX_15_STATE, anchor=r'\*\*15\*\*', window=BOX_WINDOW),
+    Field('state_wages', BOX_16_STATE_WAGES, anchor=r'\*\*16\*\*', window=BOX_WINDOW),
+    Field('state_tax_withheld', BOX_17_STATE_TAX, anchor=r'\*\*17\*\*', window=BOX_WINDOW),
+], name="w2")
+
+def _scan(markdown: str, scan: Optional[ScanResult]) -> ScanResult:
+    return scan if scan is not None else W2_SCANNER.scan(markdown)
+
+def _get_box_value(scan: ScanResult, key: str, data: Dict) -> None:
+    value_str = scan.text(key)
     if value_str:
         data[key] = clean_and_convert_to_float(value_str)
 
-def _extract_employee_name(markdown: str) -> Dict[str, str]:
-    name_match = re.search(NAME_PRIMARY_PATTERN, markdown, re.DOTALL)
+def _extract_employee_name(scan: ScanResult) -> Dict[str, str]:
+    name_match = scan['name_primary']
     if name_match:
         first_name = name_match.group(1)
         last_name = name_match.group(2)
     else:
-        first_name = extract_regex_group(markdown, NAME_FALLBACK_FIRST_PATTERN)
-        last_name = extract_regex_group(markdown, NAME_FALLBACK_LAST_PATTERN)
+        first_name = scan.text('name_fallback_first')
+        last_name = scan.text('name_fallback_last')
     if first_name and last_name:
         return {'first_name': first_name, 'last_name': last_name, 'full_name': f"{first_name} {last_name}"}
     return {}
 
-def extract_employee_data(markdown: str) -> Dict[str, Any]:
+def extract_employee_data(markdown: str, scan: Optional[ScanResult] = None) -> Dict[str, Any]:
+    scan = _scan(markdown, scan)
     data: Dict[str, Any] = {}
-    ssn = extract_regex_group(markdown, SSN_PATTERN)
+    ssn = scan.text('ssn')
     if ssn:
         data['ssn'] = ssn.replace(' ', '')
-    address = extract_regex_group(markdown, ADDRESS_PATTERN)
+    address = scan.text('address')
     if address:
         data['address'] = address
-    data.update(_extract_employee_name(markdown))
+    data.update(_extract_employee_name(scan))
     return {'employee': data}
 
-def extract_employer_data(markdown: str) -> Dict[str, Any]:
+def extract_employer_data(markdown: str, scan: Optional[ScanResult] = None) -> Dict[str, Any]:
+    scan = _scan(markdown, scan)
     data: Dict[str, Any] = {}
-    ein = extract_regex_group(markdown, EIN_PATTERN)
+    ein = scan.text('ein')
     if ein:
         data['ein'] = ein.replace(' ', '')
-    employer_info = extract_regex_group(markdown, EMPLOYER_INFO_PATTERN)
+    employer_info = scan.text('employer_info')
     if employer_info:
         parts = [p.strip() for p in employer_info.split(',')]
         if parts:
             data['name'] = parts[0]
             if len(parts) > 1:
                 data['address'] = ', '.join(parts[1:])
-    control_num = extract_regex_group(markdown, CONTROL_NUM_PATTERN)
+    control_num = scan.text('control_number')
     if control_num:
         data['control_number'] = control_num
     return {'employer': data}
 
-def extract_wages_and_taxes(markdown: str) -> Dict[str, Any]:
+def extract_wages_and_taxes(markdown: str, scan: Optional[ScanResult] = None) -> Dict[str, Any]:
+    scan = _scan(markdown, scan)
     data: Dict[str, Any] = {}
-    _get_box_value(markdown, BOX_1_WAGES, 'wages', data)
-    _get_box_value(markdown, BOX_2_FED_TAX, 'federal_tax_withheld', data)
-    _get_box_value(markdown, BOX_3_SS_WAGES, 'ss_wages', data)
-    _get_box_value(markdown, BOX_4_SS_TAX, 'ss_tax_withheld', data)
-    _get_box_value(markdown, BOX_5_MEDICARE_WAGES, 'medicare_wages', data)
-    _get_box_value(markdown, BOX_6_MEDICARE_TAX, 'medicare_tax_withheld', data)
-    _get_box_value(markdown, BOX_7_SS_TIPS, 'ss_tips', data)
+    for key in ('wages', 'federal_tax_withheld', 'ss_wages', 'ss_tax_withheld',
+                'medicare_wages', 'medicare_tax_withheld', 'ss_tips'):
+        _get_box_value(scan, key, data)
     return {'wages_and_taxes': data}
 
-def extract_additional_info(markdown: str) -> Dict[str, Any]:
+def extract_additional_info(markdown: str, scan: Optional[ScanResult] = None) -> Dict[str, Any]:
+    scan = _scan(markdown, scan)
     data: Dict[str, Any] = {}
-    _get_box_value(markdown, BOX_12A_CODE_D, 'box_12a_401k', data)
-    other = extract_regex_group(markdown, BOX_14_OTHER)
+    _get_box_value(scan, 'box_12a_401k', data)
+    other = scan.text('box_14_other')
     if other:
         data['box_14_other'] = other
-    state = extract_regex_group(markdown, BOX_15_STATE)
+    state = scan.text('state')
     if state:
         data['state'] = state
-    _get_box_value(markdown, BOX_16_STATE_WAGES, 'state_wages', data)
-    _get_box_value(markdown, BOX_17_STATE_TAX, 'state_tax_withheld', data)
+    _get_box_value(scan, 'state_wages', data)
+    _get_box_value(scan, 'state_tax_withheld', data)
     return {'additional_info': data}
 
-def parse_w2(pdf_file: Any) -> Dict[str, Any]:
-    """Parse a single W2 PDF into standardized dictionary for tax_return."""
-    temp_filepath = None
-    try:
-        pdf_bytes = pdf_file.read()
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(pdf_bytes)
-            temp_filepath = tmp.name
-        markdown = pymupdf4llm.to_markdown(temp_filepath)
-    finally:
-        if temp_filepath and os.path.exists(temp_filepath):
-            os.unlink(temp_filepath)
-
-    w2_data: Dict[str, Any] = {}
-    w2_data.update(extract_employee_data(markdown))
-    w2_data.update(extract_employer_data(markdown))
-    w2_data.update(extract_wages_and_taxes(markdown))
-    w2_data.update(extract_additional_info(markdown))
+@cached_extraction("w2", f"{EXTRACTOR_VERSION}-{PATTERNS_VERSION}")
+@metrics.timed("extract", form="w2")
+def parse_w2(pdf_file: Any, mode: str = MODE_MARKDOWN) -> Dict[str, Any]:
+    """
+    Parse a single W2 PDF into standardized dictionary for tax_return.
+    mode='layout' reads word positions instead of converting to markdown.
+    A document over its time budget comes back partial, with 'timed_out'.
+    """
+    check_mode(mode)
+    # Scanned documents have no text for markdown to work with; read their OCR words instead
+    if mode == MODE_LAYOUT or document_needs_ocr(pdf_file):
+        with metrics.timer("layout", form="w2"):
+            return layout_w2(build_word_index(pdf_file), getattr(pdf_file, 'name', None))
+
+    return w2_from_markdown(pdf_to_markdown(pdf_file), getattr(pdf_file, 'name', None))
+
+def w2_from_markdown(markdown: str, source_file: Any) -> Dict[str, Any]:
+    """
+    Scan one W-2's markdown into the flat tax_return record. The time budget
+    starts here, so markdown conversion is not charged to it; past the budget
+    the record comes back partial, with 'timed_out'.
+    """
+    with metrics.timer("regex", form="w2"):
+        scan = W2_SCANNER.scan(markdown, document_deadline())
+        w2_data: Dict[str, Any] = {}
+        w2_data.update(extract_employee_data(markdown, scan))
+        w2_data.update(extract_employer_data(markdown, scan))
+        w2_data.update(extract_wages_and_taxes(markdown, scan))
+        w2_data.update(extract_additional_info(markdown, scan))
 
     # Flatten for tax_return compatibility
     final_w2 = {
-        'source_file': getattr(pdf_file, 'name', None),
+        'source_file': source_file,
         'first_name': w2_data['employee'].get('first_name'),
         'last_name': w2_data['employee'].get('last_name'),
         'ssn': w2_data['employee'].get('ssn'),
@@ -123,13 +173,51 @@ def parse_w2(pdf_file: Any) -> Dict[str, Any]:
         'state_tax_withheld': w2_data['additional_info'].get('state_tax_withheld', 0.0)
     }
 
-    return final_w2
+    return mark_timed_out(final_w2, scan)
+
+# ------------------------
+# Streaming: one W-2 per page (group) of a bulk employer PDF
+# ------------------------
+def _is_w2(record: Dict[str, Any]) -> bool:
+    # Cover letters, instructions and blank separator pages match none of these
+    return bool(record.get('ssn') or record.get('employer_ein') or record.get('wages'))
+
+def iter_w2_pages(pdf_file: Any, mode: str = MODE_MARKDOWN, pages_per_w2: int = 1,
+                  start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield one W-2 record per group of pages_per_w2 pages in
+    [start, stop), for PDFs that hold a W-2 per employee. Only one page group
+    is converted at a time, so memory stays flat however long the file is.
+    Records carry 'page' (1-based first page of the group); pages with no
+    W-2 on them are skipped. Open big files with pdf_loader.mapped_pdf.
+    """
+    check_mode(mode)
+    name = getattr(pdf_file, 'name', None)
+    doc_key = document_key(pdf_file)
+    with opened_pdf(pdf_file) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for first in range(start, stop, pages_per_w2):
+            pages = range(first, min(first + pages_per_w2, stop))
+            try:
+                # Scanned pages go through OCR words and the layout engine; the rest stay on markdown
+                if mode == MODE_LAYOUT or any(page_needs_ocr(doc[page_no]) for page_no in pages):
+                    with metrics.timer("layout", form="w2"):
+                        record = layout_w2(WordIndex.from_document(doc, pages, doc_key), name)
+                else:
+                    record = w2_from_markdown(pages_to_markdown(doc, pages), name)  # own budget per W-2
+            except Exception as e:
+                record = {"source_file": name, "error": f"Failed to extract data: {e}"}
+            else:
+                if not _is_w2(record) and not record.get('timed_out'):
+                    continue
+            record['page'] = first + 1
+            yield record
 
-def extract_all_w2(pdf_files: List[Any]) -> List[Dict[str, Any]]:
+def extract_all_w2(pdf_files: List[Any], mode: str = MODE_MARKDOWN) -> List[Dict[str, Any]]:
     all_extracted_data = []
     for file in pdf_files:
         try:
-            data = parse_w2(file)
+            data = parse_w2(file, mode=mode)
             all_extracted_data.append(data)
         except Exception as e:
             all_extracted_data.append({
@@ -0,0 +1,222 @@
+"""
+Content-addressed cache for extraction results.
+
+Keys are a hash of the PDF bytes plus the extractor name and version, so a
+re-uploaded document (Streamlit rerun, corrected return reopened, ...) skips
+markdown conversion and regex matching entirely. There is a bounded
+in-process LRU tier and an optional on-disk tier that worker processes can
+share; the disk tier is capped by total size and evicts least recently used
+entries first.
+"""
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import threading
+
+from . import metrics
+from .pdf_loader import pdf_buffer
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+CACHE_DIR_ENV = "TAX_AGENT_CACHE_DIR"
+
+
+def content_hash(pdf_file: Any) -> str:
+    """sha256 of the upload's bytes, computed over its buffer without copying."""
+    return hashlib.sha256(pdf_buffer(pdf_file)).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Two-tier (memory LRU + optional disk) cache of extraction result dicts.
+    Safe to use from several threads; the disk tier is safe to share between
+    processes because every write is an atomic rename.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 disk_dir: Optional[str] = None,
+                 max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes_estimate: Optional[int] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ------------------------
+    # Public API
+    # ------------------------
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._disk_get(key) if self.disk_dir else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory_put(key, value)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._memory_put(key, value)
+        if self.disk_dir:
+            self._disk_put(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._memory),
+            }
+
+    # ------------------------
+    # Memory tier
+    # ------------------------
+    def _memory_put(self, key: str, value: Dict[str, Any]) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # ------------------------
+    # Disk tier
+    # ------------------------
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r") as f:
+                value = json.load(f)
+            os.utime(path)  # mark as recently used for eviction
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key: str, value: Dict[str, Any]) -> None:
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except (OSError, TypeError, ValueError):
+            return
+
+        with self._lock:
+            if self._disk_bytes_estimate is None:
+                self._disk_bytes_estimate = self._disk_usage()
+            else:
+                self._disk_bytes_estimate += size
+            over_budget = self._disk_bytes_estimate > self.max_disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield st.st_mtime, st.st_size, path
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._disk_files())
+
+    def _evict_disk(self) -> None:
+        """Drop least recently used files until we are back under 90% of the cap."""
+        entries = sorted(self._disk_files())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_disk_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass  # another process got there first
+            total -= size
+        with self._lock:
+            self._disk_bytes_estimate = total
+
+
+# Process-wide cache used by the extractors. Forked workers inherit it; set
+# TAX_AGENT_CACHE_DIR so spawned workers share the disk tier as well.
+EXTRACTION_CACHE = ExtractionCache(disk_dir=os.environ.get(CACHE_DIR_ENV) or None)
+
+
+def configure_extraction_cache(max_entries: int = DEFAULT_MAX_ENTRIES,
+                               disk_dir: Optional[str] = None,
+                               max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES) -> ExtractionCache:
+    """Replace the process-wide cache, e.g. to enable the disk tier."""
+    global EXTRACTION_CACHE
+    EXTRACTION_CACHE = ExtractionCache(max_entries, disk_dir, max_disk_bytes)
+    return EXTRACTION_CACHE
+
+
+def cached_extraction(extractor: str, version: str) -> Callable:
+    """
+    Decorator for single-document parsers (pdf_file -> result dict).
+    Results are cached by content hash + extractor + version; a hit comes back
+    as a fresh copy with source_file set to the current upload's name.
+    """
+    def decorator(parse: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+        signature = inspect.signature(parse)
+
+        @wraps(parse)
+        def wrapper(pdf_file: Any, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+            if pdf_file is None:
+                return parse(pdf_file, *args, **kwargs)
+
+            # Key on the options as the parser sees them: parse(f) and parse(f, mode="markdown")
+            # are the same call, however the options were passed
+            bound = signature.bind(pdf_file, *args, **kwargs)
+            bound.apply_defaults()
+            options = ",".join(f"{k}={v}" for k, v in list(bound.arguments.items())[1:])
+            key = hashlib.sha256(
+                f"{content_hash(pdf_file)}|{extractor}|{version}|{options}".encode()
+            ).hexdigest()
+
+            cache = EXTRACTION_CACHE
+            cached = cache.get(key)
+            metrics.inc("extraction_cache_requests_total", extractor=extractor,
+                        result="miss" if cached is None else "hit")
+            if cached is None:
+                cached = parse(pdf_file, *args, **kwargs)
+                if not cached.get("timed_out"):
+                    # A partial result depends on how busy the machine was; let a retry try again
+                    cache.put(key, cached)
+
+            result = dict(cached)
+            result["source_file"] = getattr(pdf_file, 'name', None)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,220 @@
+"""
+Compiled field scanner for extracted markdown.
+
+The extractors used to run ~20 uncompiled re.search calls, each walking the
+whole document looking for a place to start, and patterns like
+'Employee.*?address.*?ZIP.*?' backtrack through every combination of label
+positions when a field is missing. Every one of those patterns begins with a
+fixed anchor though: a bold box label like **1** or a label such as
+"Employer identification number". FieldScanner compiles each field once and
+tries its pattern only where its anchor occurs.
+
+Results are identical to re.search: the leftmost match has to start on an
+anchor, and we try anchors left to right. When the anchor is followed by a
+DOTALL '.*?', any match from a later anchor is also a match from the first
+one, so only the first anchor needs trying and a missing field fails after a
+single attempt instead of one per occurrence. A field can optionally be
+given a window to confine how far past its anchor the pattern may run.
+
+Python's re can't be interrupted mid-match, so time budgets work between
+attempts: windows keep every single attempt small, and a scan stops trying
+further anchors for a field once that field has used its pattern budget or
+the document has passed its deadline. Fields given up on that way read as
+no match and are listed in ScanResult.timed_out (see mark_timed_out), and
+every overrun is counted in extract_budget_overruns_total.
+"""
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import os
+import re
+import time
+
+from . import metrics
+
+DEFAULT_FLAGS = re.IGNORECASE | re.DOTALL
+
+# Time budgets in milliseconds; 0 disables one
+DOCUMENT_BUDGET_ENV = "TAX_AGENT_DOCUMENT_BUDGET_MS"
+PATTERN_BUDGET_ENV = "TAX_AGENT_PATTERN_BUDGET_MS"
+DEFAULT_DOCUMENT_BUDGET_MS = 10000.0
+DEFAULT_PATTERN_BUDGET_MS = 250.0
+
+
+def _budget_seconds(env: str, default_ms: float) -> Optional[float]:
+    value = os.environ.get(env)
+    ms = float(value) if value else default_ms
+    return ms / 1000.0 if ms > 0 else None
+
+
+def document_deadline(budget_ms: Optional[float] = None) -> Optional[float]:
+    """perf_counter() time by which a document starting now must be scanned (None = no limit)."""
+    budget = budget_ms / 1000.0 if budget_ms is not None else _budget_seconds(DOCUMENT_BUDGET_ENV,
+                                                                             DEFAULT_DOCUMENT_BUDGET_MS)
+    return time.perf_counter() + budget if budget else None
+
+
+class Field(NamedTuple):
+    """
+    One value to pull out of the markdown.
+
+    key:     name of the field in the scan result
+    pattern: regex with the value in group 1 (or several groups)
+    anchor:  regex the pattern starts with, e.g. r'\\*\\*1\\*\\*' or 'Employee';
+             must not be able to overlap itself. None = plain compiled search.
+    flags:   re flags for the pattern (the anchor is found with the same flags)
+    window:  max characters past the anchor the match may span (None = no limit)
+    """
+    key: str
+    pattern: str
+    anchor: Optional[str] = None
+    flags: int = DEFAULT_FLAGS
+    window: Optional[int] = None
+
+
+class _CompiledField(NamedTuple):
+    field: Field
+    regex: "re.Pattern[str]"
+    anchor: Optional["re.Pattern[str]"]
+    first_anchor_only: bool
+
+
+class FieldScanner:
+    """
+    Compiles a set of Fields once; scan(text) returns a lazy ScanResult
+    mapping {key: Match or None}. Fields sharing an anchor share its lookups.
+    name labels the overrun counters (e.g. the form type); pattern_budget_ms
+    defaults to TAX_AGENT_PATTERN_BUDGET_MS.
+    """
+
+    def __init__(self, fields: Sequence[Field], name: Optional[str] = None,
+                 pattern_budget_ms: Optional[float] = None):
+        self.fields = list(fields)
+        self.name = name
+        if pattern_budget_ms is None:
+            self.pattern_budget = _budget_seconds(PATTERN_BUDGET_ENV, DEFAULT_PATTERN_BUDGET_MS)
+        else:
+            self.pattern_budget = pattern_budget_ms / 1000.0 if pattern_budget_ms > 0 else None
+        anchors: Dict[Tuple[str, int], "re.Pattern[str]"] = {}
+        self._compiled: Dict[str, _CompiledField] = {}
+        for field in self.fields:
+            anchor = None
+            first_only = False
+            if field.anchor is not None:
+                if not field.pattern.startswith(field.anchor):
+                    raise ValueError(f"Pattern for '{field.key}' does not start with its anchor")
+                anchor_key = (field.anchor, field.flags)
+                if anchor_key not in anchors:
+                    anchors[anchor_key] = re.compile(field.anchor, field.flags)
+                anchor = anchors[anchor_key]
+                # A window can cut the first anchor's match short where a later anchor's would fit
+                first_only = (field.window is None and bool(field.flags & re.DOTALL)
+                              and field.pattern[len(field.anchor):].startswith(".*?"))
+            self._compiled[field.key] = _CompiledField(
+                field, re.compile(field.pattern, field.flags), anchor, first_only
+            )
+
+    def scan(self, text: str, deadline: Optional[float] = None) -> "ScanResult":
+        """deadline: perf_counter() time (see document_deadline) after which no more matching is tried."""
+        return ScanResult(self, text, deadline)
+
+
+class ScanResult(Mapping):
+    """
+    Lazy {key: Match or None} view over one document. Fields are matched on
+    first lookup, so fallbacks that are never consulted (e.g. a secondary
+    name pattern) cost nothing, and anchor positions are found once and
+    shared between fields.
+    """
+
+    def __init__(self, scanner: FieldScanner, text: str, deadline: Optional[float] = None):
+        self._scanner = scanner
+        self._text = text
+        self._deadline = deadline
+        self._matches: Dict[str, Optional["re.Match[str]"]] = {}
+        self._anchor_state: Dict["re.Pattern[str]", list] = {}
+        self._document_overrun = False
+        self.timed_out: List[str] = []   # fields given up on for lack of time
+
+    def __getitem__(self, key: str) -> Optional["re.Match[str]"]:
+        if key not in self._matches:
+            self._matches[key] = self._match(self._scanner._compiled[key])
+        return self._matches[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._scanner._compiled)
+
+    def __len__(self) -> int:
+        return len(self._scanner._compiled)
+
+    def text(self, key: str, group: int = 1) -> Optional[str]:
+        """Stripped text of a field's match group, or None (mirrors extract_regex_group)."""
+        match = self[key]
+        return match.group(group).strip() if match else None
+
+    def _positions(self, anchor: "re.Pattern[str]") -> Iterator[int]:
+        """Anchor start positions in order, searched for lazily and memoized."""
+        # state: [positions found so far, where to resume searching (None once exhausted)]
+        state = self._anchor_state.setdefault(anchor, [[], 0])
+        positions = state[0]
+        i = 0
+        while True:
+            if i < len(positions):
+                yield positions[i]
+                i += 1
+                continue
+            if state[1] is None:
+                return
+            m = anchor.search(self._text, state[1])
+            if m is None:
+                state[1] = None
+                return
+            positions.append(m.start())
+            state[1] = max(m.end(), m.start() + 1)
+
+    def _out_of_time(self, key: str, started: float) -> bool:
+        """True (and counted) once the document is past its deadline or this field has used its budget."""
+        now = time.perf_counter()
+        pattern_budget = self._scanner.pattern_budget
+        if self._deadline is not None and now > self._deadline:
+            if not self._document_overrun:
+                # Counted once per document, however many fields it cuts short
+                self._document_overrun = True
+                metrics.inc("extract_budget_overruns_total", form=self._scanner.name, scope="document")
+        elif pattern_budget is None or now - started <= pattern_budget:
+            return False
+        else:
+            metrics.inc("extract_budget_overruns_total", form=self._scanner.name, scope="pattern", field=key)
+        self.timed_out.append(key)
+        return True
+
+    def _match(self, compiled: _CompiledField) -> Optional["re.Match[str]"]:
+        text = self._text
+        key = compiled.field.key
+        started = time.perf_counter()
+        if self._deadline is not None and self._out_of_time(key, started):
+            return None
+        if compiled.anchor is None:
+            match = compiled.regex.search(text)
+            pattern_budget = self._scanner.pattern_budget
+            if pattern_budget is not None and time.perf_counter() - started > pattern_budget:
+                # Nowhere to stop a plain search early, but a slow one still gets counted
+                metrics.inc("extract_budget_overruns_total", form=self._scanner.name, scope="pattern", field=key)
+            return match
+        n = len(text)
+        window = compiled.field.window
+        for pos in self._positions(compiled.anchor):
+            end = n if window is None else min(n, pos + window)
+            match = compiled.regex.match(text, pos, end)
+            if match or compiled.first_anchor_only:
+                return match
+            if self._out_of_time(key, started):
+                return None
+        return None
+
+
+def mark_timed_out(result: Dict[str, Any], scan: ScanResult) -> Dict[str, Any]:
+    """Flag a partial result whose scan ran out of time with 'timed_out' and an 'error' naming the fields."""
+    if scan.timed_out:
+        result["timed_out"] = True
+        result["error"] = f"Extraction time budget exceeded; gave up on: {', '.join(scan.timed_out)}"
+    return result
@@ -1,6 +1,17 @@
 from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Tuple, Union
+import os
 import re
-from pypdf import PdfReader, PdfWriter
+import threading
+
+from . import metrics
+
+# pypdf is imported where it's used so importing this module stays cheap
+if TYPE_CHECKING:
+    from pypdf import PdfWriter
+
+FORM_1040_TEMPLATE_PATH = Path(__file__).with_name("form_1040_template.pdf")
 
 def parse_address(address_str):
     """
@@ -73,6 +84,8 @@ def discover_pdf_field_info(pdf_path):
     """
     Discover all fields in the PDF, and print checkboxes separately.
     """
+    from pypdf import PdfReader
+
     reader = PdfReader(pdf_path)
     fields = reader.get_fields()
     
@@ -101,6 +114,8 @@ def fill_pdf_fields_with_unique_numbers(pdf_path, output_path):
     """
     Fill all form fields with unique numbers for mapping purposes.
     """
+    from pypdf import PdfReader, PdfWriter
+
     reader = PdfReader(pdf_path)
     writer = PdfWriter(clone_from=pdf_path)
 
@@ -122,24 +137,260 @@ def fill_pdf_fields_with_unique_numbers(pdf_path, output_path):
     writer.write(output_path)
     print(f"All fields filled with unique numbers and saved to {output_path}")
 
-def fill_1040_pdf(file_path, taxpayer_profile, tax_summary):
-    writer = PdfWriter(clone_from=file_path)
+# ------------------------
+# Logical 1040 lines -> template fields
+# ------------------------
+FORM_1040_FIELDS = {
+    # Name, SSN & address
+    "first_name": 'topmostSubform[0].Page1[0].f1_04[0]',
+    "last_name": 'topmostSubform[0].Page1[0].f1_05[0]',
+    "ssn": 'topmostSubform[0].Page1[0].f1_06[0]',
+    "street": 'topmostSubform[0].Page1[0].Address_ReadOrder[0].f1_10[0]',
+    "apt": 'topmostSubform[0].Page1[0].Address_ReadOrder[0].f1_11[0]',
+    "city": 'topmostSubform[0].Page1[0].Address_ReadOrder[0].f1_12[0]',
+    "state": 'topmostSubform[0].Page1[0].Address_ReadOrder[0].f1_13[0]',
+    "zip": 'topmostSubform[0].Page1[0].Address_ReadOrder[0].f1_14[0]',
+
+    # Filing status
+    "status_single": 'topmostSubform[0].Page1[0].FilingStatus_ReadOrder[0].c1_3[0]',
+    "status_head_of_household": 'topmostSubform[0].Page1[0].c1_3[0]',
+    "status_married_filing_jointly": 'topmostSubform[0].Page1[0].FilingStatus_ReadOrder[0].c1_3[1]',
+    "status_married_filing_separately": 'topmostSubform[0].Page1[0].FilingStatus_ReadOrder[0].c1_3[2]',
+    "status_qualifying_surviving_spouse": 'topmostSubform[0].Page1[0].c1_3[1]',
+    "status_other": 'topmostSubform[0].Page1[0].c1_4[0]',
+    "spouse_first_name": 'topmostSubform[0].Page1[0].f1_07[0]',
+    "spouse_last_name": 'topmostSubform[0].Page1[0].f1_08[0]',
+    "spouse_ssn": 'topmostSubform[0].Page1[0].f1_09[0]',
+    "mfs_spouse_name": 'topmostSubform[0].Page1[0].f1_18[0]',
+
+    # Digital assets, age & blindness
+    "digital_assets_yes": 'topmostSubform[0].Page1[0].c1_5[0]',
+    "digital_assets_no": 'topmostSubform[0].Page1[0].c1_5[1]',
+    "born_before_1960": 'topmostSubform[0].Page1[0].c1_9[0]',
+    "is_blind": 'topmostSubform[0].Page1[0].c1_10[0]',
+    "spouse_born_before_1960": 'topmostSubform[0].Page1[0].c1_11[0]',
+    "spouse_is_blind": 'topmostSubform[0].Page1[0].c1_12[0]',
+
+    # Dependents: four table rows, plus the box for more than four
+    "dependent_1_name": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row1[0].f1_20[0]',
+    "dependent_1_ssn": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row1[0].f1_21[0]',
+    "dependent_1_relationship": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row1[0].f1_22[0]',
+    "dependent_2_name": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row2[0].f1_23[0]',
+    "dependent_2_ssn": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row2[0].f1_24[0]',
+    "dependent_2_relationship": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row2[0].f1_25[0]',
+    "dependent_3_name": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row3[0].f1_26[0]',
+    "dependent_3_ssn": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row3[0].f1_27[0]',
+    "dependent_3_relationship": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row3[0].f1_28[0]',
+    "dependent_4_name": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row4[0].f1_29[0]',
+    "dependent_4_ssn": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row4[0].f1_30[0]',
+    "dependent_4_relationship": 'topmostSubform[0].Page1[0].Table_Dependents[0].Row4[0].f1_31[0]',
+    "more_than_four_dependents": 'topmostSubform[0].Page1[0].Dependents_ReadOrder[0].c1_13[0]',
+
+    # Income
+    "wages": 'topmostSubform[0].Page1[0].f1_32[0]',                                   # 1a
+    "total_wages": 'topmostSubform[0].Page1[0].f1_41[0]',                             # 1z
+    "taxable_interest": 'topmostSubform[0].Page1[0].f1_43[0]',                        # 2b
+    "other_income": 'topmostSubform[0].Page1[0].Line4a-11_ReadOrder[0].f1_53[0]',     # 8
+    "total_income": 'topmostSubform[0].Page1[0].Line4a-11_ReadOrder[0].f1_54[0]',     # 9
+    "agi": 'topmostSubform[0].Page1[0].Line4a-11_ReadOrder[0].f1_56[0]',              # 11
+    "standard_deduction": 'topmostSubform[0].Page1[0].f1_57[0]',                      # 12
+    "total_deductions": 'topmostSubform[0].Page1[0].f1_59[0]',                        # 14
+    "taxable_income": 'topmostSubform[0].Page1[0].f1_60[0]',                          # 15
+
+    # Tax and payments
+    "tax": 'topmostSubform[0].Page2[0].f2_02[0]',                                     # 16
+    "line_18": 'topmostSubform[0].Page2[0].f2_04[0]',
+    "total_tax": 'topmostSubform[0].Page2[0].f2_10[0]',                               # 24
+    "w2_withholding": 'topmostSubform[0].Page2[0].f2_14[0]',                          # 25d
+    "total_payments": 'topmostSubform[0].Page2[0].f2_22[0]',                          # 33
+    "overpaid": 'topmostSubform[0].Page2[0].f2_23[0]',                                # 34
+    "amount_owed": 'topmostSubform[0].Page2[0].f2_28[0]',                             # 37
+}
+
+
+# ------------------------
+# Pre-parsed template
+# ------------------------
+def _qualified_field_name(field) -> str:
+    """Dotted field name, built the same way pypdf matches it when filling."""
+    if "/TM" in field:
+        return field["/TM"]
+    if "/Parent" in field:
+        return _qualified_field_name(field["/Parent"].get_object()) + "." + field.get("/T", "")
+    return field.get("/T", "")
+
+
+class Form1040Template:
+    """
+    A 1040 template parsed once per process. Each fill clones the parsed
+    objects from memory instead of re-reading the file, and updates every
+    page only with the fields whose widgets live on it.
+    """
+
+    def __init__(self, data: bytes, fields: Dict[str, str] = FORM_1040_FIELDS):
+        from pypdf import PdfReader
+
+        self.reader = PdfReader(BytesIO(data))
+        # Cloning reads through the reader's stream, so one clone at a time
+        self._lock = threading.Lock()
+
+        # qualified field name -> page index, from the widget annotations
+        self.field_pages: Dict[str, int] = {}
+        for page_index, page in enumerate(self.reader.pages):
+            for annotation in page.get("/Annots") or []:
+                annotation = annotation.get_object()
+                if annotation.get("/Subtype") != "/Widget":
+                    continue
+                field = annotation if "/FT" in annotation and "/T" in annotation \
+                    else annotation.get("/Parent", annotation).get_object()
+                self.field_pages.setdefault(_qualified_field_name(field), page_index)
+
+        # logical line -> (page index, field name); lines missing from the template are left out
+        self.lines: Dict[str, Tuple[int, str]] = {
+            line: (self.field_pages[name], name) for line, name in fields.items() if name in self.field_pages
+        }
+
+        self.clone()  # warm the reader's object cache so later clones skip parsing
+
+    def clone(self, incremental: bool = False) -> "PdfWriter":
+        """A writer over the template; incremental keeps its object numbers for an incremental update."""
+        from pypdf import PdfWriter
+
+        with self._lock:
+            if incremental:
+                return PdfWriter(self.reader, incremental=True)
+            return PdfWriter(clone_from=self.reader)
+
+    def _reset_lock(self) -> None:
+        self._lock = threading.Lock()
+
+    def fill(self, line_values: Dict[str, Any], out: Any = None, incremental: bool = True,
+             compress: bool = False) -> Union[bytes, int]:
+        """
+        Fill logical lines (keys of FORM_1040_FIELDS) and return the PDF bytes,
+        or write them to out (a path or a writable binary stream, written
+        as is with no in-memory copy) and return the number of bytes written.
+
+        incremental=True appends only the changed field objects and their
+        appearance streams to the unchanged template bytes (a PDF incremental
+        update), which keeps the template's compressed object streams as they
+        are; incremental=False rewrites the whole document, and compress=True
+        then drops duplicate and unreferenced objects from it (an increment
+        has nothing left to compress: its only streams are ~100-byte
+        appearance streams that Flate makes bigger).
+        """
+        by_page: Dict[int, Dict[str, Any]] = {}
+        for line, value in line_values.items():
+            target = self.lines.get(line)
+            if target is not None:
+                page_index, name = target
+                by_page.setdefault(page_index, {})[name] = value
+
+        with metrics.timer("1040_clone"):
+            writer = self.clone(incremental)
+        with metrics.timer("1040_fields"):
+            for page_index, page_fields in sorted(by_page.items()):
+                writer.update_page_form_field_values(writer.pages[page_index], page_fields)
+            if compress and not incremental:
+                writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+
+        if out is None:
+            pdf_buffer = BytesIO()
+            self._write(writer, _OutputStream(pdf_buffer), incremental)
+            return pdf_buffer.getvalue()
+        if isinstance(out, (str, os.PathLike)):
+            with open(out, "wb") as f:
+                return self._write(writer, _OutputStream(f), incremental)
+        return self._write(writer, _OutputStream(out), incremental)
+
+    def _write(self, writer: "PdfWriter", stream: "_OutputStream", incremental: bool) -> int:
+        with metrics.timer("1040_write"):
+            if incremental:
+                # The increment is written after the template bytes, read through the shared reader
+                with self._lock:
+                    writer.write(stream)
+            else:
+                writer.write(stream)
+        metrics.inc("output_bytes_total", stream.written, stage="fill_1040")
+        return stream.written
+
+
+class _OutputStream:
+    """
+    Write-through view of a caller's stream whose tell() starts at zero (the
+    xref offsets pypdf writes are positions from the start of the PDF), so
+    any binary stream works, including a socket or one already written to.
+    """
+    __slots__ = ("_stream", "written")
+
+    def __init__(self, stream: Any):
+        self._stream = stream
+        self.written = 0
+
+    def write(self, data: bytes) -> int:
+        self._stream.write(data)
+        self.written += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.written
+
+    def flush(self) -> None:
+        flush = getattr(self._stream, "flush", None)
+        if flush is not None:
+            flush()
+
+
+# (resolved path, mtime_ns, size) -> template, so an edited template file is picked up
+_templates: Dict[Tuple[str, int, int], Form1040Template] = {}
+
+
+def load_1040_template(file_path) -> Form1040Template:
+    """The parsed template for a path, parsed on first use in this process."""
+    path = Path(file_path).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    template = _templates.get(key)
+    if template is None:
+        with metrics.timer("1040_template_load"):
+            template = _templates.setdefault(key, Form1040Template(path.read_bytes()))
+    return template
+
+
+def _reset_template_locks() -> None:
+    # A fork can copy a lock mid-clone; give the child fresh ones
+    for template in list(_templates.values()):
+        template._reset_lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_template_locks)
+
+
+@metrics.timed("fill_1040")
+def fill_1040_pdf(file_path, taxpayer_profile, tax_summary, out=None, incremental=True, compress=False):
+    """
+    file_path is the template path or an already loaded Form1040Template.
+    Returns the PDF bytes, or writes them to out (path or binary stream) and
+    returns the byte count; incremental and compress as in Form1040Template.fill.
+    """
+    template = file_path if isinstance(file_path, Form1040Template) else load_1040_template(file_path)
 
     # ------------------------
     # 1. Name & SSN
     # ------------------------
     field_data = {
-        'topmostSubform[0].Page1[0].f1_04[0]': taxpayer_profile["first_name"],
-        'topmostSubform[0].Page1[0].f1_05[0]': taxpayer_profile["last_name"],
-        'topmostSubform[0].Page1[0].f1_06[0]': taxpayer_profile["ssn"],
+        "first_name": taxpayer_profile["first_name"],
+        "last_name": taxpayer_profile["last_name"],
+        "ssn": taxpayer_profile["ssn"],
     }
     # Address
     address_parts = parse_address(taxpayer_profile["address"])
-    field_data["topmostSubform[0].Page1[0].Address_ReadOrder[0].f1_10[0]"] = address_parts["street"]
-    field_data["topmostSubform[0].Page1[0].Address_ReadOrder[0].f1_11[0]"] = address_parts["apt"]
-    field_data["topmostSubform[0].Page1[0].Address_ReadOrder[0].f1_12[0]"] = address_parts["city"]
-    field_data["topmostSubform[0].Page1[0].Address_ReadOrder[0].f1_13[0]"] = address_parts["state"]
-    field_data["topmostSubform[0].Page1[0].Address_ReadOrder[0].f1_14[0]"] = address_parts["zip"]
+    field_data["street"] = address_parts["street"]
+    field_data["apt"] = address_parts["apt"]
+    field_data["city"] = address_parts["city"]
+    field_data["state"] = address_parts["state"]
+    field_data["zip"] = address_parts["zip"]
 
 
     # ------------------------
@@ -147,37 +398,37 @@ def fill_1040_pdf(file_path, taxpayer_profile, tax_summary):
     # ------------------------
     fs = taxpayer_profile.get("filing_status")
     if fs == "single":
-        field_data['topmostSubform[0].Page1[0].FilingStatus_ReadOrder[0].c1_3[0]'] = '/1'
+        field_data["status_single"] = '/1'
     elif fs == "head_of_household":
-        field_data['topmostSubform[0].Page1[0].c1_3[0]'] = '/2'
+        field_data["status_head_of_household"] = '/2'
     elif fs == "married_filing_jointly":
-        field_data['topmostSubform[0].Page1[0].FilingStatus_ReadOrder[0].c1_3[1]'] = '/3'
-        field_data['topmostSubform[0].Page1[0].f1_07[0]'] = taxpayer_profile['spouse_info']['first_name']
-        field_data['topmostSubform[0].Page1[0].f1_08[0]'] = taxpayer_profile['spouse_info']['last_name']
-        field_data['topmostSubform[0].Page1[0].f1_09[0]'] = taxpayer_profile['spouse_info']['ssn']
+        field_data["status_married_filing_jointly"] = '/3'
+        field_data["spouse_first_name"] = taxpayer_profile['spouse_info']['first_name']
+        field_data["spouse_last_name"] = taxpayer_profile['spouse_info']['last_name']
+        field_data["spouse_ssn"] = taxpayer_profile['spouse_info']['ssn']
     elif fs == "married_filing_separately":
-        field_data['topmostSubform[0].Page1[0].FilingStatus_ReadOrder[0].c1_3[2]'] = '/4'
-        field_data['topmostSubform[0].Page1[0].f1_18[0]'] = f"{taxpayer_profile['spouse_info']['first_name']} {taxpayer_profile['spouse_info']['last_name']}"
+        field_data["status_married_filing_separately"] = '/4'
+        field_data["mfs_spouse_name"] = f"{taxpayer_profile['spouse_info']['first_name']} {taxpayer_profile['spouse_info']['last_name']}"
     elif fs == "qualifying_surviving_spouse":
-        field_data['topmostSubform[0].Page1[0].c1_3[1]'] = '/5'
+        field_data["status_qualifying_surviving_spouse"] = '/5'
     else:
-        field_data['topmostSubform[0].Page1[0].c1_4[0]'] = '/1'
+        field_data["status_other"] = '/1'
 
     # ------------------------
     # 3. Digital Assets
     # ------------------------
     if taxpayer_profile.get("received_or_sold_digital_asset") == "yes":
-        field_data['topmostSubform[0].Page1[0].c1_5[0]'] = '/1'
+        field_data["digital_assets_yes"] = '/1'
     else:
-        field_data['topmostSubform[0].Page1[0].c1_5[1]'] = '/2'
+        field_data["digital_assets_no"] = '/2'
 
     # ------------------------
     # 4. Taxpayer Age & Blindness
     # ------------------------
     if taxpayer_profile.get("date_of_birth") <= "1960-01-02": 
-        field_data['topmostSubform[0].Page1[0].c1_9[0]'] = '/1'  
+        field_data["born_before_1960"] = '/1'  
     if taxpayer_profile.get("is_blind") == "yes": 
-        field_data['topmostSubform[0].Page1[0].c1_10[0]'] = '/1'
+        field_data["is_blind"] = '/1'
     
     # ------------------------
     # 5. Spouse Age & Blindness
@@ -185,52 +436,48 @@ def fill_1040_pdf(file_path, taxpayer_profile, tax_summary):
     if fs in ["married_filing_jointly", "married_filing_separately"]:
         spouse = taxpayer_profile.get("spouse_info", {})
         if spouse.get("date_of_birth") <= "1960-01-02": 
-            field_data['topmostSubform[0].Page1[0].c1_11[0]'] = '/1'  
+            field_data["spouse_born_before_1960"] = '/1'  
         if spouse.get("is_blind") == "yes": 
-            field_data['topmostSubform[0].Page1[0].c1_12[0]'] = '/1'
+            field_data["spouse_is_blind"] = '/1'
 
     # ------------------------
     # 6. Dependents
     # ------------------------
-    field_data['needs_dependents_fields'] = "needs field location form 1040"
+    dependents = taxpayer_profile.get("dependents") or []
+    for row, dependent in enumerate(dependents[:4], start=1):
+        field_data[f"dependent_{row}_name"] = f"{dependent['first_name']} {dependent['last_name']}"
+        field_data[f"dependent_{row}_ssn"] = dependent["ssn"]
+        field_data[f"dependent_{row}_relationship"] = dependent.get("relationship", "")
+    if len(dependents) > 4:
+        field_data["more_than_four_dependents"] = '/1'
 
     # ------------------------
     # 7. Income Section (from tax_summary)
     # ------------------------
     field_data.update({
-        'topmostSubform[0].Page1[0].f1_32[0]': round(tax_summary.get("wages", 0), 2),
-        'topmostSubform[0].Page1[0].f1_41[0]': round(tax_summary.get("wages", 0), 2),
-        'topmostSubform[0].Page1[0].f1_43[0]': round(tax_summary.get("interest_income", 0), 2),
-        'topmostSubform[0].Page1[0].Line4a-11_ReadOrder[0].f1_53[0]': round(tax_summary.get("self_employment_income", 0), 2),
-        'topmostSubform[0].Page1[0].Line4a-11_ReadOrder[0].f1_54[0]': round(tax_summary.get("gross_income", 0), 2),
-        'topmostSubform[0].Page1[0].Line4a-11_ReadOrder[0].f1_56[0]': round(tax_summary.get("gross_income", 0), 2), #agi
-        'topmostSubform[0].Page1[0].f1_57[0]': round(tax_summary.get("standard_deduction", 0), 2),
-        'topmostSubform[0].Page1[0].f1_59[0]': round(tax_summary.get("standard_deduction", 0), 2), # adding standard and business deductions
-        'topmostSubform[0].Page1[0].f1_60[0]': round(tax_summary.get("taxable_income", 0), 2),
-        'topmostSubform[0].Page2[0].f2_02[0]': round(tax_summary.get("tax_owed", 0), 2),
-        'topmostSubform[0].Page2[0].f2_04[0]': round(tax_summary.get("tax_owed", 0), 2), #18
-        'topmostSubform[0].Page2[0].f2_10[0]': round(tax_summary.get("tax_owed", 0), 2), # 24
-        'topmostSubform[0].Page2[0].f2_14[0]': round(tax_summary.get("federal_tax_withheld", 0), 2), #25d
-        'topmostSubform[0].Page2[0].f2_22[0]': round(tax_summary.get("federal_tax_withheld", 0), 2), #33
+        "wages": round(tax_summary.get("wages", 0), 2),
+        "total_wages": round(tax_summary.get("wages", 0), 2),
+        "taxable_interest": round(tax_summary.get("interest_income", 0), 2),
+        "other_income": round(tax_summary.get("self_employment_income", 0), 2),
+        "total_income": round(tax_summary.get("gross_income", 0), 2),
+        "agi": round(tax_summary.get("gross_income", 0), 2),
+        "standard_deduction": round(tax_summary.get("standard_deduction", 0), 2),
+        "total_deductions": round(tax_summary.get("standard_deduction", 0), 2), # adding standard and business deductions
+        "taxable_income": round(tax_summary.get("taxable_income", 0), 2),
+        "tax": round(tax_summary.get("tax_owed", 0), 2),
+        "line_18": round(tax_summary.get("tax_owed", 0), 2),
+        "total_tax": round(tax_summary.get("tax_owed", 0), 2),
+        "w2_withholding": round(tax_summary.get("federal_tax_withheld", 0), 2),
+        "total_payments": round(tax_summary.get("federal_tax_withheld", 0), 2),
     })
 
     if tax_summary.get("federal_tax_withheld") > tax_summary.get("tax_owed"):
-        field_data.update({'topmostSubform[0].Page2[0].f2_23[0]': round(tax_summary.get("refund_or_amount_due", 0), 2)}) #34
+        field_data.update({"overpaid": round(tax_summary.get("refund_or_amount_due", 0), 2)}) #34
     else:
-        field_data.update({'topmostSubform[0].Page2[0].f2_28[0]': abs(round(tax_summary.get("refund_or_amount_due", 0), 2))}) #37
+        field_data.update({"amount_owed": abs(round(tax_summary.get("refund_or_amount_due", 0), 2))}) #37
 
 
     # ------------------------
-    # 8. Write to PDF
-    # ------------------------
-    writer.update_page_form_field_values(writer.pages[0], field_data)
-    writer.update_page_form_field_values(writer.pages[1], field_data)
-
-    # ------------------------
-    # 9. Return PDF as bytes for Streamlit download
+    # 8. Write to PDF and return bytes for Streamlit download (or stream to out)
     # ------------------------
-    pdf_buffer = BytesIO()
-    writer.write(pdf_buffer)
-    pdf_bytes = pdf_buffer.getvalue()
-    pdf_buffer.close()
-    return pdf_bytes
\ No newline at end of file
+    return template.fill(field_data, out, incremental, compress)
@@ -0,0 +1,673 @@
+"""
+Local job service for extraction and 1040 generation.
+
+    python -m backend.job_service --port 8765 --workers 4
+
+The Streamlit app (and anything else on the box) submits jobs over HTTP
+instead of parsing PDFs in its own request thread. Jobs run on a fixed set
+of worker processes that have fitz, pymupdf4llm, the 1040 template and the
+tax config loaded before the first job arrives.
+
+Scheduling happens here rather than in the pool: an extraction job is split
+into one task per document, tasks wait in a bounded queue, and the next task
+goes to a free worker by
+
+    1. priority: interactive jobs (a handful of uploads) before bulk batches,
+       with one bulk task let through after every few interactive ones so a
+       busy front end can't starve the batches completely
+    2. tenant: round-robin between tenants within a priority, so one user's
+       50 PDFs don't queue up in front of everybody else's one W-2
+
+A full queue (overall or per tenant) is rejected with 429 and Retry-After.
+
+HTTP API (JSON unless noted):
+
+    POST   /jobs              {"kind": "extract", "tenant", "priority", "mode",
+                               "documents": [{"form_type", "name", "data": <base64>}]}
+                              {"kind": "fill_1040", "tenant", "priority",
+                               "taxpayer_profile", "tax_summary"}
+                              -> 202 {"id", "status", ...}
+    GET    /jobs/<id>         status and progress; extraction results once done
+    GET    /jobs/<id>/result  the filled 1040 (application/pdf)
+    DELETE /jobs/<id>         cancel whatever hasn't started yet
+    GET    /healthz           queue depth and worker count
+    GET    /metrics           Prometheus text, when a MetricsRegistry is configured
+
+JobServiceClient is the matching client; see frontend/app.py.
+"""
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+from . import metrics
+from .batch_extract import AUTO_DETECT, FORM_PARSERS, _parse
+from .generate_1040 import FORM_1040_TEMPLATE_PATH, fill_1040_pdf, load_1040_template
+from .layout_extract import EXTRACTION_MODES, MODE_MARKDOWN
+from .ocr import ocr_gate, share_ocr_gate
+from .pdf_loader import BufferedPDF
+
+JOB_SERVICE_ENV = "TAX_AGENT_JOB_SERVICE_URL"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+KIND_EXTRACT = "extract"
+KIND_FILL_1040 = "fill_1040"
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+# Extraction jobs with at most this many documents default to interactive
+INTERACTIVE_MAX_DOCUMENTS = 5
+# JobServiceClient.extract_typed sends bigger uploads as jobs of this many documents, two at
+# a time, so they stay within the default per-tenant queue limit (64)
+EXTRACT_CHUNK_SIZE = 32
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+FINISHED = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+
+class QueueFull(Exception):
+    """The service is at capacity; retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ------------------------
+# Worker processes
+# ------------------------
+def _warm_worker(template_path: str, ocr_slots: Any) -> None:
+    """Pool initializer: pay the import and parse costs before the first job, and share the OCR slots."""
+    share_ocr_gate(ocr_slots)
+    import fitz  # noqa: F401
+    import pymupdf4llm  # noqa: F401
+    from .tax_config import TAX_CONFIG
+
+    load_1040_template(template_path)
+    TAX_CONFIG.validate()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _extract_task(form_type: str, name: Any, data: bytes, mode: str) -> Tuple[str, Dict[str, Any]]:
+    return _parse(form_type, BufferedPDF(name, data), mode)
+
+
+def _fill_task(template_path: str, taxpayer_profile: Dict[str, Any], tax_summary: Dict[str, Any]) -> bytes:
+    return fill_1040_pdf(template_path, taxpayer_profile, tax_summary)
+
+
+# ------------------------
+# Jobs and scheduling
+# ------------------------
+class Job:
+    """One submitted job; `results` has a slot per task, filled as tasks finish."""
+    __slots__ = ("id", "kind", "tenant", "priority", "status", "created", "started", "finished",
+                 "total", "completed", "results", "error")
+
+    def __init__(self, kind: str, tenant: str, priority: str, total: int):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.tenant = tenant
+        self.priority = priority
+        self.status = STATUS_QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.total = total
+        self.completed = 0
+        self.results: List[Any] = [None] * total
+        self.error: Optional[str] = None
+
+    def describe(self) -> Dict[str, Any]:
+        """Status as sent to clients (a 1040's bytes are fetched separately)."""
+        status = {
+            "id": self.id, "kind": self.kind, "tenant": self.tenant, "priority": self.priority,
+            "status": self.status, "total": self.total, "completed": self.completed,
+            "created": self.created, "started": self.started, "finished": self.finished,
+        }
+        if self.error is not None:
+            status["error"] = self.error
+        if self.kind == KIND_EXTRACT and self.status == STATUS_DONE:
+            status["results"] = [list(result) for result in self.results]
+        return status
+
+
+class _Task:
+    __slots__ = ("job", "index", "fn", "args")
+
+    def __init__(self, job: Job, index: int, fn: Callable, args: Tuple[Any, ...]):
+        self.job, self.index, self.fn, self.args = job, index, fn, args
+
+
+class TaskQueue:
+    """
+    Bounded task queue: strict priority classes with a starvation guard, and
+    round-robin over tenants inside each class. put() never blocks; it
+    raises QueueFull so the caller can push back on its client.
+    """
+
+    def __init__(self, max_queued: int = 256, max_queued_per_tenant: int = 64, interactive_burst: int = 4):
+        self.max_queued = max_queued
+        self.max_queued_per_tenant = max_queued_per_tenant
+        self.interactive_burst = interactive_burst
+        self._ready = threading.Condition()
+        # priority -> tenant -> tasks; OrderedDict order is the round-robin order
+        self._classes: Dict[str, "OrderedDict[str, Deque[_Task]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._per_tenant: Dict[str, int] = {}
+        self._size = 0
+        self._burst = 0
+        self._closed = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, tenant: str, priority: str, tasks: Sequence[_Task]) -> None:
+        """Queue all of a job's tasks or none of them."""
+        if len(tasks) > self.max_queued_per_tenant:
+            raise ValueError(f"Job has {len(tasks)} tasks; at most {self.max_queued_per_tenant} are accepted per job")
+        with self._ready:
+            if self._size + len(tasks) > self.max_queued:
+                raise QueueFull("Job queue is full")
+            if self._per_tenant.get(tenant, 0) + len(tasks) > self.max_queued_per_tenant:
+                raise QueueFull(f"Too many queued tasks for tenant '{tenant}'")
+            self._classes[priority].setdefault(tenant, deque()).extend(tasks)
+            self._per_tenant[tenant] = self._per_tenant.get(tenant, 0) + len(tasks)
+            self._size += len(tasks)
+            self._ready.notify(len(tasks))
+
+    def get(self) -> Optional[_Task]:
+        """Next task to run, blocking while empty; None once closed."""
+        with self._ready:
+            while not self._size and not self._closed:
+                self._ready.wait()
+            if self._closed:
+                return None
+            interactive, bulk = self._classes[PRIORITY_INTERACTIVE], self._classes[PRIORITY_BULK]
+            if interactive and not (bulk and self._burst >= self.interactive_burst):
+                tenants = interactive
+                self._burst += 1
+            else:
+                tenants = bulk
+                self._burst = 0
+            tenant, tasks = next(iter(tenants.items()))
+            task = tasks.popleft()
+            if tasks:
+                tenants.move_to_end(tenant)
+            else:
+                del tenants[tenant]
+            self._size -= 1
+            self._per_tenant[tenant] -= 1
+            if not self._per_tenant[tenant]:
+                del self._per_tenant[tenant]
+            return task
+
+    def discard(self, job: Job) -> int:
+        """Drop a job's queued tasks; returns how many were removed."""
+        with self._ready:
+            tasks = self._classes[job.priority].get(job.tenant)
+            if not tasks:
+                return 0
+            kept = deque(task for task in tasks if task.job is not job)
+            removed = len(tasks) - len(kept)
+            if kept:
+                self._classes[job.priority][job.tenant] = kept
+            else:
+                del self._classes[job.priority][job.tenant]
+            self._size -= removed
+            self._per_tenant[job.tenant] -= removed
+            if not self._per_tenant[job.tenant]:
+                del self._per_tenant[job.tenant]
+            return removed
+
+    def close(self) -> None:
+        with self._ready:
+            self._closed = True
+            self._ready.notify_all()
+
+
+class JobService:
+    """
+    Owns the warm process pool, the task queue and the job table. One
+    dispatcher thread per worker pulls the next task off the queue, so at
+    most `workers` tasks are ever inside the pool and the queue alone
+    decides what runs next.
+    """
+
+    def __init__(self, workers: Optional[int] = None,
+                 max_queued: int = 256,
+                 max_queued_per_tenant: int = 64,
+                 max_finished: int = 1000,
+                 template_path=FORM_1040_TEMPLATE_PATH):
+        self.workers = workers or os.cpu_count() or 1
+        self.template_path = str(template_path)
+        self.max_finished = max_finished
+        self.queue = TaskQueue(max_queued, max_queued_per_tenant)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._pool = self._new_pool()
+        self._dispatchers: List[threading.Thread] = []
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.workers, initializer=_warm_worker,
+                                   initargs=(self.template_path, ocr_gate()))
+
+    def start(self) -> "JobService":
+        # Workers are spawned on demand; one ping per worker brings them all up (and warm) now
+        for future in [self._pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._dispatch, name=f"job-dispatch-{n}", daemon=True)
+            thread.start()
+            self._dispatchers.append(thread)
+        return self
+
+    def shutdown(self) -> None:
+        self.queue.close()
+        for thread in self._dispatchers:
+            thread.join()
+        self._pool.shutdown(wait=True)
+
+    # ------------------------
+    # Submitting
+    # ------------------------
+    def submit_extract(self, documents: Sequence[Tuple[str, Any, bytes]],
+                       tenant: str = "default",
+                       priority: Optional[str] = None,
+                       mode: str = MODE_MARKDOWN) -> Job:
+        """documents are (form_type, file name, PDF bytes); form_type may be AUTO_DETECT."""
+        if mode not in EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode '{mode}'")
+        for form_type, _, _ in documents:
+            if form_type != AUTO_DETECT and form_type not in FORM_PARSERS:
+                raise ValueError(f"Unknown form type '{form_type}'")
+        if priority is None:
+            priority = PRIORITY_INTERACTIVE if len(documents) <= INTERACTIVE_MAX_DOCUMENTS else PRIORITY_BULK
+        job = Job(KIND_EXTRACT, tenant, priority, len(documents))
+        tasks = [_Task(job, index, _extract_task, (form_type, name, data, mode))
+                 for index, (form_type, name, data) in enumerate(documents)]
+        return self._enqueue(job, tasks)
+
+    def submit_fill_1040(self, taxpayer_profile: Dict[str, Any], tax_summary: Dict[str, Any],
+                         tenant: str = "default",
+                         priority: str = PRIORITY_INTERACTIVE) -> Job:
+        job = Job(KIND_FILL_1040, tenant, priority, 1)
+        return self._enqueue(job, [_Task(job, 0, _fill_task, (self.template_path, taxpayer_profile, tax_summary))])
+
+    def _enqueue(self, job: Job, tasks: List[_Task]) -> Job:
+        if job.priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{job.priority}', expected one of {PRIORITIES}")
+        with self._lock:
+            self._jobs[job.id] = job
+        if not tasks:
+            self._finish(job, STATUS_DONE)
+            return job
+        try:
+            self.queue.put(job.tenant, job.priority, tasks)
+        except Exception as e:
+            with self._lock:
+                del self._jobs[job.id]
+            metrics.inc("jobs_rejected_total", kind=job.kind, reason=type(e).__name__)
+            raise
+        metrics.inc("jobs_submitted_total", kind=job.kind, priority=job.priority)
+        return job
+
+    # ------------------------
+    # Querying
+    # ------------------------
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a job's queued tasks; tasks already on a worker run to completion."""
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        self.queue.discard(job)
+        self._finish(job, STATUS_CANCELLED)
+        return job
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.status not in FINISHED)
+        return {"workers": self.workers, "queued_tasks": len(self.queue), "active_jobs": active}
+
+    # ------------------------
+    # Running
+    # ------------------------
+    def _dispatch(self) -> None:
+        while True:
+            task = self.queue.get()
+            if task is None:
+                return
+            job = task.job
+            if job.status in FINISHED:
+                continue
+            if job.started is None:
+                job.started = time.time()
+                job.status = STATUS_RUNNING
+                metrics.observe("stage_seconds", job.started - job.created, stage="job_wait", kind=job.kind)
+            self._complete(task, *self._run(task))
+
+    def _run(self, task: _Task) -> Tuple[Any, Optional[str]]:
+        """(result, error) of one task, recreating the pool if a worker died."""
+        pool = self._pool
+        try:
+            with metrics.timer("job_task", kind=task.job.kind):
+                result, snapshot = pool.submit(metrics.run_recorded, task.fn, *task.args).result()
+            metrics.merge(snapshot)
+            return result, None
+        except BrokenProcessPool as e:
+            with self._pool_lock:
+                if self._pool is pool:
+                    self._pool = self._new_pool()
+            return None, f"Worker process died: {e}"
+        except Exception as e:
+            metrics.merge(getattr(e, "metrics_snapshot", None))
+            return None, str(e)
+
+    def _complete(self, task: _Task, result: Any, error: Optional[str]) -> None:
+        job = task.job
+        if job.kind == KIND_EXTRACT:
+            if error is not None:
+                form_type, name = task.args[0], task.args[1]
+                result = (form_type, {"source_file": name, "error": f"Failed to extract data: {error}"})
+        elif error is not None:
+            job.error = f"Failed to generate 1040: {error}"
+        job.results[task.index] = result
+        with self._lock:
+            job.completed += 1
+            last = job.completed == job.total
+        if last and job.status not in FINISHED:
+            self._finish(job, STATUS_FAILED if job.error is not None else STATUS_DONE)
+
+    def _finish(self, job: Job, status: str) -> None:
+        with self._lock:
+            job.status = status
+            job.finished = time.time()
+            # Keep a bounded history of finished jobs for polling
+            finished = [job_id for job_id, old in self._jobs.items() if old.status in FINISHED]
+            for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job_id]
+        metrics.inc("jobs_total", kind=job.kind, priority=job.priority, status=status)
+
+
+# ------------------------
+# HTTP front end
+# ------------------------
+class _Handler(BaseHTTPRequestHandler):
+    service: JobService
+    max_request_bytes = 64 * 1024 * 1024
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # one line per poll would drown everything else
+
+    def _send(self, code: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, code: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(code, json.dumps(payload).encode(), "application/json", headers)
+
+    def _job(self, path: str) -> Tuple[Optional[Job], str]:
+        parts = path.strip("/").split("/")
+        if len(parts) < 2 or parts[0] != "jobs":
+            return None, ""
+        return self.service.get(parts[1]), "/".join(parts[2:])
+
+    def do_GET(self) -> None:
+        if self.path == "/healthz":
+            return self._json(200, self.service.health())
+        if self.path == "/metrics":
+            sink = metrics.get_sink()
+            if not isinstance(sink, metrics.MetricsRegistry):
+                return self._json(404, {"error": "metrics are not being aggregated"})
+            return self._send(200, sink.render().encode(), "text/plain; version=0.0.4")
+        job, rest = self._job(self.path)
+        if job is None:
+            return self._json(404, {"error": "no such job"})
+        if rest == "":
+            return self._json(200, job.describe())
+        if rest == "result" and job.kind == KIND_FILL_1040:
+            if job.status != STATUS_DONE:
+                return self._json(409, {"error": f"job is {job.status}"})
+            return self._send(200, job.results[0], "application/pdf")
+        self._json(404, {"error": "not found"})
+
+    def do_DELETE(self) -> None:
+        job, rest = self._job(self.path)
+        if job is None or rest:
+            return self._json(404, {"error": "no such job"})
+        self._json(200, self.service.cancel(job.id).describe())
+
+    def do_POST(self) -> None:
+        if self.path != "/jobs":
+            return self._json(404, {"error": "not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > self.max_request_bytes:
+            return self._json(413, {"error": f"request larger than {self.max_request_bytes} bytes"})
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            tenant = str(request.get("tenant") or self.headers.get("X-Tenant") or "default")
+            kind = request.get("kind")
+            if kind == KIND_EXTRACT:
+                documents = [(doc["form_type"], doc.get("name"), base64.b64decode(doc["data"]))
+                             for doc in request.get("documents") or []]
+                job = self.service.submit_extract(documents, tenant, request.get("priority"),
+                                                  request.get("mode") or MODE_MARKDOWN)
+            elif kind == KIND_FILL_1040:
+                job = self.service.submit_fill_1040(request["taxpayer_profile"], request["tax_summary"], tenant,
+                                                    request.get("priority") or PRIORITY_INTERACTIVE)
+            else:
+                raise ValueError(f"Unknown job kind '{kind}'")
+        except QueueFull as e:
+            return self._json(429, {"error": str(e)}, {"Retry-After": str(max(1, round(e.retry_after)))})
+        except (ValueError, KeyError, TypeError) as e:
+            return self._json(400, {"error": f"Bad request: {e}"})
+        self._json(202, job.describe())
+
+
+def make_server(service: JobService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    handler = type("JobServiceHandler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+# ------------------------
+# Client
+# ------------------------
+class JobServiceError(RuntimeError):
+    pass
+
+
+class JobServiceClient:
+    """
+    Thin urllib client. submit_* retry while the service answers 429, for
+    up to `busy_timeout` seconds; wait() polls until the job is finished.
+    extract_typed splits uploads into jobs of at most `chunk_size` documents;
+    keep it at most half the service's --max-queued-per-tenant.
+    """
+
+    def __init__(self, url: str, tenant: str = "default", timeout: float = 30.0,
+                 busy_timeout: float = 60.0, poll_interval: float = 0.25,
+                 chunk_size: int = EXTRACT_CHUNK_SIZE):
+        self.url = url.rstrip("/")
+        self.tenant = tenant
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.poll_interval = poll_interval
+        self.chunk_size = max(1, chunk_size)
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        from urllib.error import HTTPError
+        from urllib.request import Request, urlopen
+
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = Request(self.url + path, data=data, method=method,
+                          headers={"Content-Type": "application/json"} if data is not None else {})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return response.status, dict(response.headers), response.read()
+        except HTTPError as e:
+            return e.code, dict(e.headers), e.read()
+
+    def _json(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        code, _, body = self._request(method, path, payload)
+        if code >= 400:
+            raise JobServiceError(f"{method} {path} failed ({code}): {body.decode(errors='replace')}")
+        return json.loads(body)
+
+    def _submit(self, payload: Dict[str, Any]) -> str:
+        payload.setdefault("tenant", self.tenant)
+        deadline = time.monotonic() + self.busy_timeout
+        while True:
+            code, headers, body = self._request("POST", "/jobs", payload)
+            if code != 429:
+                break
+            retry_after = float(headers.get("Retry-After") or 1)
+            if time.monotonic() + retry_after > deadline:
+                break
+            time.sleep(retry_after)
+        if code >= 400:
+            raise JobServiceError(f"Job rejected ({code}): {body.decode(errors='replace')}")
+        return json.loads(body)["id"]
+
+    def submit_extract(self, jobs: Sequence[Tuple[str, Any]], priority: Optional[str] = None,
+                       mode: str = MODE_MARKDOWN) -> str:
+        """jobs are (form_type, upload) pairs as taken by batch_extract.extract_typed."""
+        from .pdf_loader import pdf_buffer
+
+        documents = [{"form_type": form_type, "name": getattr(pdf_file, 'name', None),
+                      "data": base64.b64encode(pdf_buffer(pdf_file)).decode("ascii")}
+                     for form_type, pdf_file in jobs]
+        return self._submit({"kind": KIND_EXTRACT, "documents": documents, "priority": priority, "mode": mode})
+
+    def submit_fill_1040(self, taxpayer_profile: Dict[str, Any], tax_summary: Dict[str, Any],
+                         priority: str = PRIORITY_INTERACTIVE) -> str:
+        return self._submit({"kind": KIND_FILL_1040, "taxpayer_profile": taxpayer_profile,
+                             "tax_summary": tax_summary, "priority": priority})
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        return self._json("GET", f"/jobs/{job_id}")
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        return self._json("DELETE", f"/jobs/{job_id}")
+
+    def wait(self, job_id: str, timeout: Optional[float] = None,
+             on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Poll until the job is finished; returns its final status."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.status(job_id)
+            if on_progress is not None:
+                on_progress(status)
+            if status["status"] in FINISHED:
+                return status
+            if deadline is not None and time.monotonic() > deadline:
+                raise JobServiceError(f"Timed out waiting for job {job_id}")
+            time.sleep(self.poll_interval)
+
+    def extract_typed(self, jobs: Sequence[Tuple[str, Any]], priority: Optional[str] = None,
+                      mode: str = MODE_MARKDOWN,
+                      on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Remote batch_extract.extract_typed: (resolved form type, result) in input order.
+        Uploads of more than chunk_size documents go as several jobs, with two in
+        flight at a time; on_progress sees the progress of the whole upload.
+        """
+        if not jobs:
+            return []
+        if priority is None and len(jobs) > INTERACTIVE_MAX_DOCUMENTS:
+            priority = PRIORITY_BULK  # the same class for every chunk, small last one included
+        chunks = [jobs[start:start + self.chunk_size] for start in range(0, len(jobs), self.chunk_size)]
+        pending: Deque[str] = deque()
+        results: List[Tuple[str, Dict[str, Any]]] = []
+        try:
+            for chunk_index in range(len(chunks)):
+                while len(pending) < 2 and chunk_index + len(pending) < len(chunks):
+                    pending.append(self.submit_extract(chunks[chunk_index + len(pending)], priority, mode))
+                done = len(results)
+                progress = None if on_progress is None else (
+                    lambda status: on_progress(dict(status, completed=done + status["completed"], total=len(jobs))))
+                status = self.wait(pending[0], on_progress=progress)
+                if status["status"] != STATUS_DONE:
+                    raise JobServiceError(f"Extraction job {status['status']}: {status.get('error')}")
+                pending.popleft()
+                results.extend((form_type, result) for form_type, result in status["results"])
+        except BaseException:
+            for job_id in pending:
+                try:
+                    self.cancel(job_id)
+                except (JobServiceError, OSError):
+                    pass
+            raise
+        return results
+
+    def fill_1040(self, taxpayer_profile: Dict[str, Any], tax_summary: Dict[str, Any],
+                  priority: str = PRIORITY_INTERACTIVE) -> bytes:
+        job_id = self.submit_fill_1040(taxpayer_profile, tax_summary, priority)
+        status = self.wait(job_id)
+        if status["status"] != STATUS_DONE:
+            raise JobServiceError(status.get("error") or f"1040 job {status['status']}")
+        code, _, body = self._request("GET", f"/jobs/{job_id}/result")
+        if code != 200:
+            raise JobServiceError(f"Fetching 1040 failed ({code}): {body.decode(errors='replace')}")
+        return body
+
+
+# ------------------------
+# CLI
+# ------------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve extraction and 1040 jobs on warm worker processes.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--max-queued", type=int, default=256, help="queued tasks before jobs get 429")
+    parser.add_argument("--max-queued-per-tenant", type=int, default=64)
+    parser.add_argument("--metrics", action="store_true", help="aggregate metrics and serve them on /metrics")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        metrics.configure_metrics(metrics.MetricsRegistry())
+    service = JobService(args.workers, args.max_queued, args.max_queued_per_tenant).start()
+    server = make_server(service, args.host, args.port)
+    print(f"Job service on http://{args.host}:{server.server_port} with {service.workers} warm workers",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
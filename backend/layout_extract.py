@@ -0,0 +1,295 @@
+"""
+Word/coordinate-based extraction engine ("layout" mode).
+
+Instead of converting the whole document to markdown and regex-matching its
+artifacts, we read fitz words with their bounding boxes, index them on a
+coarse grid, and find each box value by locating its printed label
+("Wages, tips, other compensation") and taking the nearest matching token
+inside the box region below / to the right of it. This skips pymupdf4llm's
+layout and table detection entirely.
+
+The form-specific functions return the same dicts as the markdown parsers
+in extract_w2 / extract_1099_int / extract_1099_nec.
+"""
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import re
+
+from .ocr import document_key, page_words
+from .pdf_loader import opened_pdf
+
+GRID_SIZE = 48.0  # points per grid cell
+
+# Extraction modes accepted by parse_w2 / _process_single_1099_int / _process_single_1099_nec
+MODE_MARKDOWN = "markdown"
+MODE_LAYOUT = "layout"
+EXTRACTION_MODES = (MODE_MARKDOWN, MODE_LAYOUT)
+
+# Value shapes
+AMOUNT_RE = re.compile(r'^\$?\d[\d,]*\.\d{2}$')
+SSN_RE = re.compile(r'^\d{3}-\d{2}-\d{4}$')
+EIN_RE = re.compile(r'^\d{2}-\d{7}$')
+
+
+class Word(NamedTuple):
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    text: str
+    page: int
+    line: Tuple[int, int, int]  # (page, block, line) for grouping words into lines
+    order: int                  # reading-order position within the document
+
+
+class Rect(NamedTuple):
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    page: int
+
+
+def _normalize(token: str) -> str:
+    return re.sub(r"[^0-9a-z]", "", token.lower())
+
+
+class WordIndex:
+    """
+    Words of a document with a reading-order label lookup and a per-page
+    spatial grid for nearest-token queries.
+    """
+
+    def __init__(self, words: Sequence[Word]):
+        self.words = list(words)
+        self._by_token: Dict[str, List[int]] = {}
+        self._grid: Dict[Tuple[int, int, int], List[int]] = {}
+        self._normalized = [_normalize(w.text) for w in self.words]
+        for i, (word, token) in enumerate(zip(self.words, self._normalized)):
+            if token:
+                self._by_token.setdefault(token, []).append(i)
+            for cell in self._cells(word.page, word.x0, word.y0, word.x1, word.y1):
+                self._grid.setdefault(cell, []).append(i)
+
+    # ------------------------
+    # Construction
+    # ------------------------
+    @classmethod
+    def from_document(cls, doc: Any, pages: Optional[Iterable[int]] = None,
+                      doc_key: Optional[Callable[[], str]] = None) -> "WordIndex":
+        """
+        Index every page, or just the given page numbers (words keep their
+        document page number). With a doc_key (see ocr.document_key), scanned
+        pages are indexed from OCR instead of their empty text layer.
+        """
+        words: List[Word] = []
+        page_nos = range(doc.page_count) if pages is None else pages
+        for page_no in page_nos:
+            # (x0, y0, x1, y1, word, block_no, line_no, word_no), already in reading order
+            for x0, y0, x1, y1, text, block, line, _ in page_words(doc, page_no, doc_key):
+                words.append(Word(x0, y0, x1, y1, text, page_no, (page_no, block, line), len(words)))
+        return cls(words)
+
+    @staticmethod
+    def _cells(page: int, x0: float, y0: float, x1: float, y1: float) -> Iterable[Tuple[int, int, int]]:
+        for gx in range(int(x0 // GRID_SIZE), int(x1 // GRID_SIZE) + 1):
+            for gy in range(int(y0 // GRID_SIZE), int(y1 // GRID_SIZE) + 1):
+                yield page, gx, gy
+
+    # ------------------------
+    # Queries
+    # ------------------------
+    def find_labels(self, label: str) -> Iterable[Rect]:
+        """Bounding boxes of every occurrence of a label phrase (case/punctuation-insensitive), in reading order."""
+        tokens = [t for t in (_normalize(p) for p in label.split()) if t]
+        if not tokens:
+            return
+        for start in self._by_token.get(tokens[0], ()):
+            end = start + len(tokens)
+            if end > len(self.words) or self._normalized[start:end] != tokens:
+                continue
+            span = self.words[start:end]
+            yield Rect(min(w.x0 for w in span), min(w.y0 for w in span),
+                       max(w.x1 for w in span), max(w.y1 for w in span), span[0].page)
+
+    def find_label(self, label: str, occurrence: int = 0) -> Optional[Rect]:
+        """Bounding box of the n-th occurrence of a label phrase."""
+        for found, rect in enumerate(self.find_labels(label)):
+            if found == occurrence:
+                return rect
+        return None
+
+    def words_in(self, region: Rect) -> List[Word]:
+        """Words whose center lies inside region, in reading order."""
+        hits = set()
+        for cell in self._cells(region.page, region.x0, region.y0, region.x1, region.y1):
+            for i in self._grid.get(cell, ()):
+                w = self.words[i]
+                cx, cy = (w.x0 + w.x1) / 2, (w.y0 + w.y1) / 2
+                if region.x0 <= cx <= region.x1 and region.y0 <= cy <= region.y1:
+                    hits.add(i)
+        return [self.words[i] for i in sorted(hits)]
+
+    def value_near(self, label: Rect, accept: Callable[[str], bool],
+                   width: float = 200.0, height: float = 40.0) -> Optional[str]:
+        """
+        Nearest accepted token in the box region of a label: from the label's
+        top-left corner, `width` points to the right of the label and `height`
+        points below it. Label words themselves are skipped.
+        """
+        region = Rect(label.x0 - 4, label.y0 - 2, label.x1 + width, label.y1 + height, label.page)
+        best, best_dist = None, None
+        for w in self.words_in(region):
+            if not accept(w.text) or _inside(w, label):
+                continue
+            dx = max(0.0, w.x0 - label.x1) if w.y0 < label.y1 else max(0.0, w.x0 - label.x0)
+            dy = max(0.0, w.y0 - label.y1)
+            dist = dx + 2 * dy  # values sit under their label more often than beside it
+            if best_dist is None or dist < best_dist:
+                best, best_dist = w.text, dist
+        return best
+
+    def lines_below(self, label: Rect, width: float = 250.0, height: float = 60.0) -> List[str]:
+        """Text lines inside the box region under a label, top to bottom, up to the first gap."""
+        region = Rect(label.x0 - 4, label.y1 + 0.5, label.x0 + width, label.y1 + height, label.page)
+        lines: Dict[Tuple[int, int, int], List[Word]] = {}
+        for w in self.words_in(region):
+            lines.setdefault(w.line, []).append(w)
+        ordered = sorted(lines.values(), key=lambda ws: (ws[0].y0, ws[0].x0))
+        result: List[str] = []
+        prev: Optional[List[Word]] = None
+        for ws in ordered:
+            if prev is not None:
+                line_height = max(w.y1 - w.y0 for w in prev)
+                if ws[0].y0 - prev[0].y1 > 1.2 * line_height:
+                    break  # a blank band means we've left the box
+            result.append(" ".join(w.text for w in ws))
+            prev = ws
+        return result
+
+    def first_matching(self, pattern: "re.Pattern[str]") -> Optional[str]:
+        for w in self.words:
+            if pattern.match(w.text):
+                return w.text
+        return None
+
+    # ------------------------
+    # Convenience lookups
+    # ------------------------
+    def labeled(self, labels: Sequence[str], accept: Callable[[str], bool], **kwargs: Any) -> Optional[str]:
+        """
+        Value for the first label in `labels` that has one nearby. Every
+        occurrence of a label is tried, since the same words often appear in
+        the form title above the box ("Interest Income" on a 1099-INT).
+        """
+        for label in labels:
+            for rect in self.find_labels(label):
+                value = self.value_near(rect, accept, **kwargs)
+                if value is not None:
+                    return value
+        return None
+
+    def amount(self, *labels: str) -> float:
+        value = self.labeled(labels, lambda t: bool(AMOUNT_RE.match(t)))
+        return float(value.replace('$', '').replace(',', '')) if value else 0.0
+
+    def text_lines(self, *labels: str, **kwargs: Any) -> List[str]:
+        for label in labels:
+            for rect in self.find_labels(label):
+                lines = self.lines_below(rect, **kwargs)
+                if lines:
+                    return lines
+        return []
+
+
+def _inside(word: Word, rect: Rect) -> bool:
+    return rect.x0 <= word.x0 and word.x1 <= rect.x1 and rect.y0 <= word.y0 and word.y1 <= rect.y1
+
+
+def _is(pattern: "re.Pattern[str]") -> Callable[[str], bool]:
+    return lambda t: bool(pattern.match(t))
+
+
+def check_mode(mode: str) -> None:
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown extraction mode '{mode}', expected one of {EXTRACTION_MODES}")
+
+
+def build_word_index(pdf_file: Any) -> WordIndex:
+    """Open an upload in memory and index its words (OCR'ing scanned pages)."""
+    with opened_pdf(pdf_file) as doc:
+        return WordIndex.from_document(doc, doc_key=document_key(pdf_file))
+
+
+# ------------------------
+# Form layouts
+# ------------------------
+def layout_w2(index: WordIndex, source_file: Any) -> Dict[str, Any]:
+    ssn = index.labeled(["Employee's social security number"], _is(SSN_RE)) or index.first_matching(SSN_RE)
+    ein = index.labeled(["Employer identification number"], _is(EIN_RE)) or index.first_matching(EIN_RE)
+
+    employer_lines = index.text_lines("Employer's name, address, and ZIP code")
+    employer_parts = [p.strip() for p in ", ".join(employer_lines).split(',') if p.strip()]
+
+    first_name = last_name = None
+    first_lines = index.text_lines("Employee's first name and initial", height=24)
+    last_lines = index.text_lines("Last name", height=24)
+    if first_lines and last_lines:
+        first_name, last_name = first_lines[0].split()[0], last_lines[0].split()[0]
+
+    address_lines = index.text_lines("Employee's address and ZIP code")
+    if address_lines and first_name and address_lines[0].startswith(first_name):
+        address_lines = address_lines[1:]  # name line printed above the street
+    elif address_lines and not first_name:
+        name_parts = address_lines[0].split()
+        if len(name_parts) >= 2:
+            first_name, last_name = name_parts[0], name_parts[-1]
+            address_lines = address_lines[1:]
+
+    return {
+        'source_file': source_file,
+        'first_name': first_name,
+        'last_name': last_name,
+        'ssn': ssn.replace(' ', '') if ssn else None,
+        'filing_status': None,  # Not on W2
+        'address': ", ".join(address_lines) or None,
+        'employer_name': employer_parts[0] if employer_parts else None,
+        'employer_ein': ein.replace(' ', '') if ein else None,
+        'wages': index.amount("Wages, tips, other compensation"),
+        'federal_tax_withheld': index.amount("Federal income tax withheld"),
+        'state_tax_withheld': index.amount("State income tax"),
+    }
+
+
+def layout_1099_int(index: WordIndex, source_file: Any) -> Dict[str, Any]:
+    payer_lines = index.text_lines("PAYER'S name")
+    recipient_lines = index.text_lines("RECIPIENT'S name", height=24)
+    return {
+        "source_file": source_file,
+
+        "payer_name": payer_lines[0] if payer_lines else None,
+        "payer_tin": index.labeled(["PAYER'S TIN"], _is(EIN_RE)),
+        "recipient_name": recipient_lines[0] if recipient_lines else None,
+        "recipient_tin": index.labeled(["RECIPIENT'S TIN"], _is(SSN_RE)),
+
+        # ----- Standard IRS usable fields -----
+        "interest_income": index.amount("Interest income"),
+        "early_withdrawal_penalty": index.amount("Early withdrawal penalty"),
+        "federal_tax_withheld": index.amount("Federal income tax withheld"),
+        "state": None,                   # box 16, not read by the markdown parser either
+        "state_tax_withheld": index.amount("State tax withheld"),
+    }
+
+
+def layout_1099_nec(index: WordIndex, source_file: Any) -> Dict[str, Any]:
+    payer_lines = index.text_lines("PAYER'S name")
+    street = index.text_lines("Street address (including apt. no.)", height=24)
+    city = index.text_lines("City or town, state or province, country, and ZIP or foreign postal code", height=24)
+    return {
+        "source_file": source_file,
+        "payer_name": payer_lines[0] if payer_lines else None,
+        "recipient_address": f"{street[0]}, {city[0]}" if street and city else None,
+        "nonemployee_compensation": index.amount("Nonemployee compensation"),
+        "federal_tax_withheld": index.amount("Federal income tax withheld"),
+        "state_tax_withheld": index.amount("State tax withheld"),
+        "state_income": index.amount("State income"),
+    }
@@ -0,0 +1,342 @@
+"""
+Lightweight stage instrumentation for the extractors, tax engine and 1040 generator.
+
+Code records through the module-level helpers:
+
+    with metrics.timer("markdown"):            # stage_seconds{stage="markdown"}
+        ...
+    metrics.inc("errors_total", stage="fill_1040")
+    metrics.observe("document_pages", doc.page_count)
+
+and a pluggable sink decides what happens to the data:
+
+    NullSink         default; every helper returns after one attribute check
+    LoggingSink      one log line per event (logger "backend.metrics")
+    MetricsRegistry  in-process counters/histograms, rendered as Prometheus text
+
+Pick one with configure_metrics(), or set TAX_AGENT_METRICS=log|prometheus.
+Process-pool workers record into a fresh registry per task and ship the
+snapshot back with the result (see run_recorded), so a registry in the
+parent sees the work done in its workers.
+"""
+from bisect import bisect_left
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import os
+import threading
+import time
+
+METRICS_ENV = "TAX_AGENT_METRICS"
+METRIC_PREFIX = "tax_agent_"
+
+# Histogram buckets by metric name; anything else uses DEFAULT_BUCKETS (seconds)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS: Dict[str, Tuple[float, ...]] = {
+    "document_pages": (1, 2, 3, 4, 6, 8, 12, 16, 32, 64, 128),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# ------------------------
+# Sinks
+# ------------------------
+class NullSink:
+    """Drops everything. `enabled` is what the hot path checks."""
+    enabled = False
+    aggregates = False
+
+    def inc(self, name: str, amount: float, labels: Dict[str, Any]) -> None:
+        pass
+
+    def observe(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        pass
+
+
+class LoggingSink(NullSink):
+    """Logs each event, e.g. `stage_seconds stage=markdown value=0.8123`."""
+    enabled = True
+
+    def __init__(self, logger=None, level: Optional[int] = None):
+        import logging
+
+        self.logger = logger or logging.getLogger("backend.metrics")
+        self.level = logging.INFO if level is None else level
+
+    def _log(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        if self.logger.isEnabledFor(self.level):
+            rendered = " ".join(f"{k}={v}" for k, v in sorted(labels.items()))
+            self.logger.log(self.level, "%s %s value=%s", name, rendered, round(value, 6))
+
+    inc = observe = _log
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry(NullSink):
+    """
+    Aggregates counters and histograms in memory. render() returns the
+    Prometheus text exposition format; snapshot()/merge() move data between
+    processes.
+    """
+    enabled = True
+    aggregates = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+
+    def inc(self, name: str, amount: float, labels: Dict[str, Any]) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(BUCKETS.get(name, DEFAULT_BUCKETS))
+            histogram.add(value)
+
+    # ------------------------
+    # Reading
+    # ------------------------
+    def counter(self, name: str, **labels: Any) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def histogram(self, name: str, **labels: Any) -> Optional[Dict[str, float]]:
+        """{"count", "sum"} of one histogram series, or None if nothing was observed."""
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(_label_key(labels))
+            return None if histogram is None else {"count": histogram.count, "sum": histogram.sum}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Picklable copy of everything recorded so far."""
+        with self._lock:
+            return {
+                "counters": {name: dict(series) for name, series in self._counters.items()},
+                "histograms": {name: {key: (h.bounds, list(h.counts), h.sum, h.count)
+                                      for key, h in series.items()}
+                               for name, series in self._histograms.items()},
+            }
+
+    def merge(self, snapshot: Optional[Dict[str, Any]]) -> None:
+        if not snapshot:
+            return
+        with self._lock:
+            for name, series in snapshot["counters"].items():
+                mine = self._counters.setdefault(name, {})
+                for key, amount in series.items():
+                    mine[key] = mine.get(key, 0) + amount
+            for name, series in snapshot["histograms"].items():
+                mine_h = self._histograms.setdefault(name, {})
+                for key, (bounds, counts, total, count) in series.items():
+                    histogram = mine_h.get(key)
+                    if histogram is None:
+                        histogram = mine_h[key] = _Histogram(tuple(bounds))
+                    if histogram.bounds != tuple(bounds):
+                        continue  # bucket layout changed between versions; don't mix them
+                    histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                    histogram.sum += total
+                    histogram.count += count
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ------------------------
+    # Prometheus text format
+    # ------------------------
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._counters):
+                full = METRIC_PREFIX + name
+                lines.append(f"# TYPE {full} counter")
+                for key, amount in sorted(self._counters[name].items()):
+                    lines.append(f"{full}{_render_labels(key)} {_number(amount)}")
+            for name in sorted(self._histograms):
+                full = METRIC_PREFIX + name
+                lines.append(f"# TYPE {full} histogram")
+                for key, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else _number(bound)
+                        lines.append(f"{full}_bucket{_render_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{full}_sum{_render_labels(key)} {_number(histogram.sum)}")
+                    lines.append(f"{full}_count{_render_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_textfile(self, path) -> None:
+        """Write render() atomically, e.g. for node_exporter's textfile collector."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as file:
+            file.write(self.render())
+        os.replace(tmp, path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _render_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# ------------------------
+# Process-wide sink
+# ------------------------
+def _sink_from_env() -> NullSink:
+    choice = (os.environ.get(METRICS_ENV) or "").strip().lower()
+    if choice == "log":
+        return LoggingSink()
+    if choice == "prometheus":
+        return MetricsRegistry()
+    return NullSink()
+
+
+_sink: NullSink = _sink_from_env()
+
+
+def configure_metrics(sink: Optional[NullSink] = None) -> NullSink:
+    """Install a sink for this process (None = disable); returns it."""
+    global _sink
+    _sink = sink if sink is not None else NullSink()
+    return _sink
+
+
+def get_sink() -> NullSink:
+    return _sink
+
+
+def enabled() -> bool:
+    return _sink.enabled
+
+
+def inc(name: str, amount: float = 1, **labels: Any) -> None:
+    sink = _sink
+    if sink.enabled:
+        sink.inc(name, amount, labels)
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    sink = _sink
+    if sink.enabled:
+        sink.observe(name, value, labels)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("sink", "stage", "labels", "started")
+
+    def __init__(self, sink: NullSink, stage: str, labels: Dict[str, Any]):
+        self.sink, self.stage, self.labels = sink, stage, labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        labels = dict(self.labels, stage=self.stage)
+        self.sink.observe("stage_seconds", time.perf_counter() - self.started, labels)
+        if exc_type is not None:
+            self.sink.inc("errors_total", 1, labels)
+
+
+def timer(stage: str, **labels: Any):
+    """Context manager timing a stage into stage_seconds (and errors_total if it raises)."""
+    sink = _sink
+    if not sink.enabled:
+        return _NULL_TIMER
+    return _Timer(sink, stage, labels)
+
+
+def timed(stage: str, **labels: Any) -> Callable:
+    """Decorator form of timer()."""
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            sink = _sink
+            if not sink.enabled:
+                return fn(*args, **kwargs)
+            with _Timer(sink, stage, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ------------------------
+# Process pools
+# ------------------------
+def run_recorded(fn: Callable, *args: Any, **kwargs: Any) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """
+    Worker-side wrapper for process pools: returns (fn's result, metrics
+    snapshot or None). When the worker's sink aggregates, the call records
+    into a fresh registry so only this task's data goes back to the parent,
+    which passes it to merge(). If fn raises, the snapshot rides along on the
+    exception as `metrics_snapshot`. Don't use from threads: it swaps the
+    process-wide sink while fn runs.
+    """
+    global _sink
+    parent = _sink
+    if not parent.aggregates:
+        return fn(*args, **kwargs), None
+    recording = _sink = MetricsRegistry()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        e.metrics_snapshot = recording.snapshot()
+        raise
+    finally:
+        _sink = parent
+    return result, recording.snapshot()
+
+
+def merge(snapshot: Optional[Dict[str, Any]]) -> None:
+    """Fold a worker's snapshot into this process's sink (no-op unless it aggregates)."""
+    sink = _sink
+    if snapshot and sink.aggregates:
+        sink.merge(snapshot)
+
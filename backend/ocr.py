@@ -0,0 +1,270 @@
+"""
+OCR fallback for scanned forms (pages with no usable text layer).
+
+A page needs OCR when its text layer holds next to nothing while images
+cover a good part of it; blank separator pages have neither and are left
+alone. Only the image region of such a page is rasterized and handed to
+tesseract (via pytesseract, which runs it as a subprocess). At most
+TAX_AGENT_OCR_WORKERS tesseract runs happen at once across the parent and
+all of its worker processes: the slots are a semaphore created in the
+parent and handed to process pools through their initializer (see
+ocr_gate / share_ocr_gate), so OCR can't take over the CPUs the text-layer
+extractors are using however many extraction workers there are.
+
+Rasters (in-process LRU, bounded by bytes) and OCR words (an
+ExtractionCache, sharing the disk tier under TAX_AGENT_CACHE_DIR/ocr) are
+keyed by the document's content hash, page and region, so a retry or a
+re-upload never rasterizes or OCRs the same page twice.
+
+OCR words come back in the (x0, y0, x1, y1, text, block, line, word) shape
+of fitz's get_text("words"), in PDF points, so layout_extract.WordIndex
+takes them as they are.
+"""
+from collections import OrderedDict
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Tuple
+import hashlib
+import multiprocessing
+import os
+import shutil
+import threading
+
+from . import metrics
+from .extraction_cache import CACHE_DIR_ENV, ExtractionCache, content_hash
+
+if TYPE_CHECKING:
+    from multiprocessing.synchronize import BoundedSemaphore
+
+    import fitz
+
+# Bump when OCR output changes (tesseract config, word post-processing) so cached words are dropped.
+OCR_VERSION = "1"
+OCR_WORKERS_ENV = "TAX_AGENT_OCR_WORKERS"
+OCR_DPI = 300
+OCR_LANG = "eng"
+MIN_TEXT_CHARS = 32          # fewer characters than this on a page = no usable text layer
+MIN_IMAGE_COVERAGE = 0.25    # share of the page images must cover for it to count as scanned
+MAX_RASTER_CACHE_BYTES = 64 * 1024 * 1024
+
+OcrWord = Tuple[float, float, float, float, str, int, int, int]
+
+
+class OCRUnavailable(RuntimeError):
+    """A page needs OCR but pytesseract or the tesseract binary is missing."""
+
+
+# ------------------------
+# Detection
+# ------------------------
+def scanned_region(page: "fitz.Page", text_chars: int) -> Optional["fitz.Rect"]:
+    """
+    The region to OCR when a page has no usable text layer (text_chars is
+    how much text it has), else None: the union of its image rectangles,
+    clipped to the page.
+    """
+    if text_chars >= MIN_TEXT_CHARS:
+        return None
+    region = None
+    for image in page.get_images(full=True):
+        for rect in page.get_image_rects(image[0]):
+            region = rect if region is None else region | rect
+    if region is None:
+        return None
+    region &= page.rect
+    if region.is_empty or region.get_area() < MIN_IMAGE_COVERAGE * page.rect.get_area():
+        return None
+    return region
+
+
+def page_needs_ocr(page: "fitz.Page") -> bool:
+    return scanned_region(page, len(page.get_text("text").strip())) is not None
+
+
+def document_needs_ocr(pdf_file: Any) -> bool:
+    """Cheap check (text layer and image list only) for any scanned page in an upload."""
+    from .pdf_loader import opened_pdf
+
+    with opened_pdf(pdf_file) as doc:
+        return any(page_needs_ocr(page) for page in doc)
+
+
+def ocr_available() -> bool:
+    global _available
+    if _available is None:
+        try:
+            import pytesseract
+        except ImportError:
+            _available = False
+        else:
+            _available = shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+    return _available
+
+
+_available: Optional[bool] = None
+
+
+# ------------------------
+# Caches
+# ------------------------
+class RasterCache:
+    """LRU of rendered PNGs, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int = MAX_RASTER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._images: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key: str, image: bytes) -> None:
+        with self._lock:
+            old = self._images.pop(key, None)
+            self._bytes += len(image) - (len(old) if old is not None else 0)
+            self._images[key] = image
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                _, dropped = self._images.popitem(last=False)
+                self._bytes -= len(dropped)
+
+
+def _ocr_cache_dir() -> Optional[str]:
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    return os.path.join(cache_dir, "ocr") if cache_dir else None
+
+
+RASTER_CACHE = RasterCache()
+OCR_CACHE = ExtractionCache(disk_dir=_ocr_cache_dir())
+
+
+def document_key(pdf_file: Any) -> Callable[[], str]:
+    """Content hash of an upload, computed on first use (only scanned documents pay for it)."""
+    key: List[str] = []
+
+    def get() -> str:
+        if not key:
+            key.append(content_hash(pdf_file))
+        return key[0]
+    return get
+
+
+# ------------------------
+# OCR slots
+# ------------------------
+_gate: Optional["BoundedSemaphore"] = None
+_gate_lock = threading.Lock()
+
+
+def _ocr_workers() -> int:
+    return max(1, int(os.environ.get(OCR_WORKERS_ENV) or 1))
+
+
+def ocr_gate() -> "BoundedSemaphore":
+    """
+    The process-shared OCR slots. Call it in the parent before starting a
+    process pool and pass the result to share_ocr_gate in the pool's
+    initializer; forked children also inherit it directly.
+    """
+    global _gate
+    with _gate_lock:
+        if _gate is None:
+            _gate = multiprocessing.BoundedSemaphore(_ocr_workers())
+        return _gate
+
+
+def share_ocr_gate(gate: "BoundedSemaphore") -> None:
+    """Pool initializer: draw OCR slots from the parent's semaphore instead of making new ones."""
+    global _gate
+    _gate = gate
+
+
+def _reset_gate_lock() -> None:
+    # The semaphore itself is shared with the parent and stays; only the thread lock is per process
+    global _gate_lock
+    _gate_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_gate_lock)
+
+
+def _ocr_image(png: bytes, lang: str) -> List[Tuple[int, int, int, int, str, int, int, int]]:
+    """Tesseract words as pixel boxes (left, top, width, height, text, block, line, word)."""
+    import pytesseract
+    from PIL import Image
+
+    with metrics.timer("ocr"):
+        data = pytesseract.image_to_data(Image.open(BytesIO(png)), lang=lang,
+                                         output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(data["text"]):
+        text = text.strip()
+        if text and float(data["conf"][i]) >= 0:
+            words.append((data["left"][i], data["top"][i], data["width"][i], data["height"][i], text,
+                          data["block_num"][i], data["par_num"][i] * 1000 + data["line_num"][i],
+                          data["word_num"][i]))
+    return words
+
+
+# ------------------------
+# Public API
+# ------------------------
+def ocr_page_words(doc: "fitz.Document", page_no: int, region: "fitz.Rect",
+                   doc_key: Callable[[], str], dpi: int = OCR_DPI, lang: str = OCR_LANG) -> List[OcrWord]:
+    """OCR one page's scanned region; words in PDF points, as fitz would return them."""
+    clip = tuple(round(v, 1) for v in region)
+    key = hashlib.sha256(f"{doc_key()}|{page_no}|{clip}|{dpi}|{lang}|{OCR_VERSION}".encode()).hexdigest()
+    cached = OCR_CACHE.get(key)
+    metrics.inc("ocr_pages_total", result="miss" if cached is None else "hit")
+    if cached is None:
+        if not ocr_available():
+            raise OCRUnavailable(f"Page {page_no + 1} has no text layer and OCR is not available "
+                                 "(install tesseract and pytesseract)")
+        png = RASTER_CACHE.get(key)
+        if png is None:
+            with metrics.timer("rasterize"):
+                png = doc[page_no].get_pixmap(dpi=dpi, clip=region, colorspace="gray").tobytes("png")
+            RASTER_CACHE.put(key, png)
+        gate = ocr_gate()
+        with metrics.timer("ocr_wait"):
+            gate.acquire()
+        try:
+            words = _ocr_image(png, lang)
+        finally:
+            gate.release()
+        cached = {"words": words}
+        OCR_CACHE.put(key, cached)
+
+    scale = 72.0 / dpi
+    x0, y0 = region.x0, region.y0
+    return [(x0 + left * scale, y0 + top * scale, x0 + (left + width) * scale, y0 + (top + height) * scale,
+             text, block, line, word)
+            for left, top, width, height, text, block, line, word in cached["words"]]
+
+
+def page_words(doc: "fitz.Document", page_no: int, doc_key: Optional[Callable[[], str]]) -> List[Any]:
+    """
+    fitz words for a page, or OCR words when it is a scanned page (and a
+    doc_key was given to cache them under).
+    """
+    page = doc[page_no]
+    words = page.get_text("words", sort=True)
+    if doc_key is not None:
+        region = scanned_region(page, sum(len(w[4]) for w in words))
+        if region is not None:
+            return ocr_page_words(doc, page_no, region, doc_key)
+    return words
+
+
+def page_text(doc: "fitz.Document", page_no: int, doc_key: Callable[[], str]) -> str:
+    """A page's text layer, or its OCR text when it is a scanned page."""
+    page = doc[page_no]
+    text = page.get_text("text")
+    region = scanned_region(page, len(text.strip()))
+    if region is None:
+        return text
+    return " ".join(word[4] for word in ocr_page_words(doc, page_no, region, doc_key))
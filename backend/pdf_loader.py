@@ -0,0 +1,109 @@
+"""
+Shared in-memory ingestion layer for uploaded PDFs.
+
+Every extractor used to dump the upload to a NamedTemporaryFile just so
+pymupdf4llm could open it by path. Here we open the upload straight from its
+buffer as a fitz document instead, so no temp files are written on the hot path.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, Sequence, Union
+import mmap
+
+from . import metrics
+
+# PyMuPDF and pymupdf4llm take a noticeable share of cold start, so they are
+# imported on first use rather than with this module.
+if TYPE_CHECKING:
+    import fitz
+
+
+def pdf_buffer(pdf_file: Any) -> Union[bytes, memoryview]:
+    """
+    Return the raw PDF bytes of an upload without copying where possible.
+
+    Streamlit's UploadedFile is an io.BytesIO, so getbuffer() hands us a
+    memoryview over the data it already holds. Anything else falls back to
+    read(), rewinding first so repeated calls see the whole document.
+    """
+    if isinstance(pdf_file, (bytes, bytearray, memoryview)):
+        return pdf_file
+    if hasattr(pdf_file, "getbuffer"):
+        return pdf_file.getbuffer()
+    if hasattr(pdf_file, "seek"):
+        pdf_file.seek(0)
+    return pdf_file.read()
+
+
+@contextmanager
+def opened_pdf(pdf_file: Any) -> Iterator["fitz.Document"]:
+    """
+    Open an upload (or raw bytes) as a fitz document, entirely in memory.
+
+    fitz keeps a reference to its stream even after close(), so we give it a
+    view we own and release that view on exit; otherwise shared-memory and
+    BytesIO buffers stay pinned until the garbage collector gets around to it.
+    """
+    import fitz  # PyMuPDF
+
+    view = memoryview(pdf_buffer(pdf_file))
+    try:
+        with metrics.timer("pdf_open"):
+            doc = fitz.open(stream=view, filetype="pdf")
+        if metrics.enabled():
+            metrics.observe("document_pages", doc.page_count)
+            metrics.inc("document_bytes_total", view.nbytes)
+        try:
+            yield doc
+        finally:
+            doc.close()
+    finally:
+        view.release()
+
+
+def pdf_to_markdown(pdf_file: Any) -> str:
+    """Convert an upload to markdown via pymupdf4llm without touching disk."""
+    import pymupdf4llm
+
+    with opened_pdf(pdf_file) as doc, metrics.timer("markdown"):
+        return pymupdf4llm.to_markdown(doc)
+
+
+def pages_to_markdown(doc: "fitz.Document", pages: Sequence[int]) -> str:
+    """Markdown for some pages of an open document (0-based page numbers)."""
+    import pymupdf4llm
+
+    with metrics.timer("markdown"):
+        return pymupdf4llm.to_markdown(doc, pages=list(pages))
+
+
+@contextmanager
+def mapped_pdf(path) -> Iterator["BufferedPDF"]:
+    """
+    Memory-map a PDF on disk and wrap it as an upload. Pages are read in by
+    the OS as fitz touches them, so a multi-gigabyte file is never copied
+    into process memory, and worker processes mapping the same file share
+    the page cache.
+    """
+    path = Path(path)
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield BufferedPDF(path.name, mapped)
+
+
+class BufferedPDF:
+    """
+    Upload-like wrapper around a buffer we already hold (bytes, mmap,
+    shared memory). Lets workers hand a document to the extractors under
+    its original file name without copying the data into a new BytesIO.
+    """
+    __slots__ = ("name", "_buffer")
+
+    def __init__(self, name: Any, buffer: Union[bytes, memoryview, mmap.mmap]):
+        self.name = name
+        self._buffer = buffer
+
+    def getbuffer(self) -> memoryview:
+        return memoryview(self._buffer)
+
+    def read(self) -> bytes:
+        return bytes(self._buffer)
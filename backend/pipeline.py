@@ -0,0 +1,293 @@
+"""
+Headless batch pipeline: PDFs -> extracted forms -> tax summary -> 1040.
+
+    python -m backend.pipeline manifest.jsonl --out results/
+    python -m backend.pipeline clients/ --out results/
+
+A manifest is JSONL, one client per line:
+
+    {"id": "c001", "year": "2024", "taxpayer": {...profile...},
+     "w2s": ["a.pdf"], "1099ints": [], "1099necs": [], "documents": ["mixed.pdf"]}
+
+Document paths are relative to the manifest; "documents" are classified
+automatically. A client directory holds a taxpayer.json ({"taxpayer": ...,
+"year": ...}) and the client's PDFs, all classified automatically.
+
+Extraction runs in its own thread feeding a small queue, so the next
+client's documents are being extracted while the previous client's 1040 is
+being filled. Results stream to <out>/summaries.jsonl and <out>/pdfs/;
+with --columnar the forms and tax summaries also go to <out>/forms.parquet
+and <out>/summaries.parquet (see backend.columnar).
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import argparse
+import itertools
+import json
+import queue
+import re
+import sys
+import threading
+import time
+
+from . import metrics
+from .batch_extract import extract_forms
+from .bulk_1040 import iter_fill_1040
+from .calculate_taxes import calculate_taxes
+from .generate_1040 import FORM_1040_TEMPLATE_PATH
+from .layout_extract import EXTRACTION_MODES, MODE_MARKDOWN
+from .ocr import ocr_gate, share_ocr_gate
+from .pdf_loader import BufferedPDF
+from .tax_return import init_tax_return
+
+DEFAULT_YEAR = "2024"
+DOCUMENT_KEYS = ("w2s", "1099ints", "1099necs", "documents")
+
+_DONE = object()
+
+
+# ------------------------
+# Inputs
+# ------------------------
+def load_manifest(path) -> Iterator[Dict[str, Any]]:
+    """Clients from a JSONL manifest, document paths resolved against its directory."""
+    path = Path(path)
+    with open(path, 'r') as file:
+        for line_no, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            client = json.loads(line)
+            client.setdefault("id", f"line{line_no}")
+            for key in DOCUMENT_KEYS:
+                client[key] = [str(path.parent / doc) for doc in client.get(key) or []]
+            yield client
+
+
+def load_client_dirs(root) -> Iterator[Dict[str, Any]]:
+    """One client per subdirectory: taxpayer.json plus the client's PDFs."""
+    for directory in sorted(p for p in Path(root).iterdir() if p.is_dir()):
+        info_path = directory / "taxpayer.json"
+        client = json.loads(info_path.read_text()) if info_path.exists() else {}
+        client.setdefault("id", directory.name)
+        client["documents"] = [str(p) for p in sorted(directory.glob("*.pdf"))]
+        yield client
+
+
+def load_clients(source) -> Iterator[Dict[str, Any]]:
+    return load_client_dirs(source) if Path(source).is_dir() else load_manifest(source)
+
+
+def _open_documents(paths: Iterable[str]) -> List[BufferedPDF]:
+    return [BufferedPDF(Path(p).name, Path(p).read_bytes()) for p in paths]
+
+
+def _safe_name(client_id: Any) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", str(client_id)).strip("-") or "client"
+
+
+# ------------------------
+# Pipeline
+# ------------------------
+def _extract_client(client: Dict[str, Any], executor: Any, mode: str) -> Dict[str, Any]:
+    """Stage 1: extract every document of one client into a tax_return."""
+    started = time.perf_counter()
+    tax_return = init_tax_return()
+    tax_return["taxpayer"].update(client.get("taxpayer") or {})
+    files = {key: _open_documents(client.get(key) or []) for key in DOCUMENT_KEYS}
+    extracted = extract_forms(files["w2s"], files["1099ints"], files["1099necs"],
+                              unsorted_files=files["documents"], tax_return=tax_return,
+                              executor=executor, mode=mode)
+    return {
+        "tax_return": tax_return,
+        "extracted": extracted,
+        "documents": sum(len(docs) for docs in files.values()),
+        "extract_seconds": time.perf_counter() - started,
+    }
+
+
+def run_pipeline(clients: Iterable[Dict[str, Any]],
+                 out_dir,
+                 year: str = DEFAULT_YEAR,
+                 max_workers: Optional[int] = None,
+                 executor: str = "process",
+                 mode: str = MODE_MARKDOWN,
+                 prefetch: int = 2,
+                 template_path=FORM_1040_TEMPLATE_PATH,
+                 log=sys.stderr,
+                 columnar: bool = False) -> Dict[str, Any]:
+    """
+    Run clients through extraction, tax calculation and 1040 generation.
+
+    Writes one JSONL record per client to out_dir/summaries.jsonl (in
+    completion order) and each 1040 to out_dir/pdfs/; columnar=True also
+    writes every form and summary to out_dir/forms.parquet and
+    out_dir/summaries.parquet. Returns throughput stats.
+    """
+    out_dir = Path(out_dir)
+    pdf_dir = out_dir / "pdfs"
+    pdf_dir.mkdir(parents=True, exist_ok=True)
+
+    stats = {"clients": 0, "succeeded": 0, "failed": 0, "documents": 0,
+             "extract_seconds": 0.0, "elapsed_seconds": 0.0}
+    started = time.perf_counter()
+    ready: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, prefetch))
+    stopping = threading.Event()
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers, initializer=share_ocr_gate, initargs=(ocr_gate(),))
+    else:
+        pool = ThreadPoolExecutor(max_workers)
+
+    def put(item: Any) -> None:
+        # Gives up once stages 2/3 have stopped reading, so a failed run can't leave this thread blocked
+        while not stopping.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def extract_stage() -> None:
+        try:
+            for client in clients:
+                if stopping.is_set():
+                    return
+                try:
+                    put((client, _extract_client(client, pool, mode), None))
+                except Exception as e:
+                    put((client, None, f"Failed to extract documents: {e}"))
+        except Exception as e:
+            put(({"id": None}, None, f"Failed to read clients: {e}"))
+        finally:
+            put(_DONE)
+
+    extractor = threading.Thread(target=extract_stage, name="extract-stage", daemon=True)
+    extractor.start()
+
+    form_writer = summary_writer = None
+    fills = None
+    try:
+        if columnar:
+            from .columnar import FormWriter, SummaryWriter
+
+            form_writer = FormWriter(out_dir / "forms.parquet")
+            summary_writer = SummaryWriter(out_dir / "summaries.parquet")
+
+        with open(out_dir / "summaries.jsonl", 'w') as summaries:
+            def emit(record: Dict[str, Any]) -> None:
+                stats["clients"] += 1
+                stats["failed" if "error" in record else "succeeded"] += 1
+                summaries.write(json.dumps(record) + "\n")
+                summaries.flush()
+
+            submitted: Dict[int, Dict[str, Any]] = {}  # fill index -> record waiting for its 1040
+            fill_index = itertools.count()
+
+            def calculated() -> Iterator[Any]:
+                """Stage 2: tax summaries, handed to the 1040 workers as they are ready."""
+                while True:
+                    item = ready.get()
+                    if item is _DONE:
+                        return
+                    client, result, error = item
+                    record: Dict[str, Any] = {"id": client.get("id"), "year": str(client.get("year") or year)}
+                    if result is not None:
+                        stats["documents"] += result["documents"]
+                        stats["extract_seconds"] += result["extract_seconds"]
+                        extracted = result["extracted"]
+                        record["forms"] = {key: len(extracted[key]) for key in ("w2s", "1099ints", "1099necs")}
+                        record["document_errors"] = [form for forms in extracted.values()
+                                                     for form in forms if "error" in form]
+                        try:
+                            tax_return = result["tax_return"]
+                            record["tax_summary"] = calculate_taxes(tax_return, record["year"], use_totals=True)
+                        except Exception as e:
+                            error = f"Failed to calculate taxes: {e}"
+                        if form_writer is not None:
+                            return_id = client.get("id")
+                            form_writer.add_tax_return(result["tax_return"], return_id, record["year"])
+                            form_writer.add_results((("unrecognized", form) for form in extracted["unrecognized"]),
+                                                    return_id, record["year"])
+                            if error is None:
+                                summary_writer.add(record["tax_summary"], return_id, record["year"],
+                                                   result["tax_return"]["taxpayer"].get("filing_status"))
+                    if error is not None:
+                        record["error"] = error
+                        emit(record)
+                        continue
+                    submitted[next(fill_index)] = record
+                    yield tax_return["taxpayer"], record["tax_summary"]
+
+            # Stage 3: 1040s, filled in parallel and written as they complete
+            fills = iter_fill_1040(calculated(), template_path, executor, max_workers)
+            for index, pdf_bytes, error in fills:
+                record = submitted.pop(index)
+                if error is None:
+                    pdf_path = pdf_dir / f"{_safe_name(record['id'])}_1040.pdf"
+                    pdf_path.write_bytes(pdf_bytes)
+                    record["pdf"] = str(pdf_path.relative_to(out_dir))
+                else:
+                    record["error"] = error
+                emit(record)
+    finally:
+        # However stages 2/3 ended: stop the extraction stage, then release the workers and
+        # close the writers (an unclosed Parquet file has no footer and can't be read)
+        stopping.set()
+        if fills is not None:
+            fills.close()
+        extractor.join()
+        pool.shutdown(wait=True, cancel_futures=True)
+        if form_writer is not None:
+            form_writer.close()
+        if summary_writer is not None:
+            summary_writer.close()
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["extract_seconds"] = round(stats["extract_seconds"], 3)
+    stats["clients_per_second"] = round(stats["clients"] / elapsed, 3) if elapsed else 0.0
+    stats["documents_per_second"] = round(stats["documents"] / elapsed, 3) if elapsed else 0.0
+    if log is not None:
+        print(f"{stats['clients']} clients ({stats['succeeded']} ok, {stats['failed']} failed), "
+              f"{stats['documents']} documents in {stats['elapsed_seconds']}s: "
+              f"{stats['clients_per_second']} clients/s, {stats['documents_per_second']} docs/s", file=log)
+    return stats
+
+
+# ------------------------
+# CLI
+# ------------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract W-2/1099 PDFs, calculate taxes and fill 1040s in bulk.")
+    parser.add_argument("source", help="JSONL manifest, or a directory with one subdirectory per taxpayer")
+    parser.add_argument("--out", required=True, help="output directory (summaries.jsonl + pdfs/)")
+    parser.add_argument("--year", default=DEFAULT_YEAR, help="tax year when a client doesn't specify one")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes per stage")
+    parser.add_argument("--executor", choices=("process", "thread"), default="process")
+    parser.add_argument("--mode", choices=EXTRACTION_MODES, default=MODE_MARKDOWN)
+    parser.add_argument("--prefetch", type=int, default=2, help="clients extracted ahead of generation")
+    parser.add_argument("--stats-json", action="store_true", help="print the final stats as JSON on stdout")
+    parser.add_argument("--metrics-out", help="write per-stage metrics here in Prometheus text format")
+    parser.add_argument("--columnar", action="store_true",
+                        help="also write forms.parquet and summaries.parquet for analytics "
+                             "(needs the 'columnar' extra, i.e. pyarrow)")
+    args = parser.parse_args(argv)
+    if args.columnar:
+        from .columnar import INSTALL_HINT, columnar_available
+
+        if not columnar_available():
+            parser.error(f"--columnar needs pyarrow: {INSTALL_HINT}")
+
+    registry = metrics.configure_metrics(metrics.MetricsRegistry()) if args.metrics_out else None
+    stats = run_pipeline(load_clients(args.source), args.out, year=args.year, max_workers=args.workers,
+                         executor=args.executor, mode=args.mode, prefetch=args.prefetch,
+                         columnar=args.columnar)
+    if registry is not None:
+        registry.write_textfile(args.metrics_out)
+    if args.stats_json:
+        print(json.dumps(stats))
+    return 0 if stats["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
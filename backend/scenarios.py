@@ -0,0 +1,167 @@
+"""
+What-if scenarios: one return, a grid of perturbations, one vectorized call.
+
+    table = sweep(final_tax_data, "2024",
+                  filing_statuses=["married_filing_jointly", "married_filing_separately"],
+                  self_employment_deltas=[-5000, 0],
+                  withholding_deltas=[0, 3000])
+    table.rows()      # one dict per scenario, calculate_taxes keys plus the inputs
+
+Every combination of filing status, year and income / withholding delta
+becomes one row of columnar inputs to calculate_taxes_batch, so a few
+thousand scenarios cost about as much as a handful of calculate_taxes
+calls. tax_curve() gives the exact piecewise-linear tax owed as a function
+of gross income for one filing status, for charts and sliders.
+"""
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .calculate_taxes import calculate_gross_income, calculate_taxes_batch, calculate_total_withholding
+from .tax_config import TAX_CONFIG
+from .tax_return import TaxReturn, from_cents
+
+# Perturbation columns, in grid order
+INPUT_COLUMNS = ("filing_status", "year", "wages_delta", "interest_delta",
+                 "self_employment_delta", "withholding_delta")
+
+
+def base_amounts(tax_data: Any, use_totals: bool = False) -> Tuple[float, float, float, float]:
+    """(wages, interest, self-employment income, federal withholding) of a return, as calculate_taxes sees them."""
+    if isinstance(tax_data, TaxReturn):
+        return (from_cents(tax_data.wages), from_cents(tax_data.interest_income),
+                from_cents(tax_data.self_employment_income), from_cents(tax_data.federal_tax_withheld))
+    if use_totals:
+        totals = tax_data["totals"]
+        return (totals["wages"], totals["interest_income"], totals["self_employment_income"],
+                totals["federal_tax_withheld"])
+    w2s, ints, necs = tax_data.get("w2s", []), tax_data.get("1099ints", []), tax_data.get("1099necs", [])
+    wages, interest_income, self_employment_income, _ = calculate_gross_income(w2s, ints, necs)
+    return wages, interest_income, self_employment_income, calculate_total_withholding(w2s, ints, necs)
+
+
+class ScenarioTable:
+    """Columnar sweep results: the INPUT_COLUMNS plus calculate_taxes' keys, one array each."""
+    __slots__ = ("columns",)
+
+    def __init__(self, columns: Dict[str, Any]):
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns["tax_owed"])
+
+    def __getitem__(self, name: str):
+        return self.columns[name]
+
+    def rows(self) -> List[Dict[str, Any]]:
+        names = list(self.columns)
+        return [dict(zip(names, values)) for values in zip(*(self.columns[n].tolist() for n in names))]
+
+    def best(self, key: str = "refund_or_amount_due") -> Dict[str, Any]:
+        """The scenario with the largest value of key (by default: biggest refund / smallest amount due)."""
+        index = int(self.columns[key].argmax())
+        return {name: column[index:index + 1].tolist()[0] for name, column in self.columns.items()}
+
+
+def sweep(tax_data: Any,
+          year: str = "2024",
+          filing_statuses: Optional[Sequence[str]] = None,
+          wages_deltas: Sequence[float] = (0.0,),
+          interest_deltas: Sequence[float] = (0.0,),
+          self_employment_deltas: Sequence[float] = (0.0,),
+          withholding_deltas: Sequence[float] = (0.0,),
+          years: Optional[Sequence[str]] = None,
+          use_totals: bool = False) -> ScenarioTable:
+    """
+    Evaluate every combination of the given perturbations of one return.
+
+    tax_data is anything calculate_taxes takes (use_totals as there).
+    filing_statuses default to the return's own and years to [year]. Deltas
+    are added to the return's totals; an income or withholding total never
+    goes below zero. Rows come in grid order, filing status varying slowest.
+    """
+    import numpy as np
+
+    taxpayer = tax_data.taxpayer if isinstance(tax_data, TaxReturn) else tax_data.get("taxpayer", {})
+    if filing_statuses is None:
+        filing_statuses = [taxpayer.get("filing_status")]
+    years = [str(y) for y in years] if years is not None else [str(year)]
+    wages, interest_income, self_employment_income, withheld = base_amounts(tax_data, use_totals)
+
+    axes = [np.asarray(filing_statuses, dtype=object), np.asarray(years, dtype=object)] + \
+           [np.asarray(deltas, dtype=float) for deltas in
+            (wages_deltas, interest_deltas, self_employment_deltas, withholding_deltas)]
+    grid = [axis.ravel() for axis in np.meshgrid(*(np.arange(len(a)) for a in axes), indexing="ij")]
+    columns = {name: axis[index] for name, axis, index in zip(INPUT_COLUMNS, axes, grid)}
+
+    results = calculate_taxes_batch(
+        np.maximum(0.0, wages + columns["wages_delta"]),
+        np.maximum(0.0, interest_income + columns["interest_delta"]),
+        np.maximum(0.0, self_employment_income + columns["self_employment_delta"]),
+        np.maximum(0.0, withheld + columns["withholding_delta"]),
+        columns["filing_status"],
+        columns["year"],
+    )
+    columns.update(results)
+    return ScenarioTable(columns)
+
+
+# ------------------------
+# Tax curve
+# ------------------------
+class TaxCurve(NamedTuple):
+    """
+    Tax owed as a piecewise-linear function of gross income: exact values at
+    the breakpoints (standard deduction + each bracket threshold) and the
+    marginal rate after each one.
+    """
+    filing_status: Optional[str]
+    year: str
+    incomes: Tuple[float, ...]
+    taxes: Tuple[float, ...]
+    rates: Tuple[float, ...]
+
+    def tax_owed(self, gross_income):
+        """Tax at any gross income (scalar or array), extending the top bracket past the last breakpoint."""
+        import numpy as np
+
+        incomes = np.asarray(self.incomes)
+        gross_income = np.asarray(gross_income, dtype=float)
+        idx = np.clip(np.searchsorted(incomes, gross_income, side="right") - 1, 0, len(incomes) - 1)
+        return np.asarray(self.taxes)[idx] + (gross_income - incomes[idx]) * np.asarray(self.rates)[idx]
+
+    def marginal_rate(self, gross_income):
+        import numpy as np
+
+        idx = np.clip(np.searchsorted(self.incomes, gross_income, side="right") - 1, 0, len(self.incomes) - 1)
+        return np.asarray(self.rates)[idx]
+
+    def points(self, max_income: float) -> List[Tuple[float, float]]:
+        """(income, tax) corners up to max_income, e.g. for a line chart."""
+        corners = [(i, t) for i, t in zip(self.incomes, self.taxes) if i < max_income]
+        return corners + [(max_income, float(self.tax_owed(max_income)))]
+
+
+def tax_curve(filing_status: Optional[str], year: str = "2024") -> TaxCurve:
+    """The tax-vs-gross-income curve for one filing status and year."""
+    config = TAX_CONFIG[year]
+    deduction = config.standard_deduction(filing_status)
+    table = config.bracket_table(filing_status)
+    incomes: List[float] = [0.0]
+    taxes: List[float] = [0.0]
+    rates: List[float] = [0.0]
+    for low, rate in zip(table.mins, table.rates):
+        income = deduction + low
+        if income == incomes[-1]:
+            rates[-1] = rate  # the first bracket starts right at the deduction
+            continue
+        incomes.append(income)
+        taxes.append(table.tax_owed(low))
+        rates.append(rate)
+    return TaxCurve(filing_status, str(year), tuple(incomes), tuple(taxes), tuple(rates))
+
+
+def compare_filing_statuses(tax_data: Any, year: str = "2024",
+                            filing_statuses: Iterable[str] = ("married_filing_jointly",
+                                                              "married_filing_separately"),
+                            use_totals: bool = False) -> List[Dict[str, Any]]:
+    """One row per filing status for the same income, e.g. MFJ vs MFS."""
+    return sweep(tax_data, year, filing_statuses=list(filing_statuses), use_totals=use_totals).rows()
@@ -0,0 +1,334 @@
+"""
+SQLite persistence for tax returns, their extracted forms, tax summaries
+and generated 1040s.
+
+    store = TaxStore("returns.db")
+    return_id = store.save_return(tax_return, "2024", tax_summary=summary,
+                                  document_hashes={"w2.pdf": content_hash(upload)})
+    store.save_1040(return_id, pdf_bytes)
+    store.load_return(return_id)                  # init_tax_return() shape, totals rebuilt
+    store.returns_for_employer("12-3456789")      # every return with a W-2 from that EIN
+
+One row per return (unique per SSN hash and tax year) and one row per form,
+with the fields we search on pulled out into indexed columns: SSN hash,
+employer EIN, payer TIN, tax year and document content hash. The full
+extractor dict is kept as JSON next to them so nothing is lost. SSNs are
+only indexed as a keyed HMAC, with the key generated per database.
+
+The database runs in WAL mode so readers never block the writer, a
+return's forms are written with one executemany inside one transaction,
+and every query is a module-level constant so sqlite3's statement cache
+keeps it prepared.
+"""
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+
+from .tax_return import (
+    FORM_CONTRIBUTIONS,
+    TaxReturn,
+    add_1099_int_to_tax_return,
+    add_1099_nec_to_tax_return,
+    add_w2_to_tax_return,
+    init_tax_return,
+    to_cents,
+)
+
+STORE_PATH_ENV = "TAX_AGENT_DB"
+SCHEMA_VERSION = 1
+
+# form type -> (tax_return list key, adder)
+FORM_KEYS = {
+    "w2": ("w2s", add_w2_to_tax_return),
+    "1099_int": ("1099ints", add_1099_int_to_tax_return),
+    "1099_nec": ("1099necs", add_1099_nec_to_tax_return),
+}
+
+_FORM_ORDER = {form_type: order for order, form_type in enumerate(FORM_KEYS)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS returns (
+    id          INTEGER PRIMARY KEY,
+    client_id   TEXT,
+    tax_year    TEXT NOT NULL,
+    ssn_hash    TEXT,
+    taxpayer    TEXT NOT NULL,
+    tax_summary TEXT,
+    created     REAL NOT NULL,
+    updated     REAL NOT NULL,
+    UNIQUE (ssn_hash, tax_year)
+);
+CREATE INDEX IF NOT EXISTS returns_year ON returns (tax_year);
+CREATE INDEX IF NOT EXISTS returns_client ON returns (client_id);
+CREATE TABLE IF NOT EXISTS forms (
+    id                   INTEGER PRIMARY KEY,
+    return_id            INTEGER NOT NULL REFERENCES returns (id) ON DELETE CASCADE,
+    form_type            TEXT NOT NULL,
+    position             INTEGER NOT NULL,
+    tax_year             TEXT NOT NULL,
+    content_hash         TEXT,
+    employer_ein         TEXT,
+    payer_tin            TEXT,
+    income_cents         INTEGER NOT NULL,
+    federal_withheld_cents INTEGER NOT NULL,
+    state_withheld_cents INTEGER NOT NULL,
+    data                 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS forms_return ON forms (return_id, form_type, position);
+CREATE INDEX IF NOT EXISTS forms_employer ON forms (employer_ein, tax_year) WHERE employer_ein IS NOT NULL;
+CREATE INDEX IF NOT EXISTS forms_payer ON forms (payer_tin, tax_year) WHERE payer_tin IS NOT NULL;
+CREATE INDEX IF NOT EXISTS forms_content ON forms (content_hash) WHERE content_hash IS NOT NULL;
+CREATE TABLE IF NOT EXISTS pdfs (
+    return_id INTEGER NOT NULL REFERENCES returns (id) ON DELETE CASCADE,
+    kind      TEXT NOT NULL,
+    created   REAL NOT NULL,
+    data      BLOB NOT NULL,
+    PRIMARY KEY (return_id, kind)
+);
+"""
+
+# ------------------------
+# Statements (constants, so sqlite3's statement cache keeps them prepared)
+# ------------------------
+_UPSERT_RETURN = """
+INSERT INTO returns (client_id, tax_year, ssn_hash, taxpayer, tax_summary, created, updated)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (ssn_hash, tax_year) DO UPDATE SET
+    client_id = COALESCE(excluded.client_id, client_id), taxpayer = excluded.taxpayer,
+    tax_summary = COALESCE(excluded.tax_summary, tax_summary), updated = excluded.updated
+RETURNING id
+"""
+_INSERT_RETURN = """
+INSERT INTO returns (client_id, tax_year, ssn_hash, taxpayer, tax_summary, created, updated)
+VALUES (?, ?, NULL, ?, ?, ?, ?) RETURNING id
+"""
+_DELETE_FORMS = "DELETE FROM forms WHERE return_id = ?"
+_INSERT_FORM = """
+INSERT INTO forms (return_id, form_type, position, tax_year, content_hash, employer_ein, payer_tin,
+                   income_cents, federal_withheld_cents, state_withheld_cents, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_SET_SUMMARY = "UPDATE returns SET tax_summary = ?, updated = ? WHERE id = ?"
+_UPSERT_PDF = "INSERT OR REPLACE INTO pdfs (return_id, kind, created, data) VALUES (?, ?, ?, ?)"
+_SELECT_PDF = "SELECT data FROM pdfs WHERE return_id = ? AND kind = ?"
+_SELECT_RETURN = "SELECT client_id, tax_year, taxpayer, tax_summary FROM returns WHERE id = ?"
+_SELECT_FORMS = "SELECT form_type, data FROM forms WHERE return_id = ? ORDER BY form_type, position"
+_FIND_RETURN = "SELECT id FROM returns WHERE ssn_hash = ? AND tax_year = ?"
+_RETURNS_FOR_EMPLOYER = """
+SELECT DISTINCT r.id, r.client_id, r.tax_year FROM forms f JOIN returns r ON r.id = f.return_id
+WHERE f.employer_ein = ? AND (? IS NULL OR f.tax_year = ?) ORDER BY r.id
+"""
+_RETURNS_FOR_PAYER = """
+SELECT DISTINCT r.id, r.client_id, r.tax_year FROM forms f JOIN returns r ON r.id = f.return_id
+WHERE f.payer_tin = ? AND (? IS NULL OR f.tax_year = ?) ORDER BY r.id
+"""
+_FORMS_BY_CONTENT = "SELECT form_type, data FROM forms WHERE content_hash = ? ORDER BY id DESC LIMIT 1"
+_RETURNS_FOR_YEAR = "SELECT id, client_id FROM returns WHERE tax_year = ? ORDER BY id"
+
+
+def _digits(value: Any) -> Optional[str]:
+    """EINs / TINs indexed as bare digits, so '12-3456789' and '123456789' match."""
+    if not value:
+        return None
+    digits = re.sub(r"\D", "", str(value))
+    return digits or None
+
+
+class TaxStore:
+    """
+    One SQLite database. Safe to share between threads (one connection,
+    serialized by a lock); separate processes should open their own
+    TaxStore on the same file, which WAL mode handles.
+    """
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"] = ":memory:"):
+        self.path = str(path)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                                   cached_statements=64)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(SCHEMA)
+        self._ssn_key = self._meta_secret("ssn_hmac_key")
+        self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)",
+                         (str(SCHEMA_VERSION),))
+
+    # ------------------------
+    # Plumbing
+    # ------------------------
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _meta_secret(self, key: str) -> bytes:
+        self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)", (key, secrets.token_hex(32)))
+        return bytes.fromhex(self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0])
+
+    def ssn_hash(self, ssn: Any) -> Optional[str]:
+        """Keyed hash of an SSN (digits only), as stored in returns.ssn_hash."""
+        digits = _digits(ssn)
+        if digits is None:
+            return None
+        return hmac.new(self._ssn_key, digits.encode(), hashlib.sha256).hexdigest()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "TaxStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    # ------------------------
+    # Writing
+    # ------------------------
+    def save_return(self, tax_return: Union[Dict[str, Any], TaxReturn],
+                    year: str,
+                    client_id: Optional[str] = None,
+                    tax_summary: Optional[Dict[str, Any]] = None,
+                    document_hashes: Optional[Dict[Any, str]] = None) -> int:
+        """
+        Insert or replace a return (a dict from init_tax_return() or a
+        TaxReturn) and all of its forms; returns its id. A return is
+        identified by the taxpayer's SSN and the year, so saving again
+        replaces the forms. document_hashes maps source_file -> content hash.
+        """
+        with self._transaction():
+            return self._save_return(tax_return, str(year), client_id, tax_summary, document_hashes or {})
+
+    def save_returns(self, returns: Iterable[Tuple[Union[Dict[str, Any], TaxReturn], str]],
+                     tax_summaries: Optional[Iterable[Optional[Dict[str, Any]]]] = None) -> List[int]:
+        """Bulk save_return for (tax_return, year) pairs, all in one transaction."""
+        summaries = iter(tax_summaries) if tax_summaries is not None else None
+        with self._transaction():
+            return [self._save_return(tax_return, str(year), None,
+                                      next(summaries) if summaries is not None else None, {})
+                    for tax_return, year in returns]
+
+    def _save_return(self, tax_return: Union[Dict[str, Any], TaxReturn], year: str, client_id: Optional[str],
+                     tax_summary: Optional[Dict[str, Any]], document_hashes: Dict[Any, str]) -> int:
+        if isinstance(tax_return, TaxReturn):
+            tax_return = tax_return.to_dict()
+        taxpayer = tax_return.get("taxpayer") or {}
+        ssn_hash = self.ssn_hash(taxpayer.get("ssn"))
+        now = time.time()
+        summary_json = json.dumps(tax_summary) if tax_summary is not None else None
+        if ssn_hash is None:
+            # No SSN yet (e.g. a draft): always a new row, nothing to match it on
+            return_id = self._db.execute(_INSERT_RETURN, (client_id, year, json.dumps(taxpayer),
+                                                          summary_json, now, now)).fetchone()[0]
+        else:
+            return_id = self._db.execute(_UPSERT_RETURN, (client_id, year, ssn_hash, json.dumps(taxpayer),
+                                                          summary_json, now, now)).fetchone()[0]
+        self._db.execute(_DELETE_FORMS, (return_id,))
+
+        rows = []
+        for form_type, (key, _) in FORM_KEYS.items():
+            (income_field, _), (federal_field, _), (state_field, _) = FORM_CONTRIBUTIONS[key]
+            for position, form in enumerate(tax_return.get(key) or []):
+                rows.append((
+                    return_id, form_type, position, year,
+                    document_hashes.get(form.get("source_file")),
+                    _digits(form.get("employer_ein")),
+                    _digits(form.get("payer_tin")),
+                    to_cents(form.get(income_field)),
+                    to_cents(form.get(federal_field)),
+                    to_cents(form.get(state_field)),
+                    json.dumps(form),
+                ))
+        self._db.executemany(_INSERT_FORM, rows)
+        return return_id
+
+    def save_tax_summary(self, return_id: int, tax_summary: Dict[str, Any]) -> None:
+        with self._transaction():
+            self._db.execute(_SET_SUMMARY, (json.dumps(tax_summary), time.time(), return_id))
+
+    def save_1040(self, return_id: int, pdf_bytes: bytes, kind: str = "1040") -> None:
+        with self._transaction():
+            self._db.execute(_UPSERT_PDF, (return_id, kind, time.time(), sqlite3.Binary(pdf_bytes)))
+
+    # ------------------------
+    # Reading
+    # ------------------------
+    def load_return(self, return_id: int) -> Optional[Dict[str, Any]]:
+        """
+        The return in init_tax_return() shape (totals rebuilt through the
+        adders), plus 'id', 'client_id', 'year' and 'tax_summary'; None if missing.
+        """
+        with self._lock:
+            row = self._db.execute(_SELECT_RETURN, (return_id,)).fetchone()
+            if row is None:
+                return None
+            forms = self._db.execute(_SELECT_FORMS, (return_id,)).fetchall()
+        # Same order as recompute_totals (W-2s, then 1099-INTs, then 1099-NECs) so the float sums match
+        forms.sort(key=lambda form: _FORM_ORDER[form[0]])
+        client_id, year, taxpayer, tax_summary = row
+        tax_return = init_tax_return()
+        tax_return["taxpayer"] = json.loads(taxpayer)
+        for form_type, data in forms:
+            FORM_KEYS[form_type][1](tax_return, json.loads(data))
+        tax_return.update(id=return_id, client_id=client_id, year=year,
+                          tax_summary=json.loads(tax_summary) if tax_summary else None)
+        return tax_return
+
+    def load_1040(self, return_id: int, kind: str = "1040") -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute(_SELECT_PDF, (return_id, kind)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def find_return(self, ssn: Any, year: str) -> Optional[int]:
+        """Id of the taxpayer's return for a year, if stored."""
+        ssn_hash = self.ssn_hash(ssn)
+        if ssn_hash is None:
+            return None
+        with self._lock:
+            row = self._db.execute(_FIND_RETURN, (ssn_hash, str(year))).fetchone()
+        return row[0] if row else None
+
+    def _returns_for(self, statement: str, tin: Any, year: Optional[str]) -> List[Dict[str, Any]]:
+        year = str(year) if year is not None else None
+        with self._lock:
+            rows = self._db.execute(statement, (_digits(tin), year, year)).fetchall()
+        return [{"id": return_id, "client_id": client_id, "year": tax_year}
+                for return_id, client_id, tax_year in rows]
+
+    def returns_for_employer(self, ein: Any, year: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Every return holding a W-2 from this employer EIN (optionally for one year)."""
+        return self._returns_for(_RETURNS_FOR_EMPLOYER, ein, year)
+
+    def returns_for_payer(self, tin: Any, year: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Every return holding a 1099 from this payer TIN (optionally for one year)."""
+        return self._returns_for(_RETURNS_FOR_PAYER, tin, year)
+
+    def returns_for_year(self, year: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(_RETURNS_FOR_YEAR, (str(year),)).fetchall()
+        return [{"id": return_id, "client_id": client_id, "year": str(year)} for return_id, client_id in rows]
+
+    def form_by_content_hash(self, content_hash: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(form type, extracted dict) last stored for a document with these bytes, if any."""
+        with self._lock:
+            row = self._db.execute(_FORMS_BY_CONTENT, (content_hash,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
@@ -0,0 +1,222 @@
+"""
+Tax-year configuration registry.
+
+tax_config.json is read on first use (never at import time), from a path
+anchored to this module rather than the working directory. Each year is
+validated and compiled once into immutable bracket tables: thresholds,
+widths, rates and the tax already owed at each threshold, so tax owed is a
+binary search plus one multiply-add.
+
+The registry holds a single immutable snapshot. Readers only dereference
+it; reload() builds a new snapshot off to the side and swaps the reference,
+so the hot path takes no locks and is safe to share across threads and
+forked workers.
+"""
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, Mapping, NamedTuple, Optional, Tuple
+import json
+import os
+
+if TYPE_CHECKING:
+    import numpy as np
+
+TAX_CONFIG_PATH = Path(__file__).with_name("tax_config.json")
+
+
+class TaxConfigError(ValueError):
+    """tax_config.json is missing or malformed."""
+
+
+class BracketTable(NamedTuple):
+    """Compiled brackets for one year / filing status."""
+    mins: Tuple[float, ...]
+    widths: Tuple[float, ...]       # inf for the top bracket
+    rates: Tuple[float, ...]
+    cumulative: Tuple[float, ...]   # tax owed on all income below each bracket
+
+    @classmethod
+    def compile(cls, brackets) -> "BracketTable":
+        mins, widths, rates, cumulative = [], [], [], []
+        tax = 0.0
+        for bracket in brackets:
+            width = float("inf") if bracket["max"] is None else bracket["max"] - bracket["min"]
+            mins.append(bracket["min"])
+            widths.append(width)
+            rates.append(bracket["rate"])
+            cumulative.append(tax)
+            if bracket["max"] is not None:
+                # Same summation order as the bracket-by-bracket loop, so results match it exactly
+                tax += width * bracket["rate"]
+        return cls(tuple(mins), tuple(widths), tuple(rates), tuple(cumulative))
+
+    @property
+    def arrays(self) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
+        """Read-only numpy copies of (mins, widths, rates, cumulative) for the batch engine."""
+        return _bracket_arrays(self)
+
+    def tax_owed(self, taxable_income) -> float:
+        # Last bracket whose minimum is strictly below the income
+        idx = bisect_left(self.mins, taxable_income) - 1
+        if idx < 0:
+            return 0.0
+        amount_taxable = min(taxable_income - self.mins[idx], self.widths[idx])
+        return self.cumulative[idx] + amount_taxable * self.rates[idx]
+
+
+@lru_cache(maxsize=None)
+def _bracket_arrays(table: BracketTable):
+    # numpy is only needed by the batch engine, so it's imported here
+    import numpy as np
+
+    arrays = []
+    for column in table:
+        array = np.array(column, dtype=float)
+        array.flags.writeable = False
+        arrays.append(array)
+    return tuple(arrays)
+
+
+EMPTY_BRACKETS = BracketTable.compile([])
+
+
+class YearConfig(NamedTuple):
+    year: str
+    standard_deductions: Mapping[str, float]
+    brackets: Mapping[str, BracketTable]
+
+    def standard_deduction(self, filing_status) -> float:
+        return self.standard_deductions.get(filing_status, 0.0)
+
+    def bracket_table(self, filing_status) -> BracketTable:
+        return self.brackets.get(filing_status, EMPTY_BRACKETS)
+
+
+def _validate_year(year: str, entry: Any) -> None:
+    if not isinstance(entry, dict):
+        raise TaxConfigError(f"{year}: expected an object")
+    for key in ("tax_brackets", "standard_deductions"):
+        if not isinstance(entry.get(key), dict):
+            raise TaxConfigError(f"{year}: missing '{key}'")
+    for status, amount in entry["standard_deductions"].items():
+        if not isinstance(amount, (int, float)) or amount < 0:
+            raise TaxConfigError(f"{year}/{status}: invalid standard deduction {amount!r}")
+    for status, brackets in entry["tax_brackets"].items():
+        if not brackets:
+            raise TaxConfigError(f"{year}/{status}: no brackets")
+        expected_min = 0
+        for i, bracket in enumerate(brackets):
+            low, high, rate = bracket.get("min"), bracket.get("max"), bracket.get("rate")
+            if low != expected_min:
+                raise TaxConfigError(f"{year}/{status}: bracket {i} starts at {low!r}, expected {expected_min!r}")
+            if not isinstance(rate, (int, float)) or not 0 <= rate <= 1:
+                raise TaxConfigError(f"{year}/{status}: bracket {i} has invalid rate {rate!r}")
+            if high is None:
+                if i != len(brackets) - 1:
+                    raise TaxConfigError(f"{year}/{status}: only the top bracket may be open-ended")
+            elif high <= low:
+                raise TaxConfigError(f"{year}/{status}: bracket {i} max {high!r} is not above min {low!r}")
+            expected_min = high
+        if brackets[-1]["max"] is not None:
+            raise TaxConfigError(f"{year}/{status}: top bracket must have max null")
+
+
+def _compile_year(year: str, entry: Dict[str, Any]) -> YearConfig:
+    _validate_year(year, entry)
+    return YearConfig(
+        year,
+        MappingProxyType(dict(entry["standard_deductions"])),
+        MappingProxyType({status: BracketTable.compile(brackets)
+                          for status, brackets in entry["tax_brackets"].items()}),
+    )
+
+
+class _Snapshot(NamedTuple):
+    stamp: Optional[Tuple[int, int]]   # (mtime_ns, size) of the file it was read from
+    raw: Dict[str, Any]
+    years: Dict[str, YearConfig]       # filled in lazily; only ever grows
+
+
+class TaxConfig:
+    """
+    Lazily loaded, per-year compiled view of tax_config.json.
+
+        TAX_CONFIG["2024"].bracket_table("single").tax_owed(35400)
+    """
+
+    def __init__(self, path=TAX_CONFIG_PATH):
+        self.path = Path(path)
+        self._snapshot: Optional[_Snapshot] = None
+
+    def _stamp(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self) -> _Snapshot:
+        try:
+            stamp = self._stamp()
+            with open(self.path, 'r') as file:
+                raw = json.load(file)
+        except FileNotFoundError:
+            raise TaxConfigError(f"Tax configuration not found: {self.path}") from None
+        except json.JSONDecodeError as e:
+            raise TaxConfigError(f"Tax configuration {self.path} is not valid JSON: {e}") from None
+        if not isinstance(raw, dict):
+            raise TaxConfigError(f"Tax configuration {self.path} must map years to settings")
+        return _Snapshot(stamp, raw, {})
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Two threads may both load on first use; the results are identical, one wins.
+            snapshot = self._snapshot = self._load()
+        return snapshot
+
+    # ------------------------
+    # Lookups
+    # ------------------------
+    def __getitem__(self, year) -> YearConfig:
+        snapshot = self._current()
+        year = str(year)
+        config = snapshot.years.get(year)
+        if config is None:
+            if year not in snapshot.raw:
+                raise KeyError(year)
+            # Compiling is idempotent, so a racing thread at worst does it twice.
+            config = snapshot.years.setdefault(year, _compile_year(year, snapshot.raw[year]))
+        return config
+
+    def __contains__(self, year) -> bool:
+        return str(year) in self._current().raw
+
+    def years(self) -> Tuple[str, ...]:
+        return tuple(self._current().raw)
+
+    def raw(self) -> Dict[str, Any]:
+        """The parsed JSON as loaded (treat as read-only)."""
+        return self._current().raw
+
+    def validate(self) -> None:
+        """Compile every year now, raising TaxConfigError on the first bad entry."""
+        for year in self.years():
+            self[year]
+
+    # ------------------------
+    # Reloading
+    # ------------------------
+    def reload(self) -> None:
+        """Re-read the file and atomically swap in the new snapshot."""
+        self._snapshot = self._load()
+
+    def reload_if_changed(self) -> bool:
+        """Reload when the file's mtime/size changed since it was read; True if reloaded."""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.stamp == self._stamp():
+            return False
+        self.reload()
+        return True
+
+
+TAX_CONFIG = TaxConfig()
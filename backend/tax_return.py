@@ -1,4 +1,6 @@
-from typing import Dict, Any, List, Optional
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from sys import intern
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple, Type, Union
 
 def init_tax_return() -> Dict[str, Any]:
     """
@@ -47,6 +49,40 @@ def add_1099_nec_to_tax_return(tax_return: Dict[str, Any], form: Dict[str, Any])
     tax_return["totals"]["federal_tax_withheld"] += float(form.get("federal_tax_withheld", 0.0) or 0.0)
     tax_return["totals"]["state_tax_withheld"] += float(form.get("state_tax_withheld", 0.0) or 0.0)
 
+# list key -> (form field, totals key) pairs each form of that kind contributes
+FORM_CONTRIBUTIONS = {
+    "w2s": (("wages", "wages"),
+            ("federal_tax_withheld", "federal_tax_withheld"),
+            ("state_tax_withheld", "state_tax_withheld")),
+    "1099ints": (("interest_income", "interest_income"),
+                 ("federal_tax_withheld", "federal_tax_withheld"),
+                 ("state_tax_withheld", "state_tax_withheld")),
+    "1099necs": (("nonemployee_compensation", "self_employment_income"),
+                 ("federal_tax_withheld", "federal_tax_withheld"),
+                 ("state_tax_withheld", "state_tax_withheld")),
+}
+
+def _adjust_totals(tax_return: Dict[str, Any], key: str, form: Dict[str, Any], sign: int) -> None:
+    totals = tax_return["totals"]
+    for field, total in FORM_CONTRIBUTIONS[key]:
+        totals[total] += sign * float(form.get(field, 0.0) or 0.0)
+
+# Remove / replace one form by position, adjusting totals without re-summing the lists
+def remove_form_from_tax_return(tax_return: Dict[str, Any], key: str, index: int) -> Dict[str, Any]:
+    """key is 'w2s', '1099ints' or '1099necs'; returns the removed form."""
+    form = tax_return[key].pop(index)
+    _adjust_totals(tax_return, key, form, -1)
+    return form
+
+def replace_form_in_tax_return(tax_return: Dict[str, Any], key: str, index: int,
+                               form: Dict[str, Any]) -> Dict[str, Any]:
+    """Swap the form at index for a corrected one; returns the old form."""
+    old = tax_return[key][index]
+    tax_return[key][index] = form
+    _adjust_totals(tax_return, key, old, -1)
+    _adjust_totals(tax_return, key, form, 1)
+    return old
+
 # Small utility to recompute totals from raw lists (useful if you need to recalc)
 def recompute_totals(tax_return: Dict[str, Any]) -> None:
     totals = {
@@ -76,3 +112,266 @@ def recompute_totals(tax_return: Dict[str, Any]) -> None:
 
     # write back computed totals
     tax_return["totals"].update(totals)
+
+
+# ------------------------
+# Compact model
+# ------------------------
+# Same data as the dicts above, for holding many returns at once: forms are
+# tuples instead of dicts, amounts are integer cents (exact sums, no float
+# drift) and the return itself is a slotted object. to_dict()/from_dict()
+# convert to and from the init_tax_return() shape.
+
+CENT = Decimal("0.01")
+
+
+def to_cents(amount: Any) -> int:
+    """
+    Dollar amount (number, '1,234.56' string or None) -> integer cents,
+    rounding half up on the decimal digits as written (1.005 -> 101).
+    """
+    if amount is None:
+        return 0
+    if isinstance(amount, str):
+        amount = amount.replace(",", "").replace("$", "").strip() or 0
+    try:
+        return int(Decimal(str(amount)).quantize(CENT, ROUND_HALF_UP) * 100)
+    except InvalidOperation:
+        raise ValueError(f"Not a dollar amount: {amount!r}") from None
+
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+
+class W2Record(NamedTuple):
+    """One W-2, keys as parse_w2 returns them; amounts in cents."""
+    source_file: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    ssn: Optional[str] = None
+    filing_status: Optional[str] = None
+    address: Optional[str] = None
+    employer_name: Optional[str] = None
+    employer_ein: Optional[str] = None
+    wages: int = 0
+    federal_tax_withheld: int = 0
+    state_tax_withheld: int = 0
+    extra: Optional[Dict[str, Any]] = None  # any other keys (e.g. "error"), kept for to_dict()
+
+    @classmethod
+    def from_dict(cls, form: Dict[str, Any]) -> "W2Record":
+        return _record_from_dict(cls, form)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _record_to_dict(self)
+
+
+class Int1099Record(NamedTuple):
+    """One 1099-INT; amounts in cents."""
+    source_file: Optional[str] = None
+    payer_name: Optional[str] = None
+    payer_tin: Optional[str] = None
+    recipient_name: Optional[str] = None
+    recipient_tin: Optional[str] = None
+    interest_income: int = 0
+    early_withdrawal_penalty: int = 0
+    federal_tax_withheld: int = 0
+    state: Optional[str] = None
+    state_tax_withheld: int = 0
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, form: Dict[str, Any]) -> "Int1099Record":
+        return _record_from_dict(cls, form)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _record_to_dict(self)
+
+
+class Nec1099Record(NamedTuple):
+    """One 1099-NEC; amounts in cents."""
+    source_file: Optional[str] = None
+    payer_name: Optional[str] = None
+    recipient_address: Optional[str] = None
+    nonemployee_compensation: int = 0
+    federal_tax_withheld: int = 0
+    state_tax_withheld: int = 0
+    state_income: int = 0
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, form: Dict[str, Any]) -> "Nec1099Record":
+        return _record_from_dict(cls, form)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _record_to_dict(self)
+
+
+FormRecord = Union[W2Record, Int1099Record, Nec1099Record]
+
+# record type -> fields held in cents
+MONEY_FIELDS: Dict[type, Tuple[str, ...]] = {
+    W2Record: ("wages", "federal_tax_withheld", "state_tax_withheld"),
+    Int1099Record: ("interest_income", "early_withdrawal_penalty", "federal_tax_withheld", "state_tax_withheld"),
+    Nec1099Record: ("nonemployee_compensation", "federal_tax_withheld", "state_tax_withheld", "state_income"),
+}
+
+
+def _record_from_dict(cls: Type[FormRecord], form: Dict[str, Any]) -> FormRecord:
+    money = MONEY_FIELDS[cls]
+    values: Dict[str, Any] = {}
+    extra: Optional[Dict[str, Any]] = None
+    for key, value in form.items():
+        if key in money:
+            values[key] = to_cents(value)
+        elif key in cls._fields and key != "extra":
+            # Names, EINs and addresses repeat across forms and returns; keep one copy of each
+            values[key] = intern(value) if type(value) is str else value
+        else:
+            if extra is None:
+                extra = {}
+            extra[key] = value
+    return cls(**values, extra=extra)
+
+
+def _record_to_dict(record: FormRecord) -> Dict[str, Any]:
+    """The extractor-shaped dict: every standard key (amounts in dollars), then any extra keys."""
+    money = MONEY_FIELDS[type(record)]
+    form = {key: from_cents(value) if key in money else value
+            for key, value in zip(record._fields[:-1], record[:-1])}
+    if record.extra:
+        form.update(record.extra)
+    return form
+
+
+class TaxReturn:
+    """
+    Slotted tax return with typed form records and integer-cent totals,
+    kept current by the adders.
+
+        tax_return = TaxReturn.from_dict(init_tax_return())
+        tax_return.add_form("w2", parse_w2(upload))
+        tax_return.replace_form("w2", 0, corrected_w2)
+        calculate_taxes(tax_return, "2024")       # or tax_return.to_dict() for the dict shape
+    """
+    __slots__ = ("taxpayer", "w2s", "ints", "necs", "wages", "interest_income",
+                 "self_employment_income", "federal_tax_withheld", "state_tax_withheld", "tax_cache")
+
+    def __init__(self, taxpayer: Optional[Dict[str, Any]] = None):
+        self.taxpayer: Dict[str, Any] = taxpayer if taxpayer is not None else init_tax_return()["taxpayer"]
+        self.w2s: List[W2Record] = []
+        self.ints: List[Int1099Record] = []
+        self.necs: List[Nec1099Record] = []
+        # Totals in cents
+        self.wages = 0
+        self.interest_income = 0
+        self.self_employment_income = 0
+        self.federal_tax_withheld = 0
+        self.state_tax_withheld = 0
+        # Last bracket evaluation and the inputs it was made from, owned by calculate_taxes
+        self.tax_cache: Optional[Tuple[Any, ...]] = None
+
+    # ------------------------
+    # Adding, removing and replacing forms
+    # ------------------------
+    def _apply(self, record: FormRecord, sign: int) -> None:
+        """Add (sign=1) or take back (sign=-1) one record's share of the totals."""
+        if type(record) is W2Record:
+            self.wages += sign * record.wages
+        elif type(record) is Int1099Record:
+            self.interest_income += sign * record.interest_income
+        else:
+            self.self_employment_income += sign * record.nonemployee_compensation
+        self.federal_tax_withheld += sign * record.federal_tax_withheld
+        self.state_tax_withheld += sign * record.state_tax_withheld
+
+    def _forms(self, form_type: str) -> Tuple[List[Any], Type[FormRecord]]:
+        if form_type == "w2":
+            return self.w2s, W2Record
+        if form_type == "1099_int":
+            return self.ints, Int1099Record
+        if form_type == "1099_nec":
+            return self.necs, Nec1099Record
+        raise ValueError(f"Unknown form type '{form_type}'")
+
+    def add_form(self, form_type: str, form: Union[FormRecord, Dict[str, Any]]) -> FormRecord:
+        """Add by extractor form type ('w2', '1099_int', '1099_nec')."""
+        forms, record_type = self._forms(form_type)
+        record = form if isinstance(form, record_type) else record_type.from_dict(form)
+        forms.append(record)
+        self._apply(record, 1)
+        return record
+
+    def remove_form(self, form_type: str, index: int) -> FormRecord:
+        """Remove the form at index; totals are adjusted in O(1)."""
+        forms, _ = self._forms(form_type)
+        record = forms.pop(index)
+        self._apply(record, -1)
+        return record
+
+    def replace_form(self, form_type: str, index: int, form: Union[FormRecord, Dict[str, Any]]) -> FormRecord:
+        """Swap the form at index for a corrected one; returns the old record."""
+        forms, record_type = self._forms(form_type)
+        record = form if isinstance(form, record_type) else record_type.from_dict(form)
+        old = forms[index]
+        forms[index] = record
+        self._apply(old, -1)
+        self._apply(record, 1)
+        return old
+
+    def add_w2(self, form: Union[W2Record, Dict[str, Any]]) -> W2Record:
+        return self.add_form("w2", form)
+
+    def add_1099_int(self, form: Union[Int1099Record, Dict[str, Any]]) -> Int1099Record:
+        return self.add_form("1099_int", form)
+
+    def add_1099_nec(self, form: Union[Nec1099Record, Dict[str, Any]]) -> Nec1099Record:
+        return self.add_form("1099_nec", form)
+
+    def recompute_totals(self) -> None:
+        """Re-sum the totals from the form lists."""
+        self.wages = sum(w.wages for w in self.w2s)
+        self.interest_income = sum(i.interest_income for i in self.ints)
+        self.self_employment_income = sum(n.nonemployee_compensation for n in self.necs)
+        self.federal_tax_withheld = sum(f.federal_tax_withheld for forms in (self.w2s, self.ints, self.necs)
+                                        for f in forms)
+        self.state_tax_withheld = sum(f.state_tax_withheld for forms in (self.w2s, self.ints, self.necs)
+                                      for f in forms)
+
+    # ------------------------
+    # Conversion
+    # ------------------------
+    def totals(self) -> Dict[str, float]:
+        """Totals in dollars, shaped like init_tax_return()["totals"]."""
+        return {
+            "wages": from_cents(self.wages),
+            "interest_income": from_cents(self.interest_income),
+            "self_employment_income": from_cents(self.self_employment_income),
+            "federal_tax_withheld": from_cents(self.federal_tax_withheld),
+            "state_tax_withheld": from_cents(self.state_tax_withheld),
+            "agi": 0.0,
+            "taxable_income": 0.0,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The init_tax_return() shape: form dicts with dollar amounts, totals from the exact cents."""
+        return {
+            "taxpayer": self.taxpayer,
+            "w2s": [w.to_dict() for w in self.w2s],
+            "1099ints": [i.to_dict() for i in self.ints],
+            "1099necs": [n.to_dict() for n in self.necs],
+            "totals": self.totals(),
+        }
+
+    @classmethod
+    def from_dict(cls, tax_return: Dict[str, Any]) -> "TaxReturn":
+        """Build from the init_tax_return() shape; totals are re-summed from the forms."""
+        result = cls(tax_return.get("taxpayer"))
+        for w2 in tax_return.get("w2s") or []:
+            result.add_w2(w2)
+        for form in tax_return.get("1099ints") or []:
+            result.add_1099_int(form)
+        for form in tax_return.get("1099necs") or []:
+            result.add_1099_nec(form)
+        return result
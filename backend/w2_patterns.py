@@ -1,15 +1,19 @@
+import hashlib as _hashlib
+
 # --- Employee Information ---
 SSN_PATTERN = r'Employee.*?social\s*security\s*number.*?(\d{3}\s*-\s*\d{2}\s*-\s*\d{4})'
 ADDRESS_PATTERN =  r"\*\*f\*\*Employee's address and ZIP code\s+\*\*[^\*]+\*\*\s+\*\*[^\*]+\*\*\s+\*\*([^\*]+)\*\*"
 # Name: Primary match requires two capturing groups for first/last name near an address
 NAME_PRIMARY_PATTERN = r'\*\*([A-Z][a-z]+)\*\*[^*]*\*\*([A-Z][a-z]+)\*\*[^*]*\*\*\d+\s+\w+\s+St'
-# Name: Fallback patterns for searching after the address/ZIP label
-NAME_FALLBACK_FIRST_PATTERN = r'Employee.*?address.*?ZIP.*?\*\*([A-Z][a-z]+)\*\*'
-NAME_FALLBACK_LAST_PATTERN = r'Employee.*?address.*?ZIP.*?\*\*[A-Z][a-z]+\*\*[^*]*\*\*([A-Z][a-z]+)\*\*'
+# Name: Fallback patterns for searching after the address/ZIP label.
+# (?:(?!x).)*x stops at the first x, like .*?x, but never backtracks to a later one,
+# so a failed attempt costs one pass over the text instead of one per address/ZIP pair.
+NAME_FALLBACK_FIRST_PATTERN = r'Employee(?:(?!address).)*address(?:(?!ZIP).)*ZIP.*?\*\*([A-Z][a-z]+)\*\*'
+NAME_FALLBACK_LAST_PATTERN = r'Employee(?:(?!address).)*address(?:(?!ZIP).)*ZIP.*?\*\*[A-Z][a-z]+\*\*[^*]*\*\*([A-Z][a-z]+)\*\*'
 
 # --- Employer Information ---
 EIN_PATTERN = r'Employer\s*identification\s*number.*?(\d{2}\s*-\s*\d{7})'
-EMPLOYER_INFO_PATTERN = r'Employer.*?name,\s*address.*?\*\*([^*]+)\*\*'
+EMPLOYER_INFO_PATTERN = r'Employer(?:(?!name,\s*address).)*name,\s*address.*?\*\*([^*]+)\*\*'
 CONTROL_NUM_PATTERN = r'Control\s*number.*?\*\*([^*]+)\*\*'
 
 # --- Wages and Taxes (Standardized Box Patterns) ---
@@ -26,4 +30,10 @@ BOX_12A_CODE_D = r'\*\*12a\*\*.*?D:.*?\*\*([0-9,\.]+)'
 BOX_14_OTHER = r'\*\*14\*\*.*?Other.*?\*\*([^*]+)\*\*'
 BOX_15_STATE = r'\*\*15\*\*.*?State.*?\*\*([A-Z]{2})\*\*'
 BOX_16_STATE_WAGES = r'\*\*16\*\*.*?State\s*wages.*?\*\*([0-9,\.]+)\*\*'
-BOX_17_STATE_TAX = r'\*\*17\*\*.*?State\s*income\s*tax.*?\*\*([0-9,\.]+)\*\*'
\ No newline at end of file
+BOX_17_STATE_TAX = r'\*\*17\*\*.*?State\s*income\s*tax.*?\*\*([0-9,\.]+)\*\*'
+
+# --- Cache versioning ---
+# Fingerprint of every pattern above; editing any of them invalidates cached extraction results.
+PATTERNS_VERSION = _hashlib.sha1(
+    "\n".join(v for k, v in sorted(globals().items()) if k.isupper() and isinstance(v, str)).encode()
+).hexdigest()[:12]
@@ -0,0 +1,89 @@
+"""
+Import-time budget check for the backend entry points.
+
+Each entry point is imported in a fresh interpreter with `python -X importtime`
+and its cumulative import time is compared to a budget. The check also fails
+if importing it already pulled in one of the heavy dependencies that are
+supposed to load lazily on first use.
+
+    python benchmarks/import_time.py            # table + exit status
+    python benchmarks/import_time.py --json     # machine-readable results
+"""
+from pathlib import Path
+from typing import Any, Dict, List
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# entry point -> budget in milliseconds (cumulative, as reported by -X importtime)
+BUDGETS_MS = {
+    "backend.calculate_taxes": 40,
+    "backend.tax_config": 30,
+    "backend.generate_1040": 40,
+    "backend.batch_extract": 80,
+    "backend.bulk_1040": 90,
+    "backend.pipeline": 120,
+    "backend.job_service": 120,
+    "backend.bulk_w2": 90,
+    "backend.store": 40,
+    "backend.columnar": 40,
+}
+
+# Must not be imported as a side effect of importing an entry point
+LAZY_MODULES = ("fitz", "pymupdf", "pymupdf4llm", "pypdf", "numpy", "pyarrow", "pytesseract")
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str, runs: int = 3) -> Dict[str, Any]:
+    """Best-of-runs cumulative import time of a module, plus any eagerly loaded heavy modules."""
+    best_us = None
+    loaded: List[str] = []
+    probe = (f"import sys, {module}; "
+             f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(PROJECT_ROOT), os.environ.get("PYTHONPATH")])))
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe],
+                              cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+        for line in proc.stderr.splitlines():
+            match = IMPORTTIME_RE.match(line)
+            if match and not match.group(3).strip() and match.group(4) == module:
+                cumulative_us = int(match.group(2))
+                best_us = cumulative_us if best_us is None else min(best_us, cumulative_us)
+        loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return {"module": module, "import_ms": round((best_us or 0) / 1000, 1), "eager_heavy_imports": loaded}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per module (best is kept)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply budgets (slow CI machines)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for module, budget in BUDGETS_MS.items():
+        result = measure(module, args.runs)
+        result["budget_ms"] = budget * args.scale
+        result["ok"] = result["import_ms"] <= result["budget_ms"] and not result["eager_heavy_imports"]
+        results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            status = "ok" if r["ok"] else "OVER BUDGET" if not r["eager_heavy_imports"] else "EAGER IMPORTS"
+            extra = f"  eager: {', '.join(r['eager_heavy_imports'])}" if r["eager_heavy_imports"] else ""
+            print(f"{r['module']:<28} {r['import_ms']:>7.1f} ms / {r['budget_ms']:>6.0f} ms  {status}{extra}")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
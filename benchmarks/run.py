@@ -0,0 +1,341 @@
+"""
+End-to-end benchmark on a synthetic W-2 / 1099 corpus.
+
+Measures per-stage latency (open, markdown, regex scan, layout extraction,
+tax calculation, 1040 fill), batch extraction throughput at several batch
+sizes, and per-field accuracy of both extraction modes against the
+generator's ground truth. Results are JSON so runs can be compared across
+commits:
+
+    python -m benchmarks.run --out bench.json
+    python -m benchmarks.run --baseline bench.json     # exit 1 on regressions
+
+Every run also checks that layout mode gets right each field the markdown
+parser gets right, and exits 1 if it does not.
+
+The extraction cache is disabled for the whole run, so repeated documents
+are really re-extracted.
+"""
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from backend.batch_extract import FORM_PARSERS, extract_batch
+from backend.calculate_taxes import calculate_taxes, calculate_taxes_batch
+from backend.extract_1099_int import INT_SCANNER
+from backend.extract_1099_nec import NEC_SCANNER
+from backend.extract_w2 import W2_SCANNER
+from backend.extraction_cache import configure_extraction_cache
+from backend.generate_1040 import FORM_1040_TEMPLATE_PATH, fill_1040_pdf, load_1040_template
+from backend.layout_extract import EXTRACTION_MODES, MODE_LAYOUT, MODE_MARKDOWN, build_word_index
+from backend.pdf_loader import BufferedPDF, opened_pdf, pdf_to_markdown
+from backend.tax_return import (
+    add_1099_int_to_tax_return,
+    add_1099_nec_to_tax_return,
+    add_w2_to_tax_return,
+    init_tax_return,
+)
+
+from .synthetic_forms import FORM_1099_INT, FORM_1099_NEC, FORM_W2, SyntheticDocument, generate
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SCHEMA_VERSION = 1
+DEFAULT_BATCH_SIZES = (1, 8, 32)
+FILING_STATUSES = ("single", "married_filing_jointly", "married_filing_separately", "head_of_household")
+
+SCANNERS = {FORM_W2: W2_SCANNER, FORM_1099_INT: INT_SCANNER, FORM_1099_NEC: NEC_SCANNER}
+ADDERS = {FORM_W2: add_w2_to_tax_return, FORM_1099_INT: add_1099_int_to_tax_return,
+          FORM_1099_NEC: add_1099_nec_to_tax_return}
+
+
+# ------------------------
+# Timing helpers
+# ------------------------
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "n": len(ordered),
+        "mean_ms": ms(statistics.fmean(ordered)),
+        "p50_ms": ms(ordered[len(ordered) // 2]),
+        "p95_ms": ms(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]),
+        "min_ms": ms(ordered[0]),
+    }
+
+
+def _time_each(items: Sequence[Any], fn: Callable[[Any], Any], repeat: int = 1) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        for item in items:
+            started = time.perf_counter()
+            fn(item)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _pdf(doc: SyntheticDocument) -> BufferedPDF:
+    return BufferedPDF(doc.name, doc.data)
+
+
+def _open(doc: SyntheticDocument) -> int:
+    with opened_pdf(_pdf(doc)) as pdf:
+        return pdf.page_count
+
+
+def _scan_all(doc: SyntheticDocument, markdown: str) -> Dict[str, Any]:
+    # ScanResult is lazy, so force every field
+    return dict(SCANNERS[doc.form_type].scan(markdown))
+
+
+# ------------------------
+# Stages
+# ------------------------
+def bench_stages(docs: List[SyntheticDocument], returns: List[Dict[str, Any]], year: str,
+                 repeat: int) -> Dict[str, Dict[str, float]]:
+    markdown = {doc.name: pdf_to_markdown(_pdf(doc)) for doc in docs}
+    template = load_1040_template(FORM_1040_TEMPLATE_PATH)
+    summaries = [calculate_taxes(r, year) for r in returns]
+
+    stages = {
+        "open": _time_each(docs, _open, repeat),
+        "markdown": _time_each(docs, lambda d: pdf_to_markdown(_pdf(d)), repeat),
+        "regex": _time_each(docs, lambda d: _scan_all(d, markdown[d.name]), repeat),
+        "layout_index": _time_each(docs, lambda d: build_word_index(_pdf(d)), repeat),
+        "extract_markdown": _time_each(docs, lambda d: FORM_PARSERS[d.form_type](_pdf(d)), repeat),
+        "extract_layout": _time_each(docs, lambda d: FORM_PARSERS[d.form_type](_pdf(d), mode=MODE_LAYOUT), repeat),
+        "tax_calc": _time_each(returns, lambda r: calculate_taxes(r, year), repeat * 20),
+        "fill_1040": _time_each(list(zip(returns, summaries)),
+                                lambda rs: fill_1040_pdf(template, rs[0]["taxpayer"], rs[1]), repeat),
+    }
+    results = {name: _summary(samples) for name, samples in stages.items()}
+
+    # Whole-batch tax engine: one call over every return, reported per return
+    totals = [r["totals"] for r in returns]
+    columns = [[t[k] for t in totals] for k in ("wages", "interest_income", "self_employment_income",
+                                                "federal_tax_withheld")]
+    statuses = [r["taxpayer"]["filing_status"] for r in returns]
+    calculate_taxes_batch(*columns, statuses, year)  # warm up numpy and the bracket arrays
+    batch = _time_each([None] * (repeat * 5), lambda _: calculate_taxes_batch(*columns, statuses, year))
+    results["tax_calc_batch_per_return"] = _summary([s / len(returns) for s in batch])
+    return results
+
+
+def bench_throughput(docs: List[SyntheticDocument], batch_sizes: Sequence[int], executors: Sequence[str],
+                     modes: Sequence[str], max_workers: Optional[int]) -> List[Dict[str, Any]]:
+    """Documents/second through extract_batch at each batch size (one pool per batch, as callers do)."""
+    rows = []
+    for executor in executors:
+        for mode in modes:
+            for size in batch_sizes:
+                batch = [docs[i % len(docs)] for i in range(size)]
+                jobs = [(doc.form_type, _pdf(doc)) for doc in batch]
+                started = time.perf_counter()
+                results = extract_batch(jobs, executor=executor, max_workers=max_workers, mode=mode)
+                elapsed = time.perf_counter() - started
+                rows.append({
+                    "executor": executor, "mode": mode, "batch_size": size,
+                    "seconds": round(elapsed, 4),
+                    "docs_per_second": round(size / elapsed, 3),
+                    "pages_per_second": round(sum(doc.pages for doc in batch) / elapsed, 3),
+                    "errors": sum(1 for r in results if "error" in r),
+                })
+    return rows
+
+
+# ------------------------
+# Accuracy
+# ------------------------
+def _matches(expected: Any, actual: Any) -> bool:
+    if isinstance(expected, float):
+        return isinstance(actual, (int, float)) and abs(expected - actual) < 0.005
+    normalize = lambda value: " ".join(str(value).split()).lower()
+    return actual is not None and normalize(expected) == normalize(actual)
+
+
+def _parse_all(docs: List[SyntheticDocument], modes: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]:
+    return {mode: [FORM_PARSERS[doc.form_type](_pdf(doc), mode=mode) for doc in docs] for mode in modes}
+
+
+def bench_accuracy(docs: List[SyntheticDocument], parsed: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Share of fields each mode got right, per form type and field (only fields both sides have)."""
+    accuracy: Dict[str, Any] = {}
+    for mode, results in parsed.items():
+        counts: Dict[str, Dict[str, List[int]]] = {}
+        for doc, result in zip(docs, results):
+            for field, expected in doc.truth.items():
+                if field in result:
+                    hit = counts.setdefault(doc.form_type, {}).setdefault(field, [0, 0])
+                    hit[0] += _matches(expected, result[field])
+                    hit[1] += 1
+        right = sum(h[0] for fields in counts.values() for h in fields.values())
+        total = sum(h[1] for fields in counts.values() for h in fields.values())
+        accuracy[mode] = {
+            "overall": round(right / total, 4) if total else None,
+            "forms": {form: {field: round(h[0] / h[1], 4) for field, h in sorted(fields.items())}
+                      for form, fields in sorted(counts.items())},
+        }
+    return accuracy
+
+
+def layout_misses(docs: List[SyntheticDocument], parsed: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+    """Fields the markdown parser got right but layout mode did not; layout must be a drop-in replacement."""
+    if MODE_MARKDOWN not in parsed or MODE_LAYOUT not in parsed:
+        return []
+    misses = []
+    for doc, markdown, layout in zip(docs, parsed[MODE_MARKDOWN], parsed[MODE_LAYOUT]):
+        for field, expected in doc.truth.items():
+            if field in markdown and _matches(expected, markdown[field]) and not _matches(expected, layout.get(field)):
+                misses.append(f"{doc.form_type}/{field} in {doc.name}: "
+                              f"markdown {markdown[field]!r}, layout {layout.get(field)!r}")
+    return misses
+
+
+# ------------------------
+# Corpus -> tax returns
+# ------------------------
+def synthetic_returns(docs: List[SyntheticDocument], count: int, seed: int) -> List[Dict[str, Any]]:
+    """Tax returns assembled from the ground truth (1-4 forms each), ready for the tax and 1040 stages."""
+    rng = random.Random(seed)
+    w2s = [d for d in docs if d.form_type == FORM_W2] or docs
+    returns = []
+    for _ in range(count):
+        tax_return = init_tax_return()
+        primary = rng.choice(w2s).truth
+        spouse = rng.choice(w2s).truth
+        # Same profile shape the app collects
+        tax_return["taxpayer"].update({
+            "first_name": primary.get("first_name") or "Pat",
+            "last_name": primary.get("last_name") or "Doe",
+            "ssn": (primary.get("ssn") or primary.get("recipient_tin")).replace("-", ""),
+            "address": f"{primary.get('street')}, {primary.get('city')}",
+            "filing_status": rng.choice(FILING_STATUSES),
+            "received_or_sold_digital_asset": rng.choice(["yes", "no"]),
+            "date_of_birth": f"{rng.randint(1940, 2000)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "is_blind": "no",
+            "spouse_info": {
+                "first_name": spouse.get("first_name") or "Sam",
+                "last_name": spouse.get("last_name") or "Doe",
+                "ssn": (spouse.get("ssn") or spouse.get("recipient_tin")).replace("-", ""),
+                "date_of_birth": f"{rng.randint(1940, 2000)}-06-15",
+                "is_blind": "no",
+            },
+        })
+        for doc in rng.sample(docs, min(len(docs), rng.randint(1, 4))):
+            ADDERS[doc.form_type](tax_return, dict(doc.truth))
+        returns.append(tax_return)
+    return returns
+
+
+# ------------------------
+# Reporting
+# ------------------------
+def _git_commit() -> Optional[str]:
+    try:
+        proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return proc.stdout.strip() or None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions against a baseline run: any accuracy drop, or a stage p50 slower by more than tolerance."""
+    problems = []
+    for mode, result in current["accuracy"].items():
+        before = baseline.get("accuracy", {}).get(mode, {})
+        for form, fields in result["forms"].items():
+            for field, rate in fields.items():
+                old = before.get("forms", {}).get(form, {}).get(field)
+                if old is not None and rate < old:
+                    problems.append(f"accuracy {mode}/{form}/{field}: {old:.4f} -> {rate:.4f}")
+    for stage, result in current["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if old and old["p50_ms"] > 0 and result["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            problems.append(f"latency {stage}: p50 {old['p50_ms']:.3f} ms -> {result['p50_ms']:.3f} ms")
+    return problems
+
+
+def _print_report(report: Dict[str, Any], log) -> None:
+    print(f"{report['meta']['documents']} documents, {report['meta']['pages']} pages "
+          f"(commit {report['meta']['commit']})", file=log)
+    for stage, s in report["stages"].items():
+        print(f"  {stage:<28} p50 {s['p50_ms']:>9.3f} ms  p95 {s['p95_ms']:>9.3f} ms  (n={s['n']})", file=log)
+    for row in report["throughput"]:
+        print(f"  {row['executor']:<7} {row['mode']:<8} batch {row['batch_size']:>4}: "
+              f"{row['docs_per_second']:>8.2f} docs/s {row['pages_per_second']:>8.2f} pages/s", file=log)
+    for mode, result in report["accuracy"].items():
+        print(f"  accuracy {mode:<8} {result['overall']:.2%}", file=log)
+
+
+def run(count: int = 30, seed: int = 0, year: str = "2024", repeat: int = 1,
+        batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES, executors: Sequence[str] = ("process",),
+        modes: Sequence[str] = EXTRACTION_MODES, max_workers: Optional[int] = None) -> Dict[str, Any]:
+    configure_extraction_cache(max_entries=0)
+    started = time.perf_counter()
+    docs = generate(count, seed)
+    generate_seconds = time.perf_counter() - started
+    returns = synthetic_returns(docs, max(count, 10), seed)
+    parsed = _parse_all(docs, modes)
+    return {
+        "schema": SCHEMA_VERSION,
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": seed,
+            "documents": len(docs),
+            "pages": sum(doc.pages for doc in docs),
+            "returns": len(returns),
+            "generate_seconds": round(generate_seconds, 3),
+        },
+        "stages": bench_stages(docs, returns, year, repeat),
+        "throughput": bench_throughput(docs, batch_sizes, executors, modes, max_workers),
+        "accuracy": bench_accuracy(docs, parsed),
+        "layout_misses": layout_misses(docs, parsed),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark extraction, tax calculation and 1040 generation.")
+    parser.add_argument("--count", type=int, default=30, help="synthetic documents to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--year", default="2024")
+    parser.add_argument("--repeat", type=int, default=1, help="timing passes over the corpus per stage")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--executors", nargs="+", choices=("process", "thread"), default=["process"])
+    parser.add_argument("--modes", nargs="+", choices=EXTRACTION_MODES, default=list(EXTRACTION_MODES))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="allowed p50 slowdown per stage vs the baseline (0.3 = 30%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args.count, args.seed, args.year, args.repeat, args.batch_sizes,
+                 args.executors, args.modes, args.workers)
+    _print_report(report, sys.stderr)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+
+    problems = [f"layout mode missed {miss}" for miss in report["layout_misses"]]
+    if args.baseline:
+        problems += compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+    for problem in problems:
+        print(f"REGRESSION {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
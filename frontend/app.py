@@ -1,29 +1,66 @@
 import datetime
+import hashlib
+import json
 import os
 import sys
+import uuid
 import streamlit as st
 
-# Add project root to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-
-from backend.extract_w2 import extract_all_w2
-from backend.extract_1099_int import extract_1099_int
-from backend.extract_1099_nec import extract_1099_nec
-from backend.tax_return import (
-    add_w2_to_tax_return,
-    add_1099_int_to_tax_return,
-    add_1099_nec_to_tax_return,
-    init_tax_return,
-)
-from config import FORM_1040_TEMPLATE_PATH
+try:
+    import backend  # installed with `pip install -e .`
+except ImportError:
+    # Running straight from a source checkout: add the project root to sys.path
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.batch_extract import AUTO_DETECT, extract_typed, group_results
+from backend.extraction_cache import content_hash
+from backend.tax_return import init_tax_return
 from backend.calculate_taxes import calculate_taxes
-from backend.generate_1040 import fill_1040_pdf
+from backend.generate_1040 import FORM_1040_TEMPLATE_PATH, fill_1040_pdf, load_1040_template
+from backend.job_service import JOB_SERVICE_ENV, JobServiceClient, JobServiceError
+from backend.scenarios import sweep, tax_curve
+from backend.store import STORE_PATH_ENV, TaxStore
+from backend.tax_config import TAX_CONFIG
+
 
 
+FILING_STATUSES = ["Single", "Married filing jointly", "Married filing separately",
+                   "Head of household", "Qualifying surviving spouse"]
 
 st.title("AI Tax Agent")
 st.write("File your taxes instantly!")
 
+# ------------------------
+# Shared resources (one per server process, reused across reruns and sessions)
+# ------------------------
+
+@st.cache_resource
+def get_1040_template():
+    return load_1040_template(FORM_1040_TEMPLATE_PATH)
+
+@st.cache_resource
+def get_tax_config():
+    TAX_CONFIG.validate()  # compile every year once
+    return TAX_CONFIG
+
+@st.cache_resource
+def get_store():
+    """The returns database at TAX_AGENT_DB (None = nothing is persisted)."""
+    path = os.environ.get(STORE_PATH_ENV)
+    return TaxStore(path) if path else None
+
+def get_job_client():
+    """
+    Client for the local job service when TAX_AGENT_JOB_SERVICE_URL is set
+    (None = extract and fill in this process). Each session is its own tenant,
+    so the service shares workers fairly between users.
+    """
+    url = os.environ.get(JOB_SERVICE_ENV)
+    if not url:
+        return None
+    tenant = st.session_state.setdefault("job_tenant", uuid.uuid4().hex)
+    return JobServiceClient(url, tenant=tenant)
+
 # ------------------------
 # Helper Functions
 # ------------------------
@@ -72,12 +109,11 @@ def get_taxpayer_info():
 
     filing_status = st.selectbox(
         "Filing Status",
-        ["Single", "Married filing jointly", "Married filing separately",
-         "Head of household", "Qualifying surviving spouse"],
+        FILING_STATUSES,
         index=None,
         placeholder="Select your filing status"
     )
-    filing_status_normalized = filing_status.lower().replace(" ", "_") if filing_status else None
+    filing_status_normalized = normalize_filing_status(filing_status) if filing_status else None
 
     # Spouse info appears immediately after filing status if needed
     spouse_info = {}
@@ -123,7 +159,109 @@ def get_dependents():
 def upload_files(label, file_types=["pdf"]):
     return st.file_uploader(label, type=file_types, accept_multiple_files=True)
 
-def validate_required_fields(taxpayer_profile, uploaded_w2, uploaded_1099_int, uploaded_1099_nec):
+def upload_key(form_type, uploaded_file):
+    """Identity of an upload across reruns: slot, Streamlit file id, name and content hash."""
+    return (form_type, getattr(uploaded_file, "file_id", None), uploaded_file.name, content_hash(uploaded_file))
+
+def extract_uploads(jobs):
+    """
+    (form_type, upload) -> (resolved form type, result), extracting only uploads
+    not seen on an earlier rerun. Results live in session_state; uploads that
+    were removed are dropped.
+    """
+    extracted = st.session_state.setdefault("extracted_uploads", {})
+    keys = [upload_key(form_type, uploaded_file) for form_type, uploaded_file in jobs]
+    new_jobs = [(key, job) for key, job in zip(keys, jobs) if key not in extracted]
+    store = get_store()
+    if store is not None and new_jobs:
+        # Documents already stored with some return are not parsed again
+        for key, (_, uploaded_file) in new_jobs:
+            stored = store.form_by_content_hash(key[3])
+            if stored is not None:
+                form_type, form = stored
+                extracted[key] = (form_type, dict(form, source_file=uploaded_file.name))
+        new_jobs = [(key, job) for key, job in new_jobs if key not in extracted]
+    if new_jobs:
+        client = get_job_client()
+        if client is None:
+            results = extract_typed([job for _, job in new_jobs])
+        else:
+            progress = st.progress(0.0, text="Extracting documents...")
+
+            def show_progress(status):
+                done = status["completed"] / max(status["total"], 1)
+                progress.progress(done, text=f"Extracting documents ({status['completed']}/{status['total']}, {status['status']})")
+
+            try:
+                results = client.extract_typed([job for _, job in new_jobs], on_progress=show_progress)
+            except (JobServiceError, OSError) as e:
+                st.error(f"Extraction service unavailable: {e}")
+                st.stop()
+            progress.empty()
+        for (key, _), result in zip(new_jobs, results):
+            extracted[key] = result
+    for key in set(extracted) - set(keys):
+        del extracted[key]
+    return [extracted[key] for key in keys]
+
+def return_fingerprint(final_tax_data, tax_summary):
+    """Hash of everything the generated 1040 depends on."""
+    payload = json.dumps([final_tax_data, tax_summary], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def generate_1040(taxpayer_profile, final_tax_data, tax_summary, jobs):
+    """Fill the 1040 (on the job service's workers when one is configured) and save the return."""
+    client = get_job_client()
+    if client is not None:
+        pdf_bytes = client.fill_1040(taxpayer_profile, tax_summary)
+    else:
+        pdf_bytes = fill_1040_pdf(
+        file_path=get_1040_template(),
+        taxpayer_profile=taxpayer_profile,
+        tax_summary=tax_summary
+        )
+
+    store = get_store()
+    if store is not None:
+        document_hashes = {uploaded_file.name: content_hash(uploaded_file) for _, uploaded_file in jobs}
+        return_id = store.save_return(final_tax_data, "2024", tax_summary=tax_summary,
+                                      document_hashes=document_hashes)
+        store.save_1040(return_id, pdf_bytes)
+    return pdf_bytes
+
+def normalize_filing_status(filing_status):
+    return filing_status.lower().replace(" ", "_")
+
+def show_what_if(final_tax_data, tax_summary, year):
+    """
+    Sliders for income / withholding changes and a filing status comparison.
+    Every rerun is one vectorized sweep, so the table follows the sliders live.
+    """
+    with st.expander("What if?"):
+        current = next(s for s in FILING_STATUSES if normalize_filing_status(s) == final_tax_data["taxpayer"]["filing_status"])
+        statuses = st.multiselect("Compare filing statuses", FILING_STATUSES, default=[current])
+        wages_delta = st.slider("Change in W-2 wages ($)", -50000, 50000, 0, step=500)
+        nec_delta = st.slider("Change in 1099-NEC income ($)", -50000, 50000, 0, step=500)
+        withholding_delta = st.slider("Change in federal tax withheld ($)", -10000, 10000, 0, step=100)
+
+        table = sweep(final_tax_data, year,
+                      filing_statuses=[normalize_filing_status(s) for s in statuses or [current]],
+                      wages_deltas=[wages_delta], self_employment_deltas=[nec_delta],
+                      withholding_deltas=[withholding_delta], use_totals=True)
+        st.dataframe([{
+            "Filing status": row["filing_status"].replace("_", " ").capitalize(),
+            "Gross income": row["gross_income"],
+            "Taxable income": row["taxable_income"],
+            "Tax owed": row["tax_owed"],
+            "Refund (+) / amount due (-)": row["refund_or_amount_due"],
+        } for row in table.rows()])
+
+        curve = tax_curve(final_tax_data["taxpayer"]["filing_status"], year)
+        points = curve.points(max(2 * tax_summary["gross_income"], 100000))
+        st.line_chart({"Gross income": [p[0] for p in points], "Tax owed": [p[1] for p in points]},
+                      x="Gross income", y="Tax owed")
+
+def validate_required_fields(taxpayer_profile, uploaded_w2, uploaded_1099_int, uploaded_1099_nec, uploaded_other=None):
     missing_fields = []
 
     # Taxpayer info
@@ -156,7 +294,7 @@ def validate_required_fields(taxpayer_profile, uploaded_w2, uploaded_1099_int, u
         missing_fields.append("Dependents Information")
 
     # File uploads
-    if not (uploaded_w2 or uploaded_1099_int or uploaded_1099_nec):
+    if not (uploaded_w2 or uploaded_1099_int or uploaded_1099_nec or uploaded_other):
         missing_fields.append("At least one file upload (W-2, 1099-INT, 1099-NEC)")
 
     return missing_fields
@@ -176,10 +314,15 @@ taxpayer_profile["has_dependents"] = has_dependents
 uploaded_w2_files = upload_files("Upload your W-2 PDFs (multiple allowed)")
 uploaded_1099_int_files = upload_files("Upload your 1099-INT PDFs (multiple allowed)")
 uploaded_1099_nec_files = upload_files("Upload your 1099-NEC PDFs (multiple allowed)")
+uploaded_other_files = upload_files("Or upload any mix of W-2 / 1099 PDFs and we'll sort them for you")
 
+# Once Continue is pressed, keep the tax summary live so edits above recompute right away
 if st.button("Continue"):
+    st.session_state["continued"] = True
+
+if st.session_state.get("continued"):
     missing_fields = validate_required_fields(
-        taxpayer_profile, uploaded_w2_files, uploaded_1099_int_files, uploaded_1099_nec_files
+        taxpayer_profile, uploaded_w2_files, uploaded_1099_int_files, uploaded_1099_nec_files, uploaded_other_files
     )
 
     if missing_fields:
@@ -189,23 +332,16 @@ if st.button("Continue"):
     # Initialize tax return
     tax_return = init_tax_return()
 
-    # Process W2s
-    if uploaded_w2_files:
-        w2_forms = extract_all_w2(uploaded_w2_files)
-        for form in w2_forms:
-            add_w2_to_tax_return(tax_return, form)
-
-    # Process 1099-INTs
-    if uploaded_1099_int_files:
-        forms_1099_int = extract_1099_int(uploaded_1099_int_files)
-        for form in forms_1099_int:
-            add_1099_int_to_tax_return(tax_return, form)
-
-    # Process 1099-NECs
-    if uploaded_1099_nec_files:
-        forms_1099_nec = extract_1099_nec(uploaded_1099_nec_files)
-        for form in forms_1099_nec:
-            add_1099_nec_to_tax_return(tax_return, form)
+    # Extract new uploads in one worker pool (unsorted files are classified automatically);
+    # files already extracted on an earlier rerun come straight from session state
+    jobs = ([("w2", f) for f in uploaded_w2_files or []]
+            + [("1099_int", f) for f in uploaded_1099_int_files or []]
+            + [("1099_nec", f) for f in uploaded_1099_nec_files or []]
+            + [(AUTO_DETECT, f) for f in uploaded_other_files or []])
+    extracted = group_results(extract_uploads(jobs), tax_return)
+    if extracted["unrecognized"]:
+        skipped = ", ".join(str(form.get("source_file")) for form in extracted["unrecognized"])
+        st.warning(f"Could not recognize these documents as a W-2, 1099-INT or 1099-NEC: {skipped}")
 
     # Combine final tax data
     final_tax_data = {
@@ -221,29 +357,35 @@ if st.button("Continue"):
     # st.json(final_tax_data)
 
     # Calculate Taxes
-    tax_summary = calculate_taxes(final_tax_data, "2024")  # replace "2024" with actual year if dynamic
+    get_tax_config()
+    tax_summary = calculate_taxes(final_tax_data, "2024", use_totals=True)  # replace "2024" with actual year if dynamic
 
     # st.subheader("Tax Calculation Summary")
     # st.json(tax_summary)
 
-    st.subheader("Generate 1040 Form PDF")
-    try:
-        # Create PDF in memory
-        pdf_bytes = fill_1040_pdf(
-        file_path=FORM_1040_TEMPLATE_PATH,
-        taxpayer_profile=taxpayer_profile,
-        tax_summary=tax_summary
-        )
-
-        st.success("1040 PDF generated successfully!")
+    show_what_if(final_tax_data, tax_summary, "2024")
 
+    st.subheader("Generate 1040 Form PDF")
+    # Filling and saving run only on request, and only once per set of inputs: slider moves and
+    # edits above rerun the script, but they don't touch the 1040
+    fingerprint = return_fingerprint(final_tax_data, tax_summary)
+    generated = st.session_state.get("generated_1040")
+    if st.button("Generate 1040 PDF") and (generated is None or generated[0] != fingerprint):
+        try:
+            pdf_bytes = generate_1040(taxpayer_profile, final_tax_data, tax_summary, jobs)
+        except Exception as e:
+            st.error(f"Failed to generate 1040 PDF: {e}")
+        else:
+            generated = st.session_state["generated_1040"] = (fingerprint, pdf_bytes)
+            st.success("1040 PDF generated successfully!")
+
+    if generated is not None and generated[0] == fingerprint:
         # Provide download button
         st.download_button(
         label="Download 1040 PDF",
-        data=pdf_bytes,
+        data=generated[1],
         file_name="1040_filled.pdf",
         mime="application/pdf"
         )
-
-    except Exception as e:
-        st.error(f"Failed to generate 1040 PDF: {e}")
+    elif generated is not None:
+        st.info("Your information changed since the 1040 was generated; generate it again to download the updated form.")